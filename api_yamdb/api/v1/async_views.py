@@ -0,0 +1,61 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from api.v1 import views
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_READ_MAX_WORKERS,
+    thread_name_prefix="async-read",
+)
+
+READ_ACTIONS = {
+    "list": {"get": "list"},
+    "detail": {"get": "retrieve"},
+}
+
+
+def render_in_thread(view, request, args, kwargs):
+    """Выполнить view и отрисовать ответ в потоке пула.
+
+    Запросы к БД и сериализация не занимают цикл событий, а соединение
+    потока закрывается по правилам `CONN_MAX_AGE`.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(viewset, action):
+    """Асинхронная обёртка над чтением из `viewset`.
+
+    Под ASGI синхронные view выполняются по одному в общем потоке, а эта
+    обёртка отдаёт запрос ограниченному пулу `ASYNC_READ_MAX_WORKERS`,
+    поэтому медленные запросы к SQLite не задерживают остальные.
+    Под WSGI view выполняется так же, но через `async_to_sync`.
+    """
+    view = viewset.as_view(READ_ACTIONS[action])
+
+    async def async_view(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, render_in_thread, view, request, args, kwargs
+        )
+
+    async_view.csrf_exempt = True
+    return async_view
+
+
+title_list = async_read_view(views.TitleViewSet, "list")
+title_detail = async_read_view(views.TitleViewSet, "detail")
+review_list = async_read_view(views.ReviewViewSet, "list")
+review_detail = async_read_view(views.ReviewViewSet, "detail")
+comment_list = async_read_view(views.CommentViewSet, "list")
+comment_detail = async_read_view(views.CommentViewSet, "detail")
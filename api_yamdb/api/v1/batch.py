@@ -0,0 +1,132 @@
+import asyncio
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections, connections
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.BATCH_MAX_WORKERS,
+    thread_name_prefix="batch",
+)
+
+
+def build_subrequest(request, method, path, body):
+    """Собрать вложенный запрос с заголовками исходного запроса."""
+    url = urlsplit(path)
+    payload = b"" if body is None else json.dumps(body).encode()
+    environ = {
+        key: value
+        for key, value in request.META.items()
+        if key.startswith("HTTP_")
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "SCRIPT_NAME": "",
+            "SERVER_NAME": request.META.get("SERVER_NAME", "localhost"),
+            "SERVER_PORT": request.META.get("SERVER_PORT", "80"),
+            "REMOTE_ADDR": request.META.get("REMOTE_ADDR", ""),
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(payload)),
+            "wsgi.input": io.BytesIO(payload),
+            "wsgi.url_scheme": request.scheme,
+        }
+    )
+    return WSGIRequest(environ)
+
+
+def dispatch(request, method, path, body=None):
+    """Выполнить вложенный запрос напрямую через view, минуя middleware.
+
+    Возвращает словарь со статусом и телом ответа.
+    """
+    url = urlsplit(path)
+    if not url.path.startswith(settings.BATCH_PATH_PREFIX) or (
+        url.path.startswith(settings.BATCH_URL)
+    ):
+        return {
+            "status": status.HTTP_400_BAD_REQUEST,
+            "body": {"detail": "Недопустимый путь."},
+        }
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        return {
+            "status": status.HTTP_404_NOT_FOUND,
+            "body": {"detail": "Страница не найдена."},
+        }
+    subrequest = build_subrequest(request, method, path, body)
+    subrequest._dont_enforce_csrf_checks = True
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    # Ошибка одного запроса не должна отменять результаты остальных,
+    # в том числе уже зафиксированные записи.
+    try:
+        response = view(subrequest, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Ошибка вложенного запроса %s %s", method, path)
+        return {
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "body": {"detail": "Внутренняя ошибка сервера."},
+        }
+    return {"status": response.status_code, "body": response_data(response)}
+
+
+def response_data(response):
+    """Тело ответа view в виде данных для JSON."""
+    if hasattr(response, "data"):
+        return response.data
+    if not response.content:
+        return None
+    try:
+        return json.loads(response.content)
+    except ValueError:
+        return response.content.decode(errors="replace")
+
+
+def dispatch_in_thread(*args):
+    """Выполнить вложенный запрос в потоке пула и освободить соединения."""
+    close_old_connections()
+    try:
+        return dispatch(*args)
+    finally:
+        connections.close_all()
+
+
+def run_batch(request, items, parallel=False):
+    """Выполнить вложенные запросы по порядку.
+
+    При `parallel` подряд идущие безопасные запросы выполняются в пуле
+    потоков одновременно, а изменяющие запросы остаются точками
+    синхронизации: следующий запрос видит результат предыдущей записи.
+    """
+    results = []
+    pending = []
+
+    def flush():
+        results.extend(future.result() for future in pending)
+        pending.clear()
+
+    for item in items:
+        args = (request, item["method"], item["path"], item.get("body"))
+        if parallel and item["method"] in SAFE_METHODS:
+            pending.append(executor.submit(dispatch_in_thread, *args))
+            continue
+        flush()
+        results.append(dispatch(*args))
+    flush()
+    return results
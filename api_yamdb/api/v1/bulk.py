@@ -0,0 +1,495 @@
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+
+from api.v1 import serializers as sl
+from reviews.models import (
+    ArchivedReview,
+    Category,
+    ChangeLog,
+    Comment,
+    Genre,
+    GenreTitle,
+    Review,
+    Title,
+    User,
+)
+from reviews.db import write_gate
+from reviews.routers import atomic_on
+from reviews.shards import review_databases, titles_by_database
+from reviews.title_index import title_index
+
+TITLE_BULK_FIELDS = ("name", "year", "description", "category_id")
+
+
+def chunked(items, size):
+    """Разбить последовательность на части не длиннее `size`."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def in_bulk(queryset, field, values, *fields):
+    """Выбрать строки по значениям `field` частями.
+
+    Части не превышают лимит параметров SQLite. Возвращает словарь
+    значение -> кортеж остальных полей.
+    """
+    result = {}
+    for chunk in chunked(list(set(values)), settings.BULK_BATCH_SIZE):
+        for row in queryset.filter(**{f"{field}__in": chunk}).values_list(
+            field, *fields
+        ):
+            result[row[0]] = row[1:]
+    return result
+
+
+def bulk_create_with_ids(model, objects, using=None):
+    """Вставить объекты через `bulk_create` и проставить им id.
+
+    Django 3.2 не возвращает id из пакетной вставки в SQLite. Поэтому
+    каждая часть вставляется одним запросом INSERT: его строки получают
+    идущие подряд rowid, последний из которых возвращает
+    `last_insert_rowid()` того же соединения. Вставки других соединений
+    и строки с явными id между частями не сдвигают найденные id.
+    """
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if field is not model._meta.auto_field
+    ]
+    size = min(
+        settings.BULK_BATCH_SIZE,
+        connection.ops.bulk_batch_size(fields, objects),
+    )
+    for chunk in chunked(objects, max(size, 1)):
+        pending = [obj for obj in chunk if obj.pk is None]
+        model.objects.db_manager(using).bulk_create(
+            chunk, batch_size=len(chunk)
+        )
+        if not pending or pending[0].pk is not None:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT last_insert_rowid()")
+            (last_id,) = cursor.fetchone()
+        for pk, obj in enumerate(pending, start=last_id - len(pending) + 1):
+            obj.pk = pk
+    return objects
+
+
+def validate_items(serializer_class, items):
+    """Проверить элементы без обращения к БД.
+
+    Возвращает список пар (индекс, данные) и словарь ошибок по индексам.
+    """
+    valid, errors = [], {}
+    for index, item in enumerate(items):
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors[index] = serializer.errors
+    return valid, errors
+
+
+def resolve_authors(valid, errors):
+    """Подставить id авторов по username одним запросом на часть."""
+    authors = in_bulk(
+        User.objects.all(),
+        "username",
+        (data["author"] for _, data in valid),
+        "id",
+    )
+    resolved = []
+    for index, data in valid:
+        if data["author"] not in authors:
+            errors[index] = {"author": ["Пользователь не найден."]}
+            continue
+        data["author_id"] = authors[data.pop("author")][0]
+        resolved.append((index, data))
+    return resolved
+
+
+def format_errors(errors):
+    return [
+        {"index": index, "errors": errors[index]} for index in sorted(errors)
+    ]
+
+
+def report(created, errors):
+    return {"created": created, "errors": format_errors(errors)}
+
+
+DUPLICATE_REVIEW = {
+    "non_field_errors": ["Можно оставить только один отзыв на произведение!"]
+}
+
+
+def existing_reviews(alias, pairs):
+    """Пары (автор, произведение) из `pairs`, у которых уже есть отзыв.
+
+    Пары проверяются частями, и в запросе части не больше
+    `BULK_BATCH_SIZE` авторов и произведений, поэтому число запросов
+    растёт линейно с размером пакета. Учитываются и архивные отзывы,
+    если архив включён.
+    """
+    models = (Review,)
+    if settings.REVIEW_ARCHIVE_ENABLED:
+        models += (ArchivedReview,)
+    existing = set()
+    for chunk in chunked(list(pairs), settings.BULK_BATCH_SIZE):
+        chunk = set(chunk)
+        for model in models:
+            existing.update(
+                pair
+                for pair in model.objects.using(alias)
+                .filter(
+                    author_id__in={author_id for author_id, _ in chunk},
+                    title_id__in={title_id for _, title_id in chunk},
+                )
+                .values_list("author_id", "title_id")
+                if pair in chunk
+            )
+    return existing
+
+
+def insert_reviews(alias, pending, errors):
+    """Вставить отзывы, превращая нарушения уникальности в ошибки.
+
+    Если пакетная вставка нарушила ограничение (отзыв пришёл из другого
+    процесса), отзывы вставляются по одному, и повторы получают ошибку
+    своего элемента.
+    """
+    reviews = [review for _, review in pending]
+    try:
+        with transaction.atomic(using=alias):
+            return bulk_create_with_ids(Review, reviews, using=alias)
+    except IntegrityError:
+        pass
+    created = []
+    for index, review in pending:
+        review.pk = None
+        try:
+            with transaction.atomic(using=alias):
+                created += bulk_create_with_ids(Review, [review], using=alias)
+        except IntegrityError:
+            errors[index] = DUPLICATE_REVIEW
+    return created
+
+
+def create_reviews(alias, candidates, errors):
+    """Создать отзывы одной БД отзывов.
+
+    Выполняется в очереди записей `alias`, поэтому проверка повторов и
+    вставка происходят в одной транзакции.
+    """
+    existing = existing_reviews(
+        alias, {(data["author_id"], data["title"]) for _, data in candidates}
+    )
+    pending = []
+    for index, data in candidates:
+        pair = (data["author_id"], data["title"])
+        if pair in existing:
+            errors[index] = DUPLICATE_REVIEW
+            continue
+        existing.add(pair)
+        pending.append(
+            (
+                index,
+                Review(
+                    title_id=data["title"],
+                    author_id=data["author_id"],
+                    text=data["text"],
+                    score=data["score"],
+                ),
+            )
+        )
+    # Транзакция `alias` уже открыта очередью записей.
+    others = {router.db_for_write(ChangeLog), router.db_for_write(Title)}
+    with atomic_on(*others - {alias}):
+        reviews = insert_reviews(alias, pending, errors)
+        ChangeLog.record(
+            Review,
+            (review.pk for review in reviews),
+            ChangeLog.CREATED,
+            using=alias,
+        )
+        affected = list({review.title_id for review in reviews})
+        for chunk in chunked(affected, settings.BULK_BATCH_SIZE):
+            Title.objects.filter(pk__in=chunk).update_rating()
+    return len(reviews)
+
+
+def bulk_create_reviews(items):
+    """Создать отзывы пакетом.
+
+    Авторы и произведения разрешаются запросами `__in`. В каждой БД
+    отзывов проверка повторов пар (автор, произведение), вставка
+    `bulk_create` и пересчёт рейтинга затронутых произведений
+    выполняются одной транзакцией через очередь записей.
+    """
+    valid, errors = validate_items(sl.ReviewBulkItemSerializer, items)
+    valid = resolve_authors(valid, errors)
+    titles = in_bulk(
+        Title.objects.filter(is_hidden=False),
+        "pk",
+        (data["title"] for _, data in valid),
+    )
+    by_title = {}
+    for index, data in valid:
+        if data["title"] not in titles:
+            errors[index] = {"title": ["Произведение не найдено."]}
+        else:
+            by_title.setdefault(data["title"], []).append((index, data))
+    created = 0
+    for alias, title_ids in titles_by_database(by_title).items():
+        candidates = sorted(
+            item for title_id in title_ids for item in by_title[title_id]
+        )
+        created += write_gate.run(
+            create_reviews, alias, candidates, errors, using=alias
+        )
+    return report(created, errors)
+
+
+def bulk_create_comments(items):
+    """Создать комментарии пакетом в одной транзакции на БД отзывов.
+
+    Комментарий сохраняется в ту же БД, где найден его отзыв, а число
+    комментариев пересчитывается один раз для каждого отзыва.
+    """
+    valid, errors = validate_items(sl.CommentBulkItemSerializer, items)
+    valid = resolve_authors(valid, errors)
+    review_ids = [data["review"] for _, data in valid]
+    databases = {}
+    for alias in review_databases():
+        for review_id in in_bulk(
+            Review.objects.using(alias), "pk", review_ids
+        ):
+            databases[review_id] = alias
+    comments = {}
+    for index, data in valid:
+        if data["review"] not in databases:
+            errors[index] = {"review": ["Отзыв не найден."]}
+            continue
+        comments.setdefault(databases[data["review"]], []).append(
+            Comment(
+                review_id=data["review"],
+                author_id=data["author_id"],
+                text=data["text"],
+            )
+        )
+    with atomic_on(*comments):
+        for alias, objects in comments.items():
+            bulk_create_with_ids(Comment, objects, using=alias)
+            affected = list({comment.review_id for comment in objects})
+            for chunk in chunked(affected, settings.BULK_BATCH_SIZE):
+                Review.objects.using(alias).filter(
+                    pk__in=chunk
+                ).update_comment_count()
+            ChangeLog.record(
+                Comment,
+                (comment.pk for comment in objects),
+                ChangeLog.CREATED,
+                using=alias,
+            )
+    return report(
+        sum(len(objects) for objects in comments.values()), errors
+    )
+
+
+def resolve_slugs(valid, errors):
+    """Разрешить слаги категорий и жанров двумя запросами."""
+    categories = in_bulk(
+        Category.objects.filter(is_hidden=False),
+        "slug",
+        (data["category"] for _, data in valid if data["category"]),
+        "id",
+    )
+    genres = in_bulk(
+        Genre.objects.all(),
+        "slug",
+        (slug for _, data in valid for slug in data["genre"]),
+        "id",
+    )
+    resolved = []
+    for index, data in valid:
+        category = data.pop("category")
+        genre_slugs = data.pop("genre")
+        unknown = [slug for slug in genre_slugs if slug not in genres]
+        if category and category not in categories:
+            errors[index] = {"category": ["Категория не найдена."]}
+        elif unknown:
+            errors[index] = {"genre": [f"Жанры не найдены: {unknown}."]}
+        else:
+            data["category_id"] = (
+                categories[category][0] if category else None
+            )
+            data["genre_ids"] = {genres[slug][0] for slug in genre_slugs}
+            resolved.append((index, data))
+    return resolved
+
+
+def validate_titles(items):
+    """Проверить произведения пакета и разрешить их слаги."""
+    valid, errors = validate_items(sl.TitleBulkItemSerializer, items)
+    seen = set()
+    for index, data in valid:
+        data["category"] = data["category"] and data["category"].lower()
+        data["genre"] = [slug.lower() for slug in data["genre"]]
+        if data["external_id"] in seen:
+            errors[index] = {
+                "external_id": ["Повтор внешнего идентификатора в пакете."]
+            }
+        seen.add(data["external_id"])
+    valid = [(index, data) for index, data in valid if index not in errors]
+    return resolve_slugs(valid, errors), errors
+
+
+def load_titles(external_ids):
+    """Прочитать существующие произведения и их связи с жанрами.
+
+    Возвращает словарь внешний id -> произведение, множество внешних id
+    произведений, скрытых до удаления, и словарь
+    id произведения -> {id жанра: id связи}.
+    """
+    existing, hidden = {}, set()
+    for chunk in chunked(external_ids, settings.BULK_BATCH_SIZE):
+        for title in Title.objects.filter(external_id__in=chunk).only(
+            "id", "external_id", "is_hidden", *TITLE_BULK_FIELDS
+        ):
+            if title.is_hidden:
+                hidden.add(title.external_id)
+            else:
+                existing[title.external_id] = title
+    links = {}
+    for chunk in chunked(
+        [title.pk for title in existing.values()], settings.BULK_BATCH_SIZE
+    ):
+        for link_id, title_id, genre_id in GenreTitle.objects.filter(
+            title_id__in=chunk
+        ).values_list("id", "title_id", "genre_id"):
+            links.setdefault(title_id, {})[genre_id] = link_id
+    return existing, hidden, links
+
+
+def diff_titles(valid, existing):
+    """Разделить произведения на новые и изменённые по полям."""
+    created, updated = [], []
+    for _, data in valid:
+        title = existing.get(data["external_id"])
+        if title is None:
+            created.append(Title(**data))
+            continue
+        changed = [
+            field
+            for field in TITLE_BULK_FIELDS
+            if getattr(title, field) != data[field]
+        ]
+        for field in changed:
+            setattr(title, field, data[field])
+        if changed:
+            updated.append(title)
+    return created, updated
+
+
+def diff_genre_links(wanted_genres, existing, links):
+    """Найти лишние и недостающие связи произведений с жанрами.
+
+    Возвращает id лишних связей, новые связи и id произведений,
+    у которых изменился набор жанров.
+    """
+    stale_links, new_links, relinked_ids = [], [], set()
+    for external_id, genre_ids in wanted_genres.items():
+        title_id = existing[external_id].pk
+        current = links.get(title_id, {})
+        stale = [
+            link_id
+            for genre_id, link_id in current.items()
+            if genre_id not in genre_ids
+        ]
+        new = [
+            GenreTitle(title_id=title_id, genre_id=genre_id)
+            for genre_id in genre_ids
+            if genre_id not in current
+        ]
+        if stale or new:
+            relinked_ids.add(title_id)
+        stale_links.extend(stale)
+        new_links.extend(new)
+    return stale_links, new_links, relinked_ids
+
+
+def bulk_upsert_titles(items):
+    """Создать или обновить произведения по внешнему идентификатору.
+
+    Слаги разрешаются двумя запросами, существующие строки и их жанры
+    читаются пакетно и сравниваются с присланными данными. Изменения
+    записываются через `bulk_create`/`bulk_update` и пакетные изменения
+    `GenreTitle` в одной транзакции.
+    """
+    started = time.monotonic()
+    valid, errors = validate_titles(items)
+    existing, hidden, links = load_titles(
+        [data["external_id"] for _, data in valid]
+    )
+    for index, data in valid:
+        if data["external_id"] in hidden:
+            # Строка ещё занимает внешний id: её нельзя ни изменить,
+            # ни создать заново до завершения удаления.
+            errors[index] = {"external_id": ["Произведение удаляется."]}
+    valid = [(index, data) for index, data in valid if index not in errors]
+    wanted_genres = {
+        data["external_id"]: data.pop("genre_ids") for _, data in valid
+    }
+    created, updated = diff_titles(valid, existing)
+
+    with transaction.atomic():
+        bulk_create_with_ids(Title, created)
+        Title.objects.bulk_update(
+            updated, TITLE_BULK_FIELDS, batch_size=settings.BULK_BATCH_SIZE
+        )
+        existing.update((title.external_id, title) for title in created)
+        stale_links, new_links, relinked_ids = diff_genre_links(
+            wanted_genres, existing, links
+        )
+        for chunk in chunked(stale_links, settings.BULK_BATCH_SIZE):
+            GenreTitle.objects.filter(pk__in=chunk).delete()
+        GenreTitle.objects.bulk_create(
+            new_links, batch_size=settings.BULK_BATCH_SIZE
+        )
+        created_ids = {title.pk for title in created}
+        updated_ids = (
+            {title.pk for title in updated} | relinked_ids
+        ) - created_ids
+        ChangeLog.record(Title, sorted(created_ids), ChangeLog.CREATED)
+        ChangeLog.record(Title, sorted(updated_ids), ChangeLog.UPDATED)
+        if title_index.warmed:
+            transaction.on_commit(
+                lambda: reindex_titles(
+                    [existing[external_id] for external_id in wanted_genres],
+                    new_links,
+                )
+            )
+
+    elapsed = time.monotonic() - started
+    return {
+        "created": len(created),
+        "updated": len(updated_ids),
+        "unchanged": len(valid) - len(created) - len(updated_ids),
+        "errors": format_errors(errors),
+        "genre_links_added": len(new_links),
+        "genre_links_removed": len(stale_links),
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "items_per_second": round(len(items) / max(elapsed, 1e-6), 1),
+    }
+
+
+def reindex_titles(titles, links):
+    """Отразить пакетные изменения в индексе жанров."""
+    for title in titles:
+        title_index.set_title(title.pk, title.category_id, title.year)
+    for link in links:
+        title_index.add_genres(link.title_id, (link.genre_id,))
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import logging
+import re
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from reviews.models import (
+    ArchivedComment,
+    ArchivedReview,
+    ChangeLog,
+    Comment,
+    Review,
+)
+from reviews.routers import route_related
+from reviews.shards import in_bulk_everywhere
+
+EVENTS_PATH = re.compile(r"^/api/v1/(?:titles/(?P<title_id>\d+)/)?events/$")
+ALL_TITLES = "all"
+
+logger = logging.getLogger(__name__)
+
+
+def read_changes(func):
+    """Выполнить чтение из БД в потоке с освобождением соединений."""
+
+    def wrapper(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapper, thread_sensitive=False)
+
+
+@read_changes
+def latest_cursor():
+    last = ChangeLog.objects.order_by("-id").first()
+    return last.id if last else 0
+
+
+def review_event(change_id, review):
+    return (
+        review.title_id,
+        {
+            "id": change_id,
+            "event": "review",
+            "data": {
+                "id": review.pk,
+                "title": review.title_id,
+                "author": review.author.username,
+                "text": review.text,
+                "score": review.score,
+                "pub_date": review.pub_date.isoformat(),
+            },
+        },
+    )
+
+
+def comment_event(change_id, comment):
+    return (
+        comment.review.title_id,
+        {
+            "id": change_id,
+            "event": "comment",
+            "data": {
+                "id": comment.pk,
+                "title": comment.review.title_id,
+                "review": comment.review_id,
+                "author": comment.author.username,
+                "text": comment.text,
+                "pub_date": comment.pub_date.isoformat(),
+            },
+        },
+    )
+
+
+def confirmed_gone(missing):
+    """Отобрать из ненайденных пар (модель, id) те, которых уже не будет.
+
+    Объект пропал навсегда, если журнал содержит его удаление или он
+    перенесён в архив; остальные, вероятно, ещё не видны в своей БД.
+    """
+    gone = set()
+    for model, archive_model in (
+        (Review, ArchivedReview),
+        (Comment, ArchivedComment),
+    ):
+        name = model._meta.model_name
+        ids = [object_id for kind, object_id in missing if kind == name]
+        if not ids:
+            continue
+        gone.update(
+            (name, object_id)
+            for object_id in ChangeLog.objects.filter(
+                model=name, action=ChangeLog.DELETED, object_id__in=ids
+            ).values_list("object_id", flat=True)
+        )
+        if settings.REVIEW_ARCHIVE_ENABLED:
+            gone.update(
+                (name, object_id)
+                for object_id in in_bulk_everywhere(
+                    archive_model.objects.all(), ids
+                )
+            )
+    return gone
+
+
+@read_changes
+def fetch_events(cursor):
+    """Прочитать новые отзывы и комментарии из журнала изменений.
+
+    Возвращает список пар (id произведения, событие) и новый курсор.
+    Курсор останавливается перед первым объектом, которого ещё не видно
+    и который не удалён: он будет прочитан при следующем опросе.
+    """
+    changes = list(
+        ChangeLog.objects.filter(
+            id__gt=cursor,
+            model__in=("review", "comment"),
+            action=ChangeLog.CREATED,
+        )
+        .order_by("id")
+        .values_list("id", "model", "object_id")[: settings.SSE_BATCH_SIZE]
+    )
+    ids = defaultdict(list)
+    for _, model, object_id in changes:
+        ids[model].append(object_id)
+    found = {
+        "review": in_bulk_everywhere(
+            route_related(Review.objects.select_related("author")),
+            ids["review"],
+        ),
+        "comment": in_bulk_everywhere(
+            route_related(Comment.objects.select_related("author", "review")),
+            ids["comment"],
+        ),
+    }
+    gone = confirmed_gone(
+        [
+            (model, object_id)
+            for _, model, object_id in changes
+            if object_id not in found[model]
+        ]
+    )
+    events = []
+    for change_id, model, object_id in changes:
+        if object_id in found[model]:
+            event = review_event if model == "review" else comment_event
+            events.append(event(change_id, found[model][object_id]))
+        elif (model, object_id) not in gone:
+            break
+        cursor = change_id
+    return events, cursor
+
+
+class EventBroker:
+    """Публикация новых отзывов и комментариев подписчикам процесса.
+
+    Один фоновый опрос журнала изменений на процесс раздаёт события
+    всем подписчикам, поэтому в ленту попадают записи из любых процессов,
+    а соединения клиентов стоят одну корутину и одну очередь.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._task = None
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue(maxsize=settings.SSE_QUEUE_SIZE)
+        self._subscribers[channel].add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._poll())
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        self._subscribers[channel].discard(queue)
+        if not self._subscribers[channel]:
+            del self._subscribers[channel]
+
+    def publish(self, title_id, event):
+        """Разослать событие подписчикам произведения и общей ленты.
+
+        Переполненная очередь медленного клиента теряет самое старое
+        событие, чтобы не задерживать остальных.
+        """
+        channels = (str(title_id), ALL_TITLES)
+        for channel in channels:
+            for queue in self._subscribers.get(channel, ()):
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(event)
+
+    async def _poll(self):
+        """Опрашивать журнал, пока есть подписчики.
+
+        Ошибка чтения журнала записывается в лог, а опрос продолжается с
+        прежней позиции: иначе ленты всех подписчиков замолкли бы до
+        следующей подписки.
+        """
+        cursor = await latest_cursor()
+        while self._subscribers:
+            await asyncio.sleep(settings.SSE_POLL_INTERVAL)
+            try:
+                events, cursor = await fetch_events(cursor)
+            except Exception:
+                logger.exception("Не удалось прочитать журнал изменений")
+                continue
+            for title_id, event in events:
+                self.publish(title_id, event)
+
+
+broker = EventBroker()
+
+
+def format_event(event):
+    data = json.dumps(event["data"], ensure_ascii=False)
+    return (
+        f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
+    ).encode()
+
+
+async def wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def stream_events(receive, send, channel):
+    """Отдавать события канала клиенту до его отключения."""
+    queue = broker.subscribe(channel)
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b"retry: 5000\n\n",
+                "more_body": True,
+            }
+        )
+        while not disconnect.done():
+            get = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                (get, disconnect),
+                timeout=settings.SSE_HEARTBEAT_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if get in done:
+                body = format_event(get.result())
+            else:
+                get.cancel()
+                if disconnect in done:
+                    break
+                body = b": ping\n\n"
+            await send(
+                {"type": "http.response.body", "body": body, "more_body": True}
+            )
+    finally:
+        disconnect.cancel()
+        broker.unsubscribe(channel, queue)
+
+
+class EventStreamRouter:
+    """ASGI-приложение: SSE-ленты событий, остальное — Django.
+
+    `GET /api/v1/events/` — новые отзывы и комментарии всех
+    произведений, `GET /api/v1/titles/<id>/events/` — одного произведения.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            match = EVENTS_PATH.match(scope["path"])
+            if match:
+                channel = match.group("title_id") or ALL_TITLES
+                return await stream_events(receive, send, channel)
+        return await self.application(scope, receive, send)
@@ -1,28 +1,138 @@
 import django_filters
+from django.conf import settings
+from django.db.models import Count
+from rest_framework.filters import OrderingFilter
 
-from reviews.models import Title
+from reviews.models import GenreTitle, Title
+from reviews.title_index import title_index
+
+GENRE_MODE_ANY = "any"
+GENRE_MODE_ALL = "all"
+GENRE_MODES = (
+    (GENRE_MODE_ANY, "Любой из жанров"),
+    (GENRE_MODE_ALL, "Все жанры"),
+)
+INDEXED_FILTERS = (
+    "genre",
+    "genre_mode",
+    "category",
+    "year",
+    "year__gte",
+    "year__lte",
+)
+
+
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    """Фильтр по списку строк, перечисленных через запятую."""
 
 
 class TitleFilter(django_filters.FilterSet):
-    """Фильтр для произведений."""
+    """Фильтр для произведений.
 
-    genre = django_filters.CharFilter(
-        field_name="genre__slug",
-        lookup_expr="iexact",
+    Слаги жанров и категорий хранятся в нижнем регистре, поэтому
+    сравнение точное и использует уникальные индексы по слагу.
+    """
+
+    genre = CharInFilter(method="filter_genre")
+    genre_mode = django_filters.ChoiceFilter(
+        choices=GENRE_MODES,
+        method="filter_genre_mode",
     )
-    category = django_filters.CharFilter(
+    category = CharInFilter(
         field_name="category__slug",
-        lookup_expr="iexact",
+        lookup_expr="in",
     )
     name = django_filters.CharFilter(
         field_name="name",
         lookup_expr="iexact",
     )
-    year = django_filters.NumberFilter(
+    year = django_filters.NumberFilter(field_name="year")
+    year__gte = django_filters.NumberFilter(
         field_name="year",
-        lookup_expr="iexact",
+        lookup_expr="gte",
+    )
+    year__lte = django_filters.NumberFilter(
+        field_name="year",
+        lookup_expr="lte",
+    )
+    rating__gte = django_filters.NumberFilter(
+        field_name="rating",
+        lookup_expr="gte",
+    )
+    rating__lte = django_filters.NumberFilter(
+        field_name="rating",
+        lookup_expr="lte",
     )
 
     class Meta:
         model = Title
         fields = ("category", "genre", "name", "year")
+
+    def filter_queryset(self, queryset):
+        """Применить фильтры, используя индекс жанров, если он прогрет.
+
+        Жанры, категории и годы тогда отбираются множествами в памяти,
+        а остальные фильтры применяются ORM как обычно.
+        """
+        data = self.form.cleaned_data
+        skipped = ()
+        if data.get("genre"):
+            title_ids = self.lookup_title_index(data)
+            if title_ids is not None:
+                queryset = queryset.filter(pk__in=title_ids)
+                skipped = INDEXED_FILTERS
+        for name, value in data.items():
+            if name not in skipped:
+                queryset = self.filters[name].filter(queryset, value)
+        return queryset
+
+    @staticmethod
+    def lookup_title_index(data):
+        def as_int(value):
+            return None if value is None else int(value)
+
+        return title_index.lookup(
+            genres={slug.lower() for slug in data["genre"]},
+            genre_mode=data.get("genre_mode") or GENRE_MODE_ANY,
+            categories={slug.lower() for slug in data.get("category") or ()},
+            year=as_int(data.get("year")),
+            year_gte=as_int(data.get("year__gte")),
+            year_lte=as_int(data.get("year__lte")),
+            limit=settings.TITLE_INDEX_MAX_IDS,
+        )
+
+    def filter_genre(self, queryset, name, value):
+        """Отфильтровать произведения по одному или нескольким жанрам.
+
+        По умолчанию подходит произведение с любым из жанров, при
+        `genre_mode=all` — только со всеми перечисленными жанрами.
+        """
+        slugs = {slug.lower() for slug in value}
+        title_ids = GenreTitle.objects.filter(genre__slug__in=slugs)
+        if self.form.cleaned_data.get("genre_mode") == GENRE_MODE_ALL:
+            title_ids = (
+                title_ids.values("title_id")
+                .annotate(matched=Count("genre_id", distinct=True))
+                .filter(matched=len(slugs))
+            )
+        return queryset.filter(pk__in=title_ids.values("title_id"))
+
+    def filter_genre_mode(self, queryset, name, value):
+        """Режим учитывается в `filter_genre`."""
+        return queryset
+
+
+class StableOrderingFilter(OrderingFilter):
+    """Сортировка с добавлением `id` для стабильной пагинации.
+
+    Направление `id` совпадает с направлением первого поля, поэтому
+    SQLite проходит индекс поля (он неявно содержит rowid) без сортировки
+    во временном B-дереве.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or {"id", "-id"} & set(ordering):
+            return ordering
+        tie_breaker = "-id" if ordering[0].startswith("-") else "id"
+        return (*ordering, tie_breaker)
@@ -1,9 +1,70 @@
-from rest_framework import mixins, viewsets
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DEFAULT_DB_ALIAS, router
+from django.db.models import OuterRef, Prefetch
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
 
 from api.v1.permissions import IsAdminOrReadOnly
+from reviews.db import WriteUnavailable, write_gate
+from reviews.deletion import (
+    count_dependents,
+    purge_task,
+    schedule_deletion,
+)
+from reviews.jobs import enqueue
+from reviews.routers import (
+    is_primary_sticky,
+    is_review_model,
+    mark_primary_sticky,
+    replica_reads,
+    route_related,
+)
+from reviews.shards import is_sharded, prefetch_by_shard
+
+
+def get_list_param(request, name):
+    """Вернуть значения параметра запроса, перечисленные через запятую."""
+    value = request.query_params.get(name, "")
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class ReplicaReadMixin:
+    """Чтение с реплик для безопасных запросов.
+
+    После успешной записи пользователь на время `REPLICA_STICKY_SECONDS`
+    читает с основной БД, чтобы видеть собственные изменения.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = replica_reads.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not (
+            request.user.is_authenticated
+            and is_primary_sticky(request.user.pk)
+        ):
+            replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            mark_primary_sticky(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
 
 
 class GenreCategoryMixin(
+    ReplicaReadMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.DestroyModelMixin,
@@ -14,3 +75,345 @@ class GenreCategoryMixin(
     permission_classes = (IsAdminOrReadOnly,)
     search_fields = ("name",)
     lookup_field = "slug"
+
+
+class SparseFieldsViewMixin:
+    """Сужение запроса к БД под поля, выводимые сериализатором.
+
+    Связи из `select_related_fields` и `prefetch_related_fields`
+    подгружаются только если соответствующее поле есть в ответе, а при
+    параметрах `fields`/`omit` из таблицы читаются лишь нужные столбцы.
+    """
+
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method != "GET":
+            return queryset
+        return self.narrow_queryset(queryset)
+
+    def narrow_queryset(self, queryset):
+        rendered = set(self.get_serializer().fields)
+        queryset = route_related(
+            queryset.select_related(
+                *(
+                    name
+                    for name in self.select_related_fields
+                    if name in rendered
+                )
+            )
+        ).prefetch_related(
+            *(
+                name
+                for name in self.prefetch_related_fields
+                if name in rendered
+            )
+        )
+        if not (
+            get_list_param(self.request, "fields")
+            or get_list_param(self.request, "omit")
+        ):
+            return queryset
+        columns = {
+            field.name
+            for field in queryset.model._meta.concrete_fields
+            if field.name in rendered
+        }
+        return queryset.only(queryset.model._meta.pk.name, *columns)
+
+
+class ArchiveChain:
+    """Рабочие строки, за которыми следуют архивные.
+
+    Поддерживает `count()` и срезы, которых достаточно пагинатору.
+    Архив читается, только когда срез выходит за рабочие строки.
+    """
+
+    def __init__(self, hot, archive, prepare):
+        self.hot = hot
+        self.archive = archive
+        self.prepare = prepare
+        self._hot_count = None
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    def count(self):
+        return self.hot_count() + self.archive.count()
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        hot = self.hot_count()
+        rows = list(self.hot[start:stop]) if start < hot else []
+        if stop is None or stop > hot:
+            archived = list(
+                self.archive[
+                    max(start - hot, 0):None if stop is None else stop - hot
+                ]
+            )
+            self.prepare(archived)
+            rows += archived
+        return rows
+
+
+class ArchiveFallbackMixin:
+    """Продолжение вложенного списка архивными строками.
+
+    Архив (`manage.py archivereviews`) содержит только строки старше
+    всех рабочих, поэтому при сортировке по дате страница, вышедшая за
+    рабочие строки, дочитывается из архива той же БД.
+
+    `archive_model` — архивная модель, `archive_filter` сопоставляет
+    её поля с аргументами URL родителя, например
+    `{"title_id": "title_id"}`.
+    """
+
+    archive_model = None
+    archive_filter = {}
+
+    def get_archive_queryset(self, alias):
+        return self.archive_model.objects.using(alias).filter(
+            **{
+                field: self.kwargs.get(kwarg)
+                for field, kwarg in self.archive_filter.items()
+            }
+        )
+
+    def prepare_archived(self, objects):
+        """Подготовить архивные объекты страницы к сериализации."""
+
+    def paginate_queryset(self, queryset):
+        if self.action == "list" and settings.REVIEW_ARCHIVE_ENABLED:
+            queryset = ArchiveChain(
+                queryset,
+                self.narrow_queryset(self.get_archive_queryset(queryset.db)),
+                self.prepare_archived,
+            )
+        return super().paginate_queryset(queryset)
+
+
+def limit_per_parent(queryset, parent_field, limit):
+    """Оставить не более `limit` последних объектов на каждого родителя.
+
+    Коррелированный подзапрос с LIMIT выполняется внутри одного запроса
+    предзагрузки, поэтому на уровень вложенности приходится один запрос.
+    """
+    latest = (
+        queryset.model.objects.filter(**{parent_field: OuterRef(parent_field)})
+        .order_by("-pub_date", "-id")
+        .values("pk")[:limit]
+    )
+    return queryset.filter(pk__in=latest).order_by("-pub_date", "-id")
+
+
+class ExpandViewMixin:
+    """Встраивание связанных объектов по параметру `expand`.
+
+    `expandable_relations` сопоставляет путь (`reviews.comments`) с полем
+    родителя и базовым запросом. Лимит уровня задаётся параметром
+    `<имя>_limit`, например `comments_limit=3`.
+    """
+
+    expandable_relations = {}
+
+    def get_expand(self):
+        if self.request is None or self.request.method != "GET":
+            return set()
+        expand = set()
+        for path in get_list_param(self.request, "expand"):
+            parts = path.split(".")
+            for depth in range(1, len(parts) + 1):
+                expand.add(".".join(parts[:depth]))
+        return expand & set(self.expandable_relations)
+
+    def get_expand_limit(self, name):
+        try:
+            limit = int(self.request.query_params[f"{name}_limit"])
+        except (KeyError, ValueError):
+            return settings.EXPAND_DEFAULT_LIMIT
+        return min(max(limit, 1), settings.EXPAND_MAX_LIMIT)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
+
+    def get_expand_prefetches(self):
+        prefetches = []
+        for path in sorted(self.get_expand(), key=len):
+            parent_field, related = self.expandable_relations[path]
+            *parents, name = path.split(".")
+            lookup = "__".join(
+                [f"expanded_{parent}" for parent in parents] + [name]
+            )
+            prefetches.append(
+                Prefetch(
+                    lookup,
+                    queryset=route_related(
+                        limit_per_parent(
+                            related, parent_field, self.get_expand_limit(name)
+                        )
+                    ),
+                    to_attr=f"expanded_{name}",
+                )
+            )
+        return prefetches
+
+    def expands_across_shards(self):
+        """Лежат ли встраиваемые отзывы в разных шардах у разных объектов."""
+        return is_sharded() and not is_review_model(
+            self.get_queryset().model
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.expands_across_shards():
+            return queryset
+        return queryset.prefetch_related(*self.get_expand_prefetches())
+
+    def get_serializer(self, *args, **kwargs):
+        if args and self.get_expand() and self.expands_across_shards():
+            instances = args[0] if kwargs.get("many") else [args[0]]
+            prefetch_by_shard(instances, self.get_expand_prefetches())
+        return super().get_serializer(*args, **kwargs)
+
+
+class BatchRetrieveMixin:
+    """Получение нескольких объектов одним запросом.
+
+    `GET <list>/?ids=1,2,3` выбирает объекты одним запросом `__in` по
+    `lookup_field` с той же предзагрузкой, что и список, и возвращает их в
+    порядке запроса вместе с ненайденными ключами.
+    """
+
+    batch_param = "ids"
+
+    def get_batch_keys(self, request):
+        opts = self.get_queryset().model._meta
+        field = (
+            opts.pk
+            if self.lookup_field == "pk"
+            else opts.get_field(self.lookup_field)
+        )
+        keys = []
+        for value in get_list_param(request, self.batch_param):
+            try:
+                key = field.to_python(value)
+            except DjangoValidationError:
+                raise ValidationError(
+                    {self.batch_param: f"Некорректное значение: {value}"}
+                )
+            if key not in keys:
+                keys.append(key)
+        if len(keys) > settings.BATCH_MAX_IDS:
+            raise ValidationError(
+                {
+                    self.batch_param: (
+                        f"Не более {settings.BATCH_MAX_IDS} значений "
+                        f"за запрос."
+                    )
+                }
+            )
+        return keys
+
+    def list(self, request, *args, **kwargs):
+        if self.batch_param not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        keys = self.get_batch_keys(request)
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{f"{self.lookup_field}__in": keys}
+        )
+        found = {getattr(obj, self.lookup_field): obj for obj in queryset}
+        serializer = self.get_serializer(
+            [found[key] for key in keys if key in found], many=True
+        )
+        return Response(
+            {
+                "results": serializer.data,
+                "missing": [key for key in keys if key not in found],
+            }
+        )
+
+
+class DeferredDestroyMixin:
+    """Фоновое удаление объектов с большим каскадом.
+
+    Если удаление затронет больше `DELETION_SYNC_LIMIT` строк, объект
+    сразу скрывается, а ответ 202 содержит задачу, которую выполнит
+    фоновый обработчик (`manage.py runworker` или `purgedeleted`).
+    Небольшие удаления выполняются как прежде, как и любые удаления при
+    `JOBS_ALWAYS_EAGER`: без обработчика задача выполнилась бы в том же
+    процессе сразу после ответа, и 202 лишь скрывал бы это.
+    Запрос view должен исключать скрытые объекты.
+    """
+
+    def destroy(self, request, *args, **kwargs):
+        from api.v1.serializers import DeletionTaskSerializer
+
+        instance = self.get_object()
+        if settings.JOBS_ALWAYS_EAGER:
+            self.perform_destroy(instance)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        total = count_dependents(instance)
+        if total <= settings.DELETION_SYNC_LIMIT:
+            self.perform_destroy(instance)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        task = serialized_write(schedule_deletion, instance, total)
+        enqueue(purge_task, priority=-10, task_id=task.pk)
+        return Response(
+            DeletionTaskSerializer(task).data, status=status.HTTP_202_ACCEPTED
+        )
+
+
+class WriteBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "База данных занята, повторите запрос позже."
+    default_code = "write_busy"
+    wait = 1
+
+
+def serialized_write(func, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Выполнить запись в БД `using` через очередь записей процесса.
+
+    Исключения:
+        - WriteBusy: БД занята, клиенту возвращается 503 с заголовком
+        `Retry-After`.
+    """
+    try:
+        return write_gate.run(func, *args, using=using, **kwargs)
+    except WriteUnavailable:
+        raise WriteBusy
+
+
+class SerializedWriteMixin:
+    """Создание, изменение и удаление объектов через очередь записей."""
+
+    def get_write_database(self, instance=None):
+        """БД записи объекта или, для нового объекта, его родителя."""
+        model = self.get_serializer_class().Meta.model
+        return router.db_for_write(model, instance=instance)
+
+    def perform_create(self, serializer):
+        serialized_write(
+            super().perform_create,
+            serializer,
+            using=self.get_write_database(),
+        )
+
+    def perform_update(self, serializer):
+        serialized_write(
+            super().perform_update,
+            serializer,
+            using=self.get_write_database(serializer.instance),
+        )
+
+    def perform_destroy(self, instance):
+        serialized_write(
+            super().perform_destroy,
+            instance,
+            using=self.get_write_database(instance),
+        )
@@ -1,19 +1,103 @@
 from django.conf import settings
+from django.core.validators import MaxValueValidator
 from rest_framework.exceptions import ValidationError
 from rest_framework.serializers import (
+    BooleanField,
+    ChoiceField,
     CurrentUserDefault,
     CharField,
+    DictField,
     EmailField,
     IntegerField,
+    JSONField,
+    ListField,
+    SerializerMethodField,
 )
 from rest_framework.generics import get_object_or_404
 from rest_framework.relations import SlugRelatedField
-from rest_framework.serializers import ModelSerializer, Serializer
+from rest_framework.serializers import (
+    ListSerializer,
+    ModelSerializer,
+    Serializer,
+)
 
-from reviews.models import Category, Comment, Genre, Title, Review, User
+from api.v1.mixins import get_list_param
+from reviews.models import (
+    SCORE_MAX,
+    SCORE_MIN,
+    get_current_year,
+    Category,
+    ChangeLog,
+    Comment,
+    DeletionTask,
+    Genre,
+    Title,
+    Review,
+    User,
+)
 from reviews.validators import username_validator
 
 
+class SparseFieldsMixin:
+    """Ограничение полей ответа параметрами `fields` и `omit`.
+
+    Применяется только к корневому сериализатору GET-запроса, вложенные
+    сериализаторы выводятся полностью.
+    """
+
+    def is_root(self):
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method != "GET" or not self.is_root():
+            return fields
+        requested = get_list_param(request, "fields")
+        omitted = get_list_param(request, "omit")
+        for name in list(fields):
+            if (requested and name not in requested) or name in omitted:
+                del fields[name]
+        return fields
+
+
+class ExpandMixin:
+    """Встраивание связанных объектов по параметру `expand`.
+
+    Путь вложенного сериализатора (например, `reviews.comments`)
+    сравнивается с развёрнутыми путями из контекста. Данные берутся из
+    атрибута `expanded_<name>`, который заполняет предзагрузка во view.
+    """
+
+    def get_expandable_fields(self):
+        return {}
+
+    def get_expand_path(self):
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return path[::-1]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = self.context.get("expand") or ()
+        prefix = self.get_expand_path()
+        for name, serializer_class in self.get_expandable_fields().items():
+            if ".".join((*prefix, name)) in expand:
+                fields[name] = serializer_class(
+                    many=True,
+                    read_only=True,
+                    source=f"expanded_{name}",
+                )
+        return fields
+
+
 class GenreSerializer(ModelSerializer):
     """Сериализатор для жанров."""
 
@@ -27,7 +111,7 @@ class CategorySerializer(ModelSerializer):
 
     class Meta:
         model = Category
-        exclude = ("id",)
+        exclude = ("id", "is_hidden")
 
 
 class TitleSerializer(ModelSerializer):
@@ -35,16 +119,19 @@ class TitleSerializer(ModelSerializer):
 
     class Meta:
         model = Title
-        fields = "__all__"
+        exclude = ("is_hidden",)
 
 
-class TitleGetSerializer(TitleSerializer):
+class TitleGetSerializer(SparseFieldsMixin, ExpandMixin, TitleSerializer):
     """Сериализатор для получения произведений."""
 
     category = CategorySerializer()
     genre = GenreSerializer(many=True)
     rating = IntegerField()
 
+    def get_expandable_fields(self):
+        return {"reviews": ReviewSerializer}
+
     def get_fields(self):
         fields = super().get_fields()
         for field in fields.values():
@@ -56,7 +143,7 @@ class TitleWriteSerializer(TitleSerializer):
     """Сериализатор для изменения произведений."""
 
     category = SlugRelatedField(
-        queryset=Category.objects.all(),
+        queryset=Category.objects.filter(is_hidden=False),
         slug_field="slug",
     )
     genre = SlugRelatedField(
@@ -66,7 +153,7 @@ class TitleWriteSerializer(TitleSerializer):
     )
 
 
-class AuthorSerializer(ModelSerializer):
+class AuthorSerializer(SparseFieldsMixin, ModelSerializer):
     """Базовый сериализатор поля author."""
 
     author = SlugRelatedField(
@@ -79,9 +166,12 @@ class AuthorSerializer(ModelSerializer):
         fields = "__all__"
 
 
-class ReviewSerializer(AuthorSerializer):
+class ReviewSerializer(ExpandMixin, AuthorSerializer):
     """Сериализатор для отзывов."""
 
+    def get_expandable_fields(self):
+        return {"comments": CommentSerializer}
+
     def validate(self, data):
         request = self.context.get("request")
         if request.method != "POST":
@@ -89,7 +179,10 @@ class ReviewSerializer(AuthorSerializer):
         title = get_object_or_404(
             Title, pk=self.context["view"].kwargs.get("title_id")
         )
-        if title.reviews.filter(author=request.user).exists():
+        if title.reviews.filter(author=request.user).exists() or (
+            settings.REVIEW_ARCHIVE_ENABLED
+            and title.archived_reviews.filter(author=request.user).exists()
+        ):
             raise ValidationError(
                 "Можно оставить только один отзыв на произведение!"
             )
@@ -108,6 +201,57 @@ class CommentSerializer(AuthorSerializer):
         read_only_fields = ("review",)
 
 
+class BulkItemSerializer(Serializer):
+    """Базовый сериализатор элемента пакетной загрузки."""
+
+    author = CharField(max_length=settings.LENGTH_L)
+    text = CharField()
+
+
+class ReviewBulkItemSerializer(BulkItemSerializer):
+    """Сериализатор элемента пакетной загрузки отзывов."""
+
+    title = IntegerField(min_value=1)
+    score = IntegerField(min_value=SCORE_MIN, max_value=SCORE_MAX)
+
+
+class CommentBulkItemSerializer(BulkItemSerializer):
+    """Сериализатор элемента пакетной загрузки комментариев."""
+
+    review = IntegerField(min_value=1)
+
+
+class TitleBulkItemSerializer(Serializer):
+    """Сериализатор элемента пакетного обновления произведений."""
+
+    external_id = CharField(max_length=settings.LENGTH_M)
+    name = CharField(max_length=settings.LENGTH_XXL)
+    year = IntegerField(
+        min_value=0,
+        validators=[MaxValueValidator(get_current_year)],
+    )
+    description = CharField(allow_blank=True, default="")
+    category = CharField(
+        max_length=settings.LENGTH_M,
+        allow_null=True,
+        default=None,
+    )
+    genre = ListField(
+        child=CharField(max_length=settings.LENGTH_M),
+        default=list,
+    )
+
+
+class BulkSerializer(Serializer):
+    """Сериализатор пакета элементов для загрузки."""
+
+    items = ListField(
+        child=DictField(),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_ITEMS,
+    )
+
+
 class SignUpSerializer(Serializer):
     """Сериализатор регистрации пользователя."""
 
@@ -167,3 +311,73 @@ class UserSerializer(AdminUserSerializer):
 
     class Meta(AdminUserSerializer.Meta):
         read_only_fields = ("role",)
+
+
+class BatchItemSerializer(Serializer):
+    """Сериализатор вложенного запроса пакета."""
+
+    method = ChoiceField(choices=("GET", "POST", "PUT", "PATCH", "DELETE"))
+    path = CharField(max_length=settings.LENGTH_XL)
+    body = JSONField(required=False)
+
+
+class BatchSerializer(Serializer):
+    """Сериализатор пакета запросов."""
+
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    parallel = BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise ValidationError(
+                f"Не более {settings.BATCH_MAX_REQUESTS} запросов в пакете."
+            )
+        return value
+
+
+class ChangeLogSerializer(ModelSerializer):
+    """Сериализатор записи журнала изменений."""
+
+    cursor = IntegerField(source="id")
+    id = IntegerField(source="object_id")
+
+    class Meta:
+        model = ChangeLog
+        fields = ("cursor", "model", "id", "action", "created_at")
+
+
+class DeletionTaskSerializer(ModelSerializer):
+    """Сериализатор задачи фонового удаления."""
+
+    progress = SerializerMethodField()
+
+    class Meta:
+        model = DeletionTask
+        fields = (
+            "id",
+            "model",
+            "object_id",
+            "status",
+            "total",
+            "deleted",
+            "progress",
+            "error",
+            "created_at",
+            "updated_at",
+        )
+
+    def get_progress(self, task):
+        if task.status == DeletionTask.DONE or not task.total:
+            return 1.0
+        return round(min(task.deleted / task.total, 1.0), 3)
+
+
+class ChangesQuerySerializer(Serializer):
+    """Сериализатор параметров ленты изменений."""
+
+    since = IntegerField(min_value=0, default=0)
+    limit = IntegerField(
+        min_value=1,
+        max_value=settings.CHANGES_MAX_LIMIT,
+        default=settings.CHANGES_DEFAULT_LIMIT,
+    )
@@ -1,7 +1,7 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 
-from api.v1 import views
+from api.v1 import async_views, views
 
 
 reviews_url = r"titles/(?P<title_id>\d+)/reviews"
@@ -15,13 +15,61 @@ router.register("genres", views.GenreViewSet)
 router.register("categories", views.CategoriesViewSet)
 router.register(reviews_url, views.ReviewViewSet, basename="reviews")
 router.register(comments_url, views.CommentViewSet, basename="comments")
+router.register("deletions", views.DeletionTaskViewSet)
 
 auth_urls = [
     path("signup/", views.UserSignUp.as_view(), name="signup"),
     path("token/", views.UserGetToken.as_view(), name="token"),
 ]
 
+async_urls = [
+    path("titles/", async_views.title_list, name="async-titles-list"),
+    re_path(
+        r"^titles/(?P<pk>\d+)/$",
+        async_views.title_detail,
+        name="async-titles-detail",
+    ),
+    re_path(
+        rf"^{reviews_url}/$",
+        async_views.review_list,
+        name="async-reviews-list",
+    ),
+    re_path(
+        rf"^{reviews_url}/(?P<pk>\d+)/$",
+        async_views.review_detail,
+        name="async-reviews-detail",
+    ),
+    re_path(
+        rf"^{comments_url}/$",
+        async_views.comment_list,
+        name="async-comments-list",
+    ),
+    re_path(
+        rf"^{comments_url}/(?P<pk>\d+)/$",
+        async_views.comment_detail,
+        name="async-comments-detail",
+    ),
+]
+
 urlpatterns = [
     path("", include(router.urls)),
     path("auth/", include(auth_urls)),
+    path("async/", include(async_urls)),
+    path("batch/", views.BatchView.as_view(), name="batch"),
+    path("changes/", views.ChangesView.as_view(), name="changes"),
+    path(
+        "metrics/writes/",
+        views.WriteMetricsView.as_view(),
+        name="metrics-writes",
+    ),
+    path(
+        "reviews/bulk/",
+        views.ReviewBulkCreate.as_view(),
+        name="reviews-bulk",
+    ),
+    path(
+        "comments/bulk/",
+        views.CommentBulkCreate.as_view(),
+        name="comments-bulk",
+    ),
 ]
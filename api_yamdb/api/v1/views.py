@@ -1,12 +1,13 @@
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
-from django.db.models import Avg
+from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -14,12 +15,52 @@ from rest_framework_simplejwt.tokens import AccessToken
 
 from api.v1 import permissions as pm
 from api.v1 import serializers as sl
-from api.v1.filters import TitleFilter
-from api.v1.mixins import GenreCategoryMixin
-from reviews.models import Title, Genre, Category, Review, User
-
-
-class TitleViewSet(viewsets.ModelViewSet):
+from api.v1.batch import run_batch
+from api.v1.bulk import (
+    bulk_create_comments,
+    bulk_create_reviews,
+    bulk_upsert_titles,
+)
+from api.v1.filters import StableOrderingFilter, TitleFilter
+from api.v1.mixins import (
+    ArchiveFallbackMixin,
+    BatchRetrieveMixin,
+    DeferredDestroyMixin,
+    ExpandViewMixin,
+    GenreCategoryMixin,
+    ReplicaReadMixin,
+    SerializedWriteMixin,
+    SparseFieldsViewMixin,
+    limit_per_parent,
+    serialized_write,
+)
+from api.v1.parsers import NDJSONParser
+from reviews.db import write_gate
+from reviews.jobs import enqueue
+from reviews.routers import route_related
+from reviews.shards import fan_out, in_bulk_everywhere, title_reviews_database
+from reviews.models import (
+    ArchivedComment,
+    ArchivedReview,
+    Category,
+    ChangeLog,
+    Comment,
+    DeletionTask,
+    Genre,
+    Review,
+    Title,
+    User,
+)
+
+
+class TitleViewSet(
+    ReplicaReadMixin,
+    DeferredDestroyMixin,
+    BatchRetrieveMixin,
+    ExpandViewMixin,
+    SparseFieldsViewMixin,
+    viewsets.ModelViewSet,
+):
     """Управление произведениями.
 
     Позволяет просматривать, создавать, обновлять и удалять произведения.
@@ -29,19 +70,54 @@ class TitleViewSet(viewsets.ModelViewSet):
 
     serializer_class = sl.TitleGetSerializer
     permission_classes = (pm.IsAdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, StableOrderingFilter)
     filterset_class = TitleFilter
+    ordering_fields = ("rating", "year", "name")
+    ordering = ("id",)
+    select_related_fields = ("category",)
+    prefetch_related_fields = ("genre",)
+    expandable_relations = {
+        "reviews": ("title", Review.objects.select_related("author")),
+        "reviews.comments": (
+            "review",
+            Comment.objects.select_related("author"),
+        ),
+    }
 
     def get_queryset(self):
-        return Title.objects.annotate(rating=Avg("reviews__score")).order_by(
-            "id"
-        )
+        return Title.objects.filter(is_hidden=False)
 
     def get_serializer_class(self):
         if self.request.method == "GET":
             return sl.TitleGetSerializer
         return sl.TitleWriteSerializer
 
+    @action(
+        detail=False,
+        methods=("put",),
+        url_path="bulk",
+        parser_classes=(JSONParser, NDJSONParser),
+    )
+    def bulk(self, request):
+        """Пакетно создать или обновить произведения.
+
+        Параметры:
+            - request: Запрос с JSON-массивом или NDJSON произведений,
+            идентифицируемых полем `external_id`.
+
+        Возвращает:
+            - response: Ответ с числом созданных, обновлённых и
+            неизменённых произведений, ошибками по индексам и
+            показателями производительности.
+
+        Исключения:
+            - Http400: Тело запроса не является непустым списком.
+        """
+        serializer = sl.BulkSerializer(data={"items": request.data})
+        serializer.is_valid(raise_exception=True)
+        result = bulk_upsert_titles(serializer.validated_data["items"])
+        return Response(result, status=status.HTTP_200_OK)
+
 
 class GenreViewSet(GenreCategoryMixin):
     """Управление жанрами.
@@ -56,7 +132,7 @@ class GenreViewSet(GenreCategoryMixin):
     filter_backends = (SearchFilter,)
 
 
-class CategoriesViewSet(GenreCategoryMixin):
+class CategoriesViewSet(DeferredDestroyMixin, GenreCategoryMixin):
     """Управление категориями.
 
     Позволяет просматривать, создавать и удалять категории.
@@ -64,12 +140,20 @@ class CategoriesViewSet(GenreCategoryMixin):
     остальные пользователи могут только просматривать данные.
     """
 
-    queryset = Category.objects.all()
+    queryset = Category.objects.filter(is_hidden=False)
     serializer_class = sl.CategorySerializer
     filter_backends = (SearchFilter,)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(
+    ReplicaReadMixin,
+    ArchiveFallbackMixin,
+    SerializedWriteMixin,
+    BatchRetrieveMixin,
+    ExpandViewMixin,
+    SparseFieldsViewMixin,
+    viewsets.ModelViewSet,
+):
     """Управление отзывами.
 
     Позволяет просматривать, создавать, обновлять и удалять отзывы.
@@ -81,18 +165,57 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
     serializer_class = sl.ReviewSerializer
     permission_classes = (pm.IsAuthorModeratorAdminOrReadOnly,)
+    select_related_fields = ("author",)
+    archive_model = ArchivedReview
+    archive_filter = {"title_id": "title_id"}
+    expandable_relations = {
+        "comments": ("review", Comment.objects.select_related("author")),
+    }
 
     def get_title(self):
-        return get_object_or_404(Title, pk=self.kwargs.get("title_id"))
+        return get_object_or_404(
+            Title.objects.filter(is_hidden=False),
+            pk=self.kwargs.get("title_id"),
+        )
 
     def get_queryset(self):
         return self.get_title().reviews.all()
 
+    def prepare_archived(self, reviews):
+        """Встроить архивные комментарии в архивные отзывы страницы."""
+        if not reviews or "comments" not in self.get_expand():
+            return
+        comments = {}
+        for comment in route_related(
+            limit_per_parent(
+                ArchivedComment.objects.using(reviews[0]._state.db)
+                .filter(review_id__in=[review.pk for review in reviews])
+                .select_related("author"),
+                "review",
+                self.get_expand_limit("comments"),
+            )
+        ):
+            comments.setdefault(comment.review_id, []).append(comment)
+        for review in reviews:
+            review.expanded_comments = comments.get(review.pk, [])
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, title=self.get_title())
+        title = self.get_title()
+        serialized_write(
+            serializer.save,
+            author=self.request.user,
+            title=title,
+            using=self.get_write_database(title),
+        )
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(
+    ReplicaReadMixin,
+    ArchiveFallbackMixin,
+    SerializedWriteMixin,
+    SparseFieldsViewMixin,
+    viewsets.ModelViewSet,
+):
     """Управление комментариями.
 
     Позволяет просматривать, создавать, обновлять и удалять комментарии.
@@ -104,32 +227,89 @@ class CommentViewSet(viewsets.ModelViewSet):
 
     serializer_class = sl.CommentSerializer
     permission_classes = (pm.IsAuthorModeratorAdminOrReadOnly,)
+    select_related_fields = ("author",)
+    archive_model = ArchivedComment
+    archive_filter = {"review_id": "review_id"}
 
     def get_review(self):
-        return get_object_or_404(Review, pk=self.kwargs.get("review_id"))
+        """Отзыв из URL; для списка комментариев — и из архива."""
+        database = title_reviews_database(self.kwargs.get("title_id"))
+        review_id = self.kwargs.get("review_id")
+        try:
+            return get_object_or_404(
+                Review.objects.using(database), pk=review_id
+            )
+        except Http404:
+            if self.action != "list" or not settings.REVIEW_ARCHIVE_ENABLED:
+                raise
+        return get_object_or_404(
+            ArchivedReview.objects.using(database), pk=review_id
+        )
 
     def get_queryset(self):
-        return self.get_review().comments.all().select_related("author")
+        review = self.get_review()
+        return Comment.objects.using(review._state.db).filter(
+            review_id=review.pk
+        )
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, review=self.get_review())
+        review = self.get_review()
+        serialized_write(
+            serializer.save,
+            author=self.request.user,
+            review=review,
+            using=self.get_write_database(review),
+        )
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(
+    DeferredDestroyMixin, BatchRetrieveMixin, viewsets.ModelViewSet
+):
     """Управление данными пользователей.
 
     Класс представления для работы с данными пользователей.
     Позволяет просматривать, создавать, обновлять и удалять пользователей.
     """
 
-    queryset = User.objects.all()
+    queryset = User.objects.filter(is_hidden=False)
     serializer_class = sl.AdminUserSerializer
     permission_classes = (pm.IsAdmin,)
     filter_backends = (SearchFilter,)
     search_fields = ("username",)
     lookup_field = "username"
+    batch_param = "usernames"
     http_method_names = ("get", "post", "delete", "patch")
 
+    @action(detail=True, methods=("get",))
+    def reviews(self, request, username=None):
+        """Отзывы пользователя из всех БД отзывов, новые первыми.
+
+        Отзывы распределены по шардам произведений, поэтому id и даты
+        отзывов пользователя читаются со всех шардов параллельно,
+        сливаются, а страница загружается отдельным запросом `__in`.
+        """
+        user = self.get_object()
+        found = fan_out(
+            lambda alias: list(
+                Review.objects.using(alias)
+                .filter(author_id=user.pk)
+                .values_list("pub_date", "pk")
+            )
+        )
+        merged = sorted(
+            (row for rows in found for row in rows), reverse=True
+        )
+        page = self.paginate_queryset([pk for _, pk in merged])
+        reviews = in_bulk_everywhere(
+            route_related(Review.objects.select_related("author")), page
+        )
+        serializer = sl.ReviewSerializer(
+            [reviews[pk] for pk in page if pk in reviews],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         methods=("get", "patch"),
@@ -176,12 +356,15 @@ class UserSignUp(APIView):
         Возвращает:
             - None
         """
-        send_mail(
+        # В очереди ошибка отправки приводит к повтору задачи.
+        enqueue(
+            send_mail,
+            priority=10,
             subject="Код подтверждения",
             message=f"Код для подтверждения регистрации: {confirmation_code}",
             from_email=settings.EMAIL_YAMDB,
             recipient_list=[email],
-            fail_silently=True,
+            fail_silently=settings.JOBS_ALWAYS_EAGER,
         )
 
     def post(self, request):
@@ -199,7 +382,9 @@ class UserSignUp(APIView):
         """
         serializer = sl.SignUpSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user, _ = User.objects.get_or_create(**serializer.validated_data)
+        user, _ = serialized_write(
+            User.objects.get_or_create, **serializer.validated_data
+        )
         confirmation_code = default_token_generator.make_token(user)
         self.send_code(user.email, confirmation_code)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -232,3 +417,131 @@ class UserGetToken(APIView):
             return Response(msg, status=status.HTTP_400_BAD_REQUEST)
         msg = {"token": str(AccessToken.for_user(user))}
         return Response(msg, status=status.HTTP_200_OK)
+
+
+class BatchView(APIView):
+    """Выполнить несколько запросов к API за один HTTP-запрос."""
+
+    def post(self, request):
+        """Выполнить пакет запросов.
+
+        Параметры:
+            - request: Запрос со списком `requests` из объектов
+            (`method`, `path`, `body`) и флагом `parallel`.
+
+        Возвращает:
+            - response: Ответ со списком статусов и тел вложенных ответов
+            в порядке запросов.
+
+        Исключения:
+            - Http400: Пакет пуст, слишком велик или содержит
+            некорректные запросы.
+        """
+        serializer = sl.BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = run_batch(
+            request._request,
+            serializer.validated_data["requests"],
+            parallel=serializer.validated_data["parallel"],
+        )
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class BulkCreateView(APIView):
+    """Базовое представление пакетной загрузки.
+
+    Доступно только администратору. Возвращает число созданных объектов
+    и ошибки по индексам элементов.
+    """
+
+    permission_classes = (pm.IsAdmin,)
+    bulk_create = None
+
+    def post(self, request):
+        """Создать объекты из списка `items`.
+
+        Параметры:
+            - request: Запрос со списком `items`.
+
+        Возвращает:
+            - response: Ответ с числом созданных объектов и ошибками
+            по индексам элементов.
+
+        Исключения:
+            - Http400: Список пуст или превышает допустимый размер.
+        """
+        serializer = sl.BulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = self.bulk_create(serializer.validated_data["items"])
+        return Response(result, status=status.HTTP_201_CREATED)
+
+
+class ReviewBulkCreate(BulkCreateView):
+    """Пакетная загрузка отзывов."""
+
+    bulk_create = staticmethod(bulk_create_reviews)
+
+
+class CommentBulkCreate(BulkCreateView):
+    """Пакетная загрузка комментариев."""
+
+    bulk_create = staticmethod(bulk_create_comments)
+
+
+class ChangesView(APIView):
+    """Лента изменений для инкрементальной синхронизации."""
+
+    def get(self, request):
+        """Получить изменения после курсора.
+
+        Параметры:
+            - request: Запрос с курсором `since` и размером страницы
+            `limit`.
+
+        Возвращает:
+            - response: Ответ со списком изменений в порядке фиксации и
+            курсором `next` для следующего запроса.
+
+        Исключения:
+            - Http400: Параметры запроса некорректны.
+        """
+        params = sl.ChangesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        since, limit = params.validated_data.values()
+        changes = list(
+            ChangeLog.objects.filter(id__gt=since).order_by("id")[:limit]
+        )
+        return Response(
+            {
+                "results": sl.ChangeLogSerializer(changes, many=True).data,
+                "next": changes[-1].id if changes else since,
+                "has_more": len(changes) == limit,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class WriteMetricsView(APIView):
+    """Показатели очереди записей процесса."""
+
+    permission_classes = (pm.IsAdmin,)
+
+    def get(self, request):
+        """Получить показатели очереди записей.
+
+        Параметры:
+            - request: Запрос администратора.
+
+        Возвращает:
+            - response: Ответ с числом записей, повторов и отказов и
+            временем ожидания блокировки записи в текущем процессе.
+        """
+        return Response(write_gate.stats(), status=status.HTTP_200_OK)
+
+
+class DeletionTaskViewSet(viewsets.ReadOnlyModelViewSet):
+    """Просмотр задач фонового удаления и их прогресса."""
+
+    queryset = DeletionTask.objects.all()
+    serializer_class = sl.DeletionTaskSerializer
+    permission_classes = (pm.IsAdmin,)
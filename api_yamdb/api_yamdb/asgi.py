@@ -4,4 +4,11 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api_yamdb.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.v1.events import EventStreamRouter  # noqa: E402
+from reviews.title_index import title_index  # noqa: E402
+
+title_index.warm_up()
+
+application = EventStreamRouter(django_application)
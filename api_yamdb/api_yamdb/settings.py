@@ -60,9 +60,30 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    "reviews": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "reviews.sqlite3",
+    },
+    "default_replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.replica.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    },
 }
 
+REVIEW_SHARD_COUNT = 2
+for index in range(REVIEW_SHARD_COUNT):
+    DATABASES[f"reviews_{index}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"reviews_{index}.sqlite3",
+    }
+
+DATABASE_ROUTERS = [
+    "reviews.routers.ReplicaRouter",
+    "reviews.routers.ReviewsRouter",
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -120,3 +141,93 @@ LENGTH_XL: int = 254
 LENGTH_XXL: int = 256
 
 USER_READ_EDIT_URL = "me"
+
+# Индекс жанров в памяти процесса: прогревается при старте WSGI/ASGI
+# приложения, а изменения других процессов догоняет по журналу
+# изменений; при большем числе новых записей журнала перестраивается.
+TITLE_INDEX_ENABLED = False
+TITLE_INDEX_MAX_IDS = 500
+TITLE_INDEX_MAX_CHANGES = 1000
+
+EXPAND_DEFAULT_LIMIT = 10
+EXPAND_MAX_LIMIT = 50
+
+BATCH_MAX_IDS = 100
+
+BATCH_URL = "/api/v1/batch/"
+BATCH_PATH_PREFIX = "/api/v1/"
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+BULK_MAX_ITEMS = 5000
+BULK_BATCH_SIZE = 500
+
+CHANGES_DEFAULT_LIMIT = 100
+CHANGES_MAX_LIMIT = 1000
+
+# Лента событий SSE (только ASGI): опрос журнала изменений раз в
+# SSE_POLL_INTERVAL секунд на процесс и пинг клиентов.
+SSE_POLL_INTERVAL = 1
+SSE_HEARTBEAT_INTERVAL = 15
+SSE_QUEUE_SIZE = 100
+SSE_BATCH_SIZE = 500
+
+# Пул потоков асинхронных эндпоинтов чтения /api/v1/async/.
+ASYNC_READ_MAX_WORKERS = 8
+
+# Профиль SQLite (WAL, ожидание блокировки, mmap, кэш), применяется к
+# каждому новому соединению с файлом БД.
+SQLITE_PERFORMANCE_PROFILE = False
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+}
+
+# Очередь записей процесса: ожидание блокировки и повторы при
+# «database is locked» с экспоненциальной задержкой со случайным разбросом.
+WRITE_LOCK_TIMEOUT = 10
+WRITE_RETRY_ATTEMPTS = 4
+WRITE_RETRY_BACKOFF = 0.05
+WRITE_RETRY_MAX_BACKOFF = 1
+
+# Отзывы и комментарии в отдельной БД: REVIEWS_DATABASE = "reviews" и
+# `manage.py migrate --database reviews`. None — всё в `default`.
+REVIEWS_DATABASE = None
+
+# Шарды отзывов и комментариев по id произведения, например
+# [f"reviews_{index}" for index in range(REVIEW_SHARD_COUNT)], каждый
+# мигрируется через `migrate --database`. Пусто — шардирования нет.
+REVIEW_SHARDS = []
+REVIEW_SHARD_ID_SPAN = 10**12
+
+# Архив старых отзывов и комментариев (`manage.py archivereviews`):
+# вложенные списки дочитывают архив после рабочих строк, рейтинг и
+# проверка повторного отзыва учитывают архивные отзывы.
+REVIEW_ARCHIVE_ENABLED = False
+REVIEW_ARCHIVE_AFTER_DAYS = 365
+
+# Удаление произведения, категории или пользователя, затрагивающее больше
+# DELETION_SYNC_LIMIT строк, выполняется в фоне (`manage.py purgedeleted`)
+# пакетами по DELETION_CHUNK_SIZE строк; API сразу отвечает 202. При
+# JOBS_ALWAYS_EAGER фонового обработчика нет, и удаление выполняется сразу.
+DELETION_SYNC_LIMIT = 1000
+DELETION_CHUNK_SIZE = 500
+
+# Очередь фоновых задач в БД (`manage.py runworker`). В режиме
+# JOBS_ALWAYS_EAGER задачи выполняются в процессе сразу после фиксации
+# транзакции — для разработки и тестов без обработчика.
+JOBS_ALWAYS_EAGER = True
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_BACKOFF = 5
+JOBS_VISIBILITY_TIMEOUT = 300
+JOBS_WORKER_THREADS = 4
+
+# Реплики для чтения: {"default": ["default_replica"]}. Копии основной
+# БД обновляет `manage.py syncreplicas`; после записи пользователь
+# REPLICA_STICKY_SECONDS секунд читает с основной БД.
+REPLICA_DATABASES = {}
+REPLICA_STICKY_SECONDS = 10
@@ -0,0 +1,61 @@
+import os
+from pathlib import Path
+
+from api_yamdb.settings import *  # noqa: F401,F403
+from api_yamdb.settings import BASE_DIR, DATABASES, MIDDLEWARE
+
+SECRET_KEY = os.environ["DJANGO_SECRET_KEY"]
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.getenv("DJANGO_ALLOWED_HOSTS", "localhost").split(",")
+
+# Каталог файлов SQLite и файлового кэша. Общий том позволяет
+# обработчику очереди в отдельном контейнере работать с той же БД.
+DATA_DIR = Path(os.getenv("DJANGO_DATA_DIR", BASE_DIR))
+for database in DATABASES.values():
+    database["NAME"] = DATA_DIR / Path(database["NAME"]).name
+
+# Соединение с БД переиспользуется запросами одного потока вместо
+# открытия нового на каждый запрос.
+DATABASES["default"]["CONN_MAX_AGE"] = int(
+    os.getenv("DJANGO_CONN_MAX_AGE", 600)
+)
+
+# Статику (админка, redoc.yaml) раздаёт само приложение.
+MIDDLEWARE = [
+    MIDDLEWARE[0],
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    *MIDDLEWARE[1:],
+]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+STATICFILES_STORAGE = (
+    "whitenoise.storage.CompressedManifestStaticFilesStorage"
+)
+
+TITLE_INDEX_ENABLED = os.getenv("TITLE_INDEX_ENABLED", "") == "1"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "root": {"handlers": ["console"], "level": "WARNING"},
+}
+
+SQLITE_PERFORMANCE_PROFILE = True
+
+# Отдельная БД отзывов: перед запуском `manage.py migrate --database reviews`.
+if os.getenv("DJANGO_REVIEWS_DATABASE", "") == "1":
+    REVIEWS_DATABASE = "reviews"
+
+# Кэш общий для процессов gunicorn: окно чтения с основной БД после
+# записи должно действовать во всех рабочих процессах.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": DATA_DIR / "cache",
+    }
+}
+
+# Письма и фоновые удаления выполняет `manage.py runworker`.
+JOBS_ALWAYS_EAGER = os.getenv("DJANGO_JOBS_ALWAYS_EAGER", "") == "1"
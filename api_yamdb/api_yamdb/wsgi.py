@@ -5,3 +5,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api_yamdb.settings")
 
 application = get_wsgi_application()
+
+from reviews.title_index import title_index  # noqa: E402
+
+title_index.warm_up()
@@ -1,13 +1,100 @@
+from contextlib import nullcontext
+
 from django.contrib import admin
+from django.contrib.admin.utils import unquote
+from django.core.exceptions import ValidationError
 
 from reviews.models import Title, Category, Genre, Review, Comment, User
+from reviews.shards import is_sharded, pinned_shard, review_shards
 
 
-@admin.register(Title, Category, Genre, Review, Comment)
+@admin.register(Title, Category, Genre)
 class ReviewsAdmin(admin.ModelAdmin):
     ...
 
 
+class ShardFilter(admin.SimpleListFilter):
+    """Выбор шарда в списке отзывов и комментариев (без шардов скрыт)."""
+
+    title = "шард"
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in review_shards()]
+
+    def value(self):
+        shards = review_shards()
+        value = super().value()
+        return value if value in shards else next(iter(shards), None)
+
+    def choices(self, changelist):
+        for lookup, title in self.lookup_choices:
+            yield {
+                "selected": self.value() == lookup,
+                "query_string": changelist.get_query_string(
+                    {self.parameter_name: lookup}
+                ),
+                "display": title,
+            }
+
+    def queryset(self, request, queryset):
+        # Шард выбран в ShardedAdmin.changelist_view.
+        return queryset
+
+
+@admin.register(Review, Comment)
+class ShardedAdmin(admin.ModelAdmin):
+    """Отзывы и комментарии, в том числе распределённые по шардам.
+
+    Запросы интерфейса не несут объекта, по которому выбирается шард,
+    поэтому каждое представление выполняется в `pinned_shard`: список —
+    в шарде из фильтра (по умолчанию первом), страницы объекта — в
+    шарде, где найден его id (id уникальны во всех шардах).
+    """
+
+    list_filter = (ShardFilter,)
+
+    def request_shard(self, request, object_id=None):
+        """Шард объекта `object_id` или выбранный фильтром шард списка."""
+        shards = review_shards()
+        if object_id is None:
+            alias = request.GET.get(ShardFilter.parameter_name)
+            return alias if alias in shards else shards[0]
+        try:
+            pk = self.model._meta.pk.to_python(unquote(object_id))
+        except ValidationError:
+            return shards[0]
+        for alias in shards:
+            if self.model.objects.using(alias).filter(pk=pk).exists():
+                return alias
+        return shards[0]
+
+    def pinned(self, request, object_id=None):
+        if not is_sharded():
+            return nullcontext()
+        return pinned_shard(self.request_shard(request, object_id))
+
+    def changelist_view(self, request, extra_context=None):
+        with self.pinned(request):
+            return super().changelist_view(request, extra_context)
+
+    def changeform_view(
+        self, request, object_id=None, form_url="", extra_context=None
+    ):
+        with self.pinned(request, object_id):
+            return super().changeform_view(
+                request, object_id, form_url, extra_context
+            )
+
+    def delete_view(self, request, object_id, extra_context=None):
+        with self.pinned(request, object_id):
+            return super().delete_view(request, object_id, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        with self.pinned(request, object_id):
+            return super().history_view(request, object_id, extra_context)
+
+
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     """Интерфейс управления пользователями."""
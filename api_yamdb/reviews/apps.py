@@ -5,3 +5,14 @@ class ReviewsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "reviews"
     verbose_name = "Ревью"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from reviews import signals  # noqa: F401
+        from reviews.db import configure_sqlite
+        from reviews.shards import init_shard_sequences
+
+        connection_created.connect(configure_sqlite)
+        post_migrate.connect(init_shard_sequences, sender=self)
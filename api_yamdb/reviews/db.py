@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+
+
+def pragma_statements():
+    """PRAGMA-инструкции профиля производительности SQLite."""
+    return [
+        f"PRAGMA {name} = {value}"
+        for name, value in settings.SQLITE_PRAGMAS.items()
+    ]
+
+
+def apply_pragmas(cursor):
+    for statement in pragma_statements():
+        cursor.execute(statement)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Настроить новое соединение с файлом SQLite.
+
+    WAL позволяет читать параллельно с записью, `busy_timeout` ждёт
+    освобождения блокировки вместо немедленной ошибки, остальные
+    PRAGMA уменьшают число обращений к диску. Базы в памяти (тесты)
+    не настраиваются.
+    """
+    if (
+        not settings.SQLITE_PERFORMANCE_PROFILE
+        or connection.vendor != "sqlite"
+        or connection.is_in_memory_db()
+    ):
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor)
+
+
+class WriteUnavailable(Exception):
+    """Запись не выполнена: БД занята дольше допустимого."""
+
+
+def is_locked_error(error):
+    return "locked" in str(error) or "busy" in str(error)
+
+
+class WriteGate:
+    """Очередь записей процесса в SQLite.
+
+    SQLite допускает одного писателя на файл, поэтому одновременные
+    записи потоков процесса выстраиваются в очередь на блокировке, а
+    запись, столкнувшаяся с блокировкой другого процесса, повторяется
+    с экспоненциальной задержкой со случайным разбросом. Время ожидания
+    блокировки и число повторов накапливаются в `stats()`.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {
+                "writes": 0,
+                "retries": 0,
+                "failures": 0,
+                "lock_waits": 0,
+                "lock_wait_total_ms": 0.0,
+                "lock_wait_max_ms": 0.0,
+            }
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        waits = stats["lock_waits"]
+        stats["lock_wait_avg_ms"] = round(
+            stats["lock_wait_total_ms"] / waits if waits else 0, 3
+        )
+        stats["lock_wait_total_ms"] = round(stats["lock_wait_total_ms"], 3)
+        stats["lock_wait_max_ms"] = round(stats["lock_wait_max_ms"], 3)
+        return stats
+
+    def _record(self, key, waited=None):
+        with self._stats_lock:
+            if key:
+                self._stats[key] += 1
+            if waited is not None:
+                waited *= 1000
+                self._stats["lock_waits"] += 1
+                self._stats["lock_wait_total_ms"] += waited
+                self._stats["lock_wait_max_ms"] = max(
+                    self._stats["lock_wait_max_ms"], waited
+                )
+
+    def _lock(self, using):
+        """Блокировка записи БД `using`, одна на процесс.
+
+        Создание защищено отдельной блокировкой: иначе потоки, первыми
+        пишущие в новую БД, могли бы получить разные блокировки.
+        """
+        with self._locks_lock:
+            if using not in self._locks:
+                self._locks[using] = threading.Lock()
+            return self._locks[using]
+
+    def _attempt(self, func, using, args, kwargs):
+        lock = self._lock(using)
+        started = time.monotonic()
+        acquired = lock.acquire(timeout=settings.WRITE_LOCK_TIMEOUT)
+        self._record(None, time.monotonic() - started)
+        if not acquired:
+            self._record("failures")
+            raise WriteUnavailable
+        try:
+            with transaction.atomic(using=using):
+                return func(*args, **kwargs)
+        finally:
+            lock.release()
+
+    def run(self, func, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+        """Выполнить `func` в транзакции под блокировкой записи.
+
+        Внутри внешней транзакции повтор невозможен, поэтому `func`
+        выполняется один раз. Исключения:
+            - WriteUnavailable: блокировка не получена или БД занята
+            после всех повторов.
+        """
+        if connections[using].in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(settings.WRITE_RETRY_ATTEMPTS):
+            if attempt:
+                self._record("retries")
+                time.sleep(
+                    random.uniform(
+                        0,
+                        min(
+                            settings.WRITE_RETRY_MAX_BACKOFF,
+                            settings.WRITE_RETRY_BACKOFF * 2 ** attempt,
+                        ),
+                    )
+                )
+            try:
+                result = self._attempt(func, using, args, kwargs)
+            except OperationalError as error:
+                if not is_locked_error(error):
+                    raise
+                last_error = error
+                continue
+            self._record("writes")
+            return result
+        self._record("failures")
+        raise WriteUnavailable from last_error
+
+
+write_gate = WriteGate()
@@ -0,0 +1,179 @@
+from django.conf import settings
+from django.db import router
+
+from reviews.db import write_gate
+from reviews.models import (
+    ArchivedComment,
+    ArchivedReview,
+    Category,
+    ChangeLog,
+    Comment,
+    DeletionTask,
+    Review,
+    Title,
+    User,
+)
+from reviews.routers import atomic_on
+from reviews.shards import review_databases
+from reviews.signals import update_title_index
+from reviews.title_index import title_index
+
+
+def title_stages(pk):
+    """Этапы удаления зависимых строк произведения.
+
+    Каждый этап — (БД, модель, условия). Комментарии удаляются раньше
+    своих отзывов, чтобы каждый пакет был ограничен по размеру.
+    """
+    alias = router.db_for_write(Review, instance=Title(pk=pk))
+    reviews = Review.objects.using(alias).filter(title_id=pk)
+    archived = ArchivedReview.objects.using(alias).filter(title_id=pk)
+    return [
+        (alias, Comment, {"review__title_id": pk}),
+        (alias, ArchivedComment, {"review_id__in": reviews.values("pk")}),
+        (alias, ArchivedComment, {"review_id__in": archived.values("pk")}),
+        (alias, Review, {"title_id": pk}),
+        (alias, ArchivedReview, {"title_id": pk}),
+    ]
+
+
+def user_stages(pk):
+    """Этапы удаления отзывов и комментариев пользователя во всех БД."""
+    stages = []
+    for alias in review_databases():
+        reviews = Review.objects.using(alias).filter(author_id=pk)
+        archived = ArchivedReview.objects.using(alias).filter(author_id=pk)
+        stages += [
+            (alias, Comment, {"review__author_id": pk}),
+            (alias, ArchivedComment, {"review_id__in": reviews.values("pk")}),
+            (
+                alias,
+                ArchivedComment,
+                {"review_id__in": archived.values("pk")},
+            ),
+            (alias, Review, {"author_id": pk}),
+            (alias, ArchivedReview, {"author_id": pk}),
+            (alias, Comment, {"author_id": pk}),
+            (alias, ArchivedComment, {"author_id": pk}),
+        ]
+    return stages
+
+
+def category_stages(pk):
+    """Этап отвязки произведений категории (SET_NULL пакетами)."""
+    return [(router.db_for_write(Title), Title, {"category_id": pk})]
+
+
+# Модели, удаление которых может уйти в фон, и этапы их каскада.
+DEFERRED_MODELS = {
+    "title": (Title, title_stages),
+    "user": (User, user_stages),
+    "category": (Category, category_stages),
+}
+
+
+def count_dependents(instance):
+    """Число строк, которые затронет удаление объекта."""
+    _, stages = DEFERRED_MODELS[instance._meta.model_name]
+    return sum(
+        model.objects.using(alias).filter(**lookups).count()
+        for alias, model, lookups in stages(instance.pk)
+    )
+
+
+def schedule_deletion(instance, total):
+    """Скрыть объект и поставить его удаление в очередь.
+
+    Вызывается в транзакции записи. Скрытый объект исчезает из API, а
+    пользователь ещё и теряет доступ.
+    """
+    hidden = {"is_hidden": True}
+    if isinstance(instance, User):
+        hidden["is_active"] = False
+    type(instance).objects.filter(pk=instance.pk).update(**hidden)
+    return DeletionTask.objects.create(
+        model=instance._meta.model_name,
+        object_id=instance.pk,
+        total=total,
+    )
+
+
+def process_chunk(alias, model, lookups, size):
+    """Удалить (или отвязать) до `size` строк одного этапа.
+
+    Строки удаляются через `QuerySet.delete()`, поэтому сигналы пишут
+    журнал изменений и пересчитывают рейтинги и счётчики. Отвязка
+    произведений от категории выполняется запросом UPDATE без сигналов,
+    поэтому журнал и индекс произведений обновляются здесь.
+    """
+    rows = model.objects.using(alias)
+    ids = list(
+        rows.filter(**lookups).order_by().values_list("pk", flat=True)[:size]
+    )
+    if not ids:
+        return 0
+    rows = rows.filter(pk__in=ids)
+    if model is Title:
+        years = dict(rows.values_list("pk", "year"))
+        rows.update(category=None)
+        ChangeLog.record(Title, ids, ChangeLog.UPDATED)
+        for pk, year in years.items():
+            update_title_index(title_index.set_title, pk, None, year)
+        return len(ids)
+    rows.delete()
+    return len(ids)
+
+
+def run_chunk(alias, model, lookups, size):
+    """Выполнить пакет в транзакциях всех затронутых БД."""
+    with atomic_on(
+        router.db_for_write(ChangeLog), router.db_for_write(Title)
+    ):
+        return process_chunk(alias, model, lookups, size)
+
+
+def purge(task, size=None, report=None):
+    """Удалить зависимые строки пакетами, затем сам объект.
+
+    Прогресс сохраняется после каждого пакета, поэтому прерванная
+    задача продолжается с места остановки.
+    """
+    size = size or settings.DELETION_CHUNK_SIZE
+    task.status = DeletionTask.RUNNING
+    task.save(update_fields=("status", "updated_at"))
+    model_class, stages = DEFERRED_MODELS[task.model]
+    for alias, model, lookups in stages(task.object_id):
+        while True:
+            done = write_gate.run(
+                run_chunk, alias, model, lookups, size, using=alias
+            )
+            if not done:
+                break
+            task.deleted += done
+            task.save(update_fields=("deleted", "updated_at"))
+            if report:
+                report(task)
+    instance = model_class.objects.filter(pk=task.object_id).first()
+    if instance is not None:
+        write_gate.run(instance.delete)
+    task.status = DeletionTask.DONE
+    task.save(update_fields=("status", "updated_at"))
+    return task
+
+
+def purge_task(task_id):
+    """Задача очереди: выполнить удаление `DeletionTask` с `task_id`.
+
+    Ошибка записывается в задачу удаления и пробрасывается, чтобы
+    очередь повторила попытку; повтор продолжит с места остановки.
+    """
+    task = DeletionTask.objects.filter(pk=task_id).first()
+    if task is None or task.status == DeletionTask.DONE:
+        return
+    try:
+        purge(task)
+    except Exception as error:
+        task.status = DeletionTask.FAILED
+        task.error = str(error)
+        task.save(update_fields=("status", "error", "updated_at"))
+        raise
@@ -0,0 +1,193 @@
+import logging
+import threading
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from reviews.db import write_gate
+from reviews.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def job_name(func):
+    """Импортируемый путь к функции задачи."""
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *, priority=0, delay=0, max_attempts=None, **payload):
+    """Поставить вызов `func(**payload)` в очередь.
+
+    Аргументы должны сериализоваться в JSON. При `JOBS_ALWAYS_EAGER`
+    функция вызывается сразу после фиксации текущей транзакции, без
+    записи в очередь, и возвращается `None`.
+    """
+    if settings.JOBS_ALWAYS_EAGER:
+        transaction.on_commit(lambda: func(**payload))
+        return None
+    return write_gate.run(
+        Job.objects.create,
+        name=job_name(func),
+        payload=payload,
+        priority=priority,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def expire_abandoned(now):
+    """Завершить ошибкой задачи, исчерпавшие попытки по тайм-ауту.
+
+    Аренда выполняющейся задачи продлевается (см. `keep_lease`), поэтому
+    истекает, только если обработчик остановился.
+    """
+    Job.objects.filter(
+        status=Job.RUNNING,
+        locked_until__lt=now,
+        attempts__gte=F("max_attempts"),
+    ).update(
+        status=Job.FAILED,
+        finished_at=now,
+        last_error="Превышено время выполнения",
+    )
+
+
+def claim(limit, timeout=None):
+    """Арендовать до `limit` готовых задач в порядке приоритета.
+
+    Берутся задачи из очереди и задачи, аренда которых истекла (их
+    обработчик завис или упал). Аренда помечается уникальным ключом,
+    поэтому задачу получает только один обработчик.
+    """
+    timeout = timeout or settings.JOBS_VISIBILITY_TIMEOUT
+
+    def take():
+        now = timezone.now()
+        expire_abandoned(now)
+        ready = Q(status=Job.QUEUED, run_after__lte=now) | Q(
+            status=Job.RUNNING, locked_until__lt=now
+        )
+        ids = list(
+            Job.objects.filter(ready)
+            .order_by("-priority", "run_after", "id")
+            .values_list("pk", flat=True)[:limit]
+        )
+        lease = uuid.uuid4().hex
+        Job.objects.filter(ready, pk__in=ids).update(
+            status=Job.RUNNING,
+            lease=lease,
+            locked_until=now + timedelta(seconds=timeout),
+            attempts=F("attempts") + 1,
+        )
+        return list(
+            Job.objects.filter(lease=lease).order_by("-priority", "id")
+        )
+
+    return write_gate.run(take)
+
+
+def renew(job, timeout):
+    """Продлить аренду выполняющейся задачи на `timeout` секунд.
+
+    Возвращает 0, если аренда уже принадлежит не этому обработчику.
+    """
+    return write_gate.run(
+        lambda: Job.objects.filter(
+            pk=job.pk, lease=job.lease, status=Job.RUNNING
+        ).update(locked_until=timezone.now() + timedelta(seconds=timeout))
+    )
+
+
+def renew_until(job, timeout, stopped):
+    """Продлевать аренду каждую треть тайм-аута до сигнала `stopped`."""
+    try:
+        while not stopped.wait(timeout / 3):
+            try:
+                if not renew(job, timeout):
+                    return
+            except Exception:
+                logger.exception(
+                    "Не удалось продлить аренду задачи %s", job.pk
+                )
+    finally:
+        connections.close_all()
+
+
+@contextmanager
+def keep_lease(job, timeout):
+    """Продлевать аренду задачи из отдельного потока, пока она выполняется.
+
+    Иначе задача дольше тайм-аута (например, `purge_task`) считалась бы
+    зависшей: её взял бы другой обработчик и выполнил повторно.
+    """
+    stopped = threading.Event()
+    thread = threading.Thread(
+        target=renew_until, args=(job, timeout, stopped), daemon=True
+    )
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def finish(job, **fields):
+    """Записать итог задачи.
+
+    Повтор и ошибка записываются, только если аренда ещё принадлежит
+    обработчику. Успех записывается всегда, если задача ещё не выполнена:
+    задача, которую после истечения аренды завершил `expire_abandoned`
+    или взял другой обработчик, всё же выполнена.
+    """
+    jobs = Job.objects.filter(pk=job.pk)
+    if fields.get("status") == Job.DONE:
+        jobs = jobs.exclude(status=Job.DONE)
+    else:
+        jobs = jobs.filter(lease=job.lease)
+    return write_gate.run(
+        lambda: jobs.update(lease="", locked_until=None, **fields)
+    )
+
+
+def run_job(job, timeout=None):
+    """Выполнить задачу и записать успех, повтор или ошибку.
+
+    Аренда продлевается на `timeout` секунд, пока задача выполняется.
+    Повтор планируется с экспоненциальной задержкой, пока не исчерпаны
+    попытки. Возвращает итоговый статус.
+    """
+    close_old_connections()
+    try:
+        with keep_lease(job, timeout or settings.JOBS_VISIBILITY_TIMEOUT):
+            import_string(job.name)(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOBS_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            finish(
+                job,
+                status=Job.QUEUED,
+                run_after=timezone.now() + timedelta(seconds=delay),
+                last_error=error,
+            )
+            return Job.QUEUED
+        finish(
+            job,
+            status=Job.FAILED,
+            finished_at=timezone.now(),
+            last_error=error,
+        )
+        return Job.FAILED
+    else:
+        finish(job, status=Job.DONE, finished_at=timezone.now())
+        return Job.DONE
+    finally:
+        close_old_connections()
@@ -0,0 +1,157 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from reviews.db import write_gate
+from reviews.models import (
+    ArchivedComment,
+    ArchivedReview,
+    ChangeLog,
+    Comment,
+    Review,
+)
+from reviews.shards import review_databases
+
+REVIEW_FIELDS = (
+    "id",
+    "author_id",
+    "text",
+    "pub_date",
+    "title_id",
+    "score",
+    "comment_count",
+)
+COMMENT_FIELDS = ("id", "author_id", "text", "pub_date", "review_id")
+
+
+class Command(BaseCommand):
+    help = """Перенести старые отзывы и комментарии в архивные таблицы.
+        Отзыв переносится вместе со всеми комментариями, комментарий к
+        рабочему отзыву — отдельно. Требует REVIEW_ARCHIVE_ENABLED.
+        Пример: python3 manage.py archivereviews --days 365"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.REVIEW_ARCHIVE_AFTER_DAYS,
+            help="Архивировать строки старше N дней.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BULK_BATCH_SIZE,
+            help="Строк в одной транзакции.",
+        )
+
+    def move(self, model, archive_model, fields, queryset, using):
+        """Скопировать строки в архив и удалить их из рабочей таблицы.
+
+        Удаление выполняется без сигналов и каскадов: `delete()` отзыва
+        удалил бы и его только что перенесённые комментарии, а журнал
+        получил бы записи об удалении. Строки не исчезают из списков, и
+        рейтинг с числом комментариев не меняются, но по id рабочей
+        таблицы объекты больше не читаются, поэтому перенос записывается
+        в журнал как изменение.
+        """
+        rows = list(queryset.values(*fields))
+        archive_model.objects.using(using).bulk_create(
+            (archive_model(**row) for row in rows),
+            batch_size=settings.BULK_BATCH_SIZE,
+        )
+        ids = [row["id"] for row in rows]
+        model.objects.using(using).filter(pk__in=ids)._raw_delete(using)
+        ChangeLog.record(model, ids, ChangeLog.UPDATED, using=using)
+        return len(rows)
+
+    def oldest(self, queryset, cutoff, batch_size, after):
+        """Ключи `(pub_date, id)` следующего пакета строк старше `cutoff`.
+
+        Строки переносятся от старых к новым, поэтому прерванный запуск
+        оставляет архив старше всех рабочих строк. Пакет начинается
+        после ключа `after` предыдущего пакета.
+        """
+        queryset = queryset.filter(pub_date__lt=cutoff)
+        if after is not None:
+            pub_date, pk = after
+            queryset = queryset.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+            )
+        return list(
+            queryset.order_by("pub_date", "pk")
+            .values_list("pub_date", "pk")[:batch_size]
+        )
+
+    def archive_reviews(self, cutoff, batch_size, after, using):
+        keys = self.oldest(
+            Review.objects.using(using), cutoff, batch_size, after
+        )
+        ids = [pk for _, pk in keys]
+        self.move(
+            Comment,
+            ArchivedComment,
+            COMMENT_FIELDS,
+            Comment.objects.using(using).filter(review_id__in=ids),
+            using,
+        )
+        self.move(
+            Review,
+            ArchivedReview,
+            REVIEW_FIELDS,
+            Review.objects.using(using).filter(pk__in=ids),
+            using,
+        )
+        return keys
+
+    def archive_comments(self, cutoff, batch_size, after, using):
+        keys = self.oldest(
+            Comment.objects.using(using), cutoff, batch_size, after
+        )
+        self.move(
+            Comment,
+            ArchivedComment,
+            COMMENT_FIELDS,
+            Comment.objects.using(using).filter(
+                pk__in=[pk for _, pk in keys]
+            ),
+            using,
+        )
+        return keys
+
+    def archive(self, func, cutoff, batch_size, using):
+        """Переносить пакеты, пока функция находит старые строки."""
+        total, after = 0, None
+        while True:
+            keys = write_gate.run(
+                func, cutoff, batch_size, after, using, using=using
+            )
+            total += len(keys)
+            if len(keys) < batch_size:
+                return total
+            after = keys[-1]
+
+    def handle(self, *args, **options):
+        if not settings.REVIEW_ARCHIVE_ENABLED:
+            raise CommandError(
+                "Включите REVIEW_ARCHIVE_ENABLED: иначе архивные строки "
+                "не будут видны в API"
+            )
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть положительным")
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        for alias in review_databases():
+            reviews = self.archive(
+                self.archive_reviews, cutoff, options["batch_size"], alias
+            )
+            comments = self.archive(
+                self.archive_comments, cutoff, options["batch_size"], alias
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{alias}: в архив перенесено отзывов: {reviews}, "
+                    f"комментариев: {comments}"
+                )
+            )
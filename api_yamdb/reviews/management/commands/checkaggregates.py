@@ -0,0 +1,227 @@
+import math
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections, router
+from django.db.models import Count, Max, Min
+
+from reviews.db import write_gate
+from reviews.models import (
+    ArchivedComment,
+    ArchivedReview,
+    Comment,
+    Review,
+    Title,
+)
+from reviews.shards import review_databases
+
+
+def same_rating(stored, expected):
+    if stored is None or expected is None:
+        return stored is expected
+    return math.isclose(stored, expected, rel_tol=1e-9)
+
+
+class Command(BaseCommand):
+    help = """Сверить рейтинг и число отзывов произведений и число
+        комментариев отзывов с данными и исправить расхождения.
+        Строки проверяются диапазонами id, поэтому память не зависит от
+        размера таблиц.
+        Пример: python3 manage.py checkaggregates --sample 0.01 --parallel 4"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.BULK_BATCH_SIZE,
+            help="Ширина диапазона id в одной проверке.",
+        )
+        parser.add_argument(
+            "--sample",
+            type=float,
+            default=1.0,
+            help="Доля проверяемых диапазонов, от 0 до 1.",
+        )
+        parser.add_argument(
+            "--parallel",
+            type=int,
+            default=1,
+            help="Число потоков, проверяющих диапазоны одновременно.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только сообщить о расхождениях, ничего не исправляя.",
+        )
+
+    def id_ranges(self, queryset, size, sample):
+        """Диапазоны id `[начало, конец)` с выборкой доли `sample`."""
+        bounds = queryset.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            return
+        for start in range(bounds["low"], bounds["high"] + 1, size):
+            if sample >= 1 or random.random() < sample:
+                yield start, start + size
+
+    def repair(self, queryset, method, ids, using):
+        """Пересчитать строки с расхождениями методом набора `method`.
+
+        Значения, найденные проверкой, могли устареть, пока она шла,
+        поэтому строки пересчитываются заново под блокировкой записи.
+        """
+        if self.dry_run:
+            return
+        for start in range(0, len(ids), settings.BULK_BATCH_SIZE):
+            chunk = queryset.filter(
+                pk__in=ids[start:start + settings.BULK_BATCH_SIZE]
+            )
+            write_gate.run(getattr(chunk, method), using=using)
+
+    def check_titles(self, bounds):
+        """Сверить рейтинг и число отзывов произведений диапазона.
+
+        Возвращает число проверенных строк и id строк с расхождениями.
+        """
+        titles = self.titles.filter(
+            pk__gte=bounds[0], pk__lt=bounds[1]
+        ).only("rating", "review_count")
+        totals = titles.review_totals()
+        broken = []
+        for title in titles:
+            score, count = totals.get(title.pk, (0, 0))
+            rating = score / count if count else None
+            if title.review_count != count or not same_rating(
+                title.rating, rating
+            ):
+                broken.append(title.pk)
+        return len(titles), broken
+
+    def check_reviews(self, model, alias, bounds):
+        """Сверить число комментариев отзывов диапазона в БД `alias`."""
+        reviews = (
+            model.objects.using(alias)
+            .filter(pk__gte=bounds[0], pk__lt=bounds[1])
+            .only("comment_count")
+        )
+        comment_models = (Comment,)
+        if settings.REVIEW_ARCHIVE_ENABLED:
+            comment_models += (ArchivedComment,)
+        counts = Counter()
+        for comment_model in comment_models:
+            counts.update(
+                dict(
+                    comment_model.objects.using(alias)
+                    .filter(review_id__gte=bounds[0], review_id__lt=bounds[1])
+                    .order_by()
+                    .values("review_id")
+                    .annotate(count=Count("pk"))
+                    .values_list("review_id", "count")
+                )
+            )
+        broken = []
+        for review in reviews:
+            if review.comment_count != counts[review.pk]:
+                broken.append(review.pk)
+        return len(reviews), broken
+
+    def run_check(self, check, bounds):
+        """Выполнить проверку диапазона в потоке со своими соединениями."""
+        close_old_connections()
+        try:
+            return check(bounds)
+        finally:
+            connections.close_all()
+
+    def run(self, pool, check, ranges, repair):
+        """Проверить диапазоны, подавая их пулу потоков порциями.
+
+        Потоки только читают; исправления порции записываются в текущем
+        потоке после её проверки, так что чтение не конкурирует с
+        записью. Порция ограничена, поэтому диапазоны не накапливаются
+        в памяти. Без пула проверка выполняется в текущем потоке.
+        """
+        checked = fixed = 0
+        while True:
+            portion = list(islice(ranges, self.parallel * 4))
+            if not portion:
+                return checked, fixed
+            if pool is None:
+                results = [check(bounds) for bounds in portion]
+            else:
+                results = list(
+                    pool.map(
+                        lambda bounds: self.run_check(check, bounds), portion
+                    )
+                )
+            broken = [pk for _, ids in results for pk in ids]
+            repair(broken)
+            checked += sum(rows for rows, _ in results)
+            fixed += len(broken)
+
+    def report(self, label, checked, fixed):
+        self.stdout.write(f"{label}: проверено {checked}, расхождений {fixed}")
+        return fixed
+
+    def check_all(self, pool, size, sample):
+        broken = self.report(
+            "Произведения",
+            *self.run(
+                pool,
+                self.check_titles,
+                self.id_ranges(self.titles, size, sample),
+                partial(
+                    self.repair,
+                    self.titles,
+                    "update_rating",
+                    using=self.titles.db,
+                ),
+            ),
+        )
+        for alias in review_databases():
+            for model in (Review, ArchivedReview):
+                broken += self.report(
+                    f"{alias}: {model._meta.verbose_name_plural}",
+                    *self.run(
+                        pool,
+                        partial(self.check_reviews, model, alias),
+                        self.id_ranges(
+                            model.objects.using(alias), size, sample
+                        ),
+                        partial(
+                            self.repair,
+                            model.objects.using(alias),
+                            "update_comment_count",
+                            using=alias,
+                        ),
+                    ),
+                )
+        return broken
+
+    def handle(self, *args, **options):
+        size = options["chunk_size"]
+        sample = options["sample"]
+        self.parallel = options["parallel"]
+        self.dry_run = options["dry_run"]
+        if size < 1 or self.parallel < 1:
+            raise CommandError(
+                "--chunk-size и --parallel должны быть положительными"
+            )
+        if not 0 < sample <= 1:
+            raise CommandError("--sample должен быть в диапазоне (0, 1]")
+        # Чтение с основной БД: реплика может отставать.
+        self.titles = Title.objects.using(router.db_for_write(Title))
+        if self.parallel == 1:
+            broken = self.check_all(None, size, sample)
+        else:
+            with ThreadPoolExecutor(max_workers=self.parallel) as pool:
+                broken = self.check_all(pool, size, sample)
+        if broken and self.dry_run:
+            raise CommandError(f"Найдено расхождений: {broken}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Исправлено расхождений: {broken}")
+        )
@@ -2,9 +2,12 @@ from django.core.management.base import (
     BaseCommand,
     CommandError,
 )
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.apps import apps
 from api_yamdb import settings
+from reviews.routers import is_review_model
+from reviews.shards import is_sharded, review_databases
 import csv
 
 
@@ -48,6 +51,49 @@ class Command(BaseCommand):
             raise CommandError(f"Модели {Model} не существует")
         return Model
 
+    def get_related(self, Model, pk):
+        """Связанный объект; отзыв ищется во всех БД отзывов."""
+        if not is_review_model(Model):
+            return get_object_or_404(Model, id=pk)
+        for alias in review_databases():
+            obj = Model.objects.using(alias).filter(id=pk).first()
+            if obj is not None:
+                return obj
+        raise Http404(f"{Model.__name__} с id={pk} не найден")
+
+    def remaps_ids(self, Model):
+        """Выдавать ли объекту новый id вместо id из файла.
+
+        Шард выдаёт id отзывов и комментариев из своего диапазона
+        (`init_sequences`), а id из файла мог бы совпасть с id из
+        диапазона другого шарда. Ссылки из следующих файлов переводятся
+        на новые id.
+        """
+        return is_sharded() and is_review_model(Model)
+
+    def get_loaded(self, relation, pk):
+        """Объект, загруженный с новым id, по его id из файла."""
+        try:
+            return self.new_ids[relation][pk]
+        except KeyError:
+            raise CommandError(f"{relation} с id={pk} не найден")
+
+    def build(self, Model, row):
+        """Объект из строки файла и id из файла, если он заменяется."""
+        Obj, csv_id = Model(), None
+        for name, value in row.items():
+            relation = name[: -len("_id")] if name.endswith("_id") else name
+            if name == "id" and self.remaps_ids(Model):
+                csv_id = value
+            elif relation in self.new_ids:
+                setattr(Obj, relation, self.get_loaded(relation, value))
+            elif name in FOREIGNKEY_FIELDS:
+                obj = self.get_related(self.get_model(name), value)
+                setattr(Obj, name, obj)
+            else:
+                setattr(Obj, name, value)
+        return Obj, csv_id
+
     def load_csv(self, file_name):
         model_name = self.get_model_name(file_name)
         file_path = self.get_csv_file(file_name)
@@ -55,17 +101,11 @@ class Command(BaseCommand):
         try:
             with open(file_path) as file:
                 self.stdout.write(f"Чтение файла {file_name}")
-                reader = csv.DictReader(file)
-                for row in reader:
-                    Obj = Model()
-                    for i, field in enumerate(row.values()):
-                        if reader.fieldnames[i] in FOREIGNKEY_FIELDS:
-                            model = self.get_model(reader.fieldnames[i])
-                            obj = get_object_or_404(model, id=field)
-                            setattr(Obj, reader.fieldnames[i], obj)
-                        else:
-                            setattr(Obj, reader.fieldnames[i], field)
+                for row in csv.DictReader(file):
+                    Obj, csv_id = self.build(Model, row)
                     Obj.save()
+                    if csv_id is not None:
+                        self.new_ids.setdefault(model_name, {})[csv_id] = Obj
         except Exception as e:
             raise CommandError(
                 f"При чтении файла {file_name} произошла ошибка: {e}"
@@ -78,5 +118,6 @@ class Command(BaseCommand):
             )
 
     def handle(self, *args, **options):
+        self.new_ids = {}
         for file_name in FILE_NAMES:
             self.load_csv(file_name)
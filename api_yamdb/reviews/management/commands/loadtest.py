@@ -0,0 +1,119 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = """Нагрузочный тест запущенного сервера: одновременные GET-запросы
+        к одному или нескольким адресам и сравнение пропускной способности.
+        Пример: python3 manage.py loadtest
+        wsgi=http://127.0.0.1:8000/api/v1/titles/
+        asgi=http://127.0.0.1:8001/api/v1/async/titles/ -c 200 -n 5000"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "targets",
+            nargs="+",
+            help="Адреса в виде url или метка=url.",
+        )
+        parser.add_argument(
+            "-c", "--concurrency", type=int, default=50,
+            help="Число одновременных клиентов.",
+        )
+        parser.add_argument(
+            "-n", "--requests", type=int, default=1000,
+            help="Число запросов к каждому адресу.",
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=20,
+            help="Число прогревочных запросов, не входящих в замер.",
+        )
+        parser.add_argument(
+            "--token", help="JWT-токен для заголовка Authorization."
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def parse_target(self, target):
+        """Разобрать `метка=url` или `url`.
+
+        Адрес сам может содержать `=` в строке запроса, поэтому метка
+        отделяется только у аргументов, не начинающихся со схемы.
+        """
+        label, url = target, target
+        if not target.startswith(("http://", "https://")):
+            label, _, url = target.partition("=")
+        if not url.startswith(("http://", "https://")):
+            raise CommandError(f"Некорректный адрес: {target}")
+        return label, url
+
+    def run(self, url, count, concurrency, headers, timeout):
+        """Выполнить `count` запросов в `concurrency` потоков.
+
+        Каждый поток держит свою сессию с keep-alive, как браузер или
+        балансировщик. Возвращает длительности ответов, число ошибок и
+        общее время.
+        """
+        local = threading.local()
+
+        def fetch(_):
+            if not hasattr(local, "session"):
+                local.session = requests.Session()
+                local.session.headers.update(headers)
+            started = time.perf_counter()
+            try:
+                response = local.session.get(url, timeout=timeout)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            results = list(pool.map(fetch, range(count)))
+            elapsed = time.perf_counter() - started
+        durations = sorted(duration for duration, ok in results if ok)
+        errors = sum(not ok for _, ok in results)
+        return durations, errors, elapsed
+
+    def report(self, label, durations, errors, elapsed):
+        def percentile(share):
+            if not durations:
+                return 0
+            index = min(len(durations) - 1, int(len(durations) * share))
+            return durations[index] * 1000
+
+        self.stdout.write(
+            f"{label}: {len(durations) / elapsed:.1f} запр./с, "
+            f"медиана {statistics.median(durations or [0]) * 1000:.1f} мс, "
+            f"p95 {percentile(0.95):.1f} мс, "
+            f"p99 {percentile(0.99):.1f} мс, ошибок {errors}"
+        )
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options["token"]:
+            headers["Authorization"] = f"Bearer {options['token']}"
+        for target in options["targets"]:
+            label, url = self.parse_target(target)
+            if options["warmup"]:
+                self.run(
+                    url,
+                    options["warmup"],
+                    options["concurrency"],
+                    headers,
+                    options["timeout"],
+                )
+            self.report(
+                label,
+                *self.run(
+                    url,
+                    options["requests"],
+                    options["concurrency"],
+                    headers,
+                    options["timeout"],
+                ),
+            )
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reviews.deletion import purge
+from reviews.models import DeletionTask
+
+
+class Command(BaseCommand):
+    help = """Выполнить отложенные удаления произведений, категорий и
+        пользователей пакетами с выводом прогресса.
+        Пример: python3 manage.py purgedeleted --interval 5"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.DELETION_CHUNK_SIZE,
+            help="Строк в одной транзакции.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Проверять очередь каждые N секунд (0 — один проход).",
+        )
+
+    def report(self, task):
+        self.stdout.write(
+            f"{task.model} {task.object_id}: {task.deleted}/{task.total}"
+        )
+
+    def run_pending(self, chunk_size):
+        # Задачи в статусе «выполняется» остались от прерванного запуска.
+        for task in DeletionTask.objects.filter(
+            status__in=(DeletionTask.PENDING, DeletionTask.RUNNING)
+        ):
+            try:
+                purge(task, chunk_size, self.report)
+            except Exception as error:
+                task.status = DeletionTask.FAILED
+                task.error = str(error)
+                task.save(update_fields=("status", "error", "updated_at"))
+                self.stderr.write(f"{task}: {error}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{task}"))
+
+    def handle(self, *args, **options):
+        while True:
+            self.run_pending(options["chunk_size"])
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
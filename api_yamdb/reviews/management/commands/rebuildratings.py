@@ -0,0 +1,131 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+from django.db.models import Max
+
+from reviews.db import write_gate
+from reviews.models import (
+    SCORE_MAX,
+    ArchivedReview,
+    ChangeLog,
+    Review,
+    Title,
+)
+from reviews.shards import review_databases
+
+
+class Command(BaseCommand):
+    help = """Пересчитать рейтинг и число отзывов всех произведений.
+        Пары (произведение, оценка) читаются пакетами и суммируются
+        в массивах NumPy, поэтому память не зависит от числа отзывов.
+        Пример: python3 manage.py rebuildratings"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--read-size",
+            type=int,
+            default=50000,
+            help="Отзывов в одном запросе чтения.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BULK_BATCH_SIZE,
+            help="Произведений в одной транзакции записи.",
+        )
+
+    def scan(self, queryset, size):
+        """Читать пары (произведение, оценка) пакетами по возрастанию id."""
+        last = 0
+        while True:
+            rows = list(
+                queryset.filter(pk__gt=last)
+                .order_by("pk")
+                .values_list("pk", "title_id", "score")[:size]
+            )
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield np.array(rows, dtype=np.int64)[:, 1:]
+
+    def accumulate(self, size, read_size):
+        """Суммы, число и гистограмма оценок по id произведения."""
+        sums = np.zeros(size, dtype=np.int64)
+        counts = np.zeros(size, dtype=np.int64)
+        histogram = np.zeros(SCORE_MAX + 1, dtype=np.int64)
+        models = (Review,)
+        if settings.REVIEW_ARCHIVE_ENABLED:
+            models += (ArchivedReview,)
+        for alias in review_databases():
+            for model in models:
+                for pairs in self.scan(model.objects.using(alias), read_size):
+                    # Отзывы удалённых произведений не учитываются.
+                    pairs = pairs[pairs[:, 0] < size]
+                    title_ids, scores = pairs[:, 0], pairs[:, 1]
+                    sums += np.bincount(
+                        title_ids, weights=scores, minlength=size
+                    ).astype(np.int64)
+                    counts += np.bincount(title_ids, minlength=size)
+                    histogram += np.bincount(scores, minlength=SCORE_MAX + 1)
+        return sums, counts, histogram
+
+    def save(self, titles, objects):
+        titles.bulk_update(objects, ("rating", "review_count"))
+        ChangeLog.record(Title, [obj.pk for obj in objects], ChangeLog.UPDATED)
+
+    def write(self, titles, counts, averages, batch_size):
+        """Записать рейтинги пакетами `bulk_update` по возрастанию id.
+
+        Произведения, созданные после чтения отзывов, не входят в массивы
+        и пропускаются: их рейтинг поддерживается при записи отзывов.
+        """
+        titles = titles.filter(pk__lt=len(counts))
+        last = written = 0
+        while True:
+            ids = list(
+                titles.filter(pk__gt=last)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                return written
+            objects = [
+                Title(
+                    pk=pk,
+                    review_count=int(counts[pk]),
+                    rating=float(averages[pk]) if counts[pk] else None,
+                )
+                for pk in ids
+            ]
+            write_gate.run(self.save, titles, objects, using=titles.db)
+            written += len(ids)
+            last = ids[-1]
+
+    def handle(self, *args, **options):
+        if options["read_size"] < 1 or options["batch_size"] < 1:
+            raise CommandError(
+                "--read-size и --batch-size должны быть положительными"
+            )
+        titles = Title.objects.using(router.db_for_write(Title))
+        size = (titles.aggregate(last=Max("pk"))["last"] or 0) + 1
+        sums, counts, histogram = self.accumulate(size, options["read_size"])
+        averages = np.divide(
+            sums,
+            counts,
+            out=np.zeros(size, dtype=np.float64),
+            where=counts > 0,
+        )
+        written = self.write(titles, counts, averages, options["batch_size"])
+        self.stdout.write(
+            "Оценки: "
+            + ", ".join(
+                f"{score}: {histogram[score]}"
+                for score in range(1, SCORE_MAX + 1)
+            )
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Отзывов: {counts.sum()}, произведений обновлено: {written}"
+            )
+        )
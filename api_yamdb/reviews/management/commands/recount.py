@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+
+from reviews.db import write_gate
+from reviews.models import ArchivedReview, Review, Title
+from reviews.shards import review_databases
+
+
+class Command(BaseCommand):
+    help = """Пересчитать рейтинг и число отзывов произведений и число
+        комментариев отзывов, если счётчики разошлись с данными.
+        Пример: python3 manage.py recount --batch-size 500"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BULK_BATCH_SIZE,
+            help="Строк в одной транзакции.",
+        )
+
+    def recount(self, queryset, method, batch_size, using):
+        """Вызвать метод пересчёта набора пакетами по возрастанию id."""
+        total = last = 0
+        while True:
+            ids = list(
+                queryset.filter(pk__gt=last)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                return total
+            write_gate.run(
+                getattr(queryset.filter(pk__in=ids), method), using=using
+            )
+            total += len(ids)
+            last = ids[-1]
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size должен быть положительным")
+        titles = self.recount(
+            Title.objects.all(),
+            "update_rating",
+            batch_size,
+            router.db_for_write(Title),
+        )
+        self.stdout.write(f"Произведений: {titles}")
+        for alias in review_databases():
+            reviews = sum(
+                self.recount(
+                    model.objects.using(alias),
+                    "update_comment_count",
+                    batch_size,
+                    alias,
+                )
+                for model in (Review, ArchivedReview)
+            )
+            self.stdout.write(f"{alias}: отзывов: {reviews}")
+        self.stdout.write(self.style.SUCCESS("Счётчики пересчитаны"))
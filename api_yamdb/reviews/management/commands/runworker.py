@@ -0,0 +1,87 @@
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.jobs import claim, run_job
+
+
+class Command(BaseCommand):
+    help = """Выполнять фоновые задачи из очереди в БД.
+        Задачи выполняются пулом потоков; для параллельности между
+        процессами можно запустить несколько обработчиков.
+        Пример: python3 manage.py runworker --threads 4 --interval 1"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=settings.JOBS_WORKER_THREADS,
+            help="Размер пула потоков.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help=(
+                "Проверять очередь каждые N секунд "
+                "(0 — выполнить готовые задачи и выйти)."
+            ),
+        )
+        parser.add_argument(
+            "--visibility-timeout",
+            type=int,
+            default=settings.JOBS_VISIBILITY_TIMEOUT,
+            help="Через сколько секунд зависшую задачу возьмёт другой.",
+        )
+
+    def log_result(self, job, result):
+        self.totals[result] += 1
+        self.stdout.write(f"{job.name} #{job.pk}: {result}")
+
+    def work(self, pool, threads, interval, timeout):
+        """Выполнять задачи, арендуя новые по мере освобождения потоков.
+
+        Задачи арендуются только на свободные потоки, поэтому аренда не
+        истекает, пока задача ждёт в очереди пула, а долгая задача не
+        задерживает остальные.
+        """
+        running = {}
+        while True:
+            if len(running) < threads:
+                for job in claim(threads - len(running), timeout):
+                    running[pool.submit(run_job, job, timeout)] = job
+            if not running:
+                if not interval:
+                    return
+                time.sleep(interval)
+                continue
+            done, _ = wait(
+                running, timeout=interval or None, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                self.log_result(running.pop(future), future.result())
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        if threads < 1:
+            raise CommandError("--threads должен быть положительным")
+        self.totals = Counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            self.work(
+                pool,
+                threads,
+                options["interval"],
+                options["visibility_timeout"],
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                ", ".join(
+                    f"{status}: {count}"
+                    for status, count in self.totals.items()
+                )
+                or "Очередь пуста"
+            )
+        )
@@ -0,0 +1,129 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from reviews.db import apply_pragmas
+
+SCHEMA = """
+CREATE TABLE review (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    score INTEGER NOT NULL
+);
+CREATE INDEX review_title_idx ON review (title_id);
+"""
+
+
+class Command(BaseCommand):
+    help = """Сравнить пропускную способность SQLite при одновременных
+        чтении и записи без профиля производительности и с ним.
+        Пример: python3 manage.py sqlitebench --readers 8 --writers 4"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument(
+            "--duration", type=float, default=5,
+            help="Длительность замера для каждого режима, с.",
+        )
+        parser.add_argument(
+            "--titles", type=int, default=1000,
+            help="Число произведений в тестовых данных.",
+        )
+        parser.add_argument(
+            "--rows", type=int, default=50000,
+            help="Число отзывов в тестовых данных.",
+        )
+
+    def prepare(self, path, options):
+        with sqlite3.connect(path) as connection:
+            connection.executescript(SCHEMA)
+            connection.executemany(
+                "INSERT INTO review (title_id, text, score) VALUES (?, ?, ?)",
+                (
+                    (random.randrange(options["titles"]), "текст", score % 10)
+                    for score in range(options["rows"])
+                ),
+            )
+
+    def connect(self, path, profile):
+        # Таймаут 5 с — значение по умолчанию для Django и sqlite3.
+        connection = sqlite3.connect(path, timeout=5)
+        if profile:
+            apply_pragmas(connection.cursor())
+        return connection
+
+    def worker(self, path, profile, titles, write, stop, counters):
+        connection = self.connect(path, profile)
+        done = errors = 0
+        while not stop.is_set():
+            title_id = random.randrange(titles)
+            try:
+                if write:
+                    with connection:
+                        connection.execute(
+                            "INSERT INTO review (title_id, text, score) "
+                            "VALUES (?, ?, ?)",
+                            (title_id, "новый отзыв", random.randint(1, 10)),
+                        )
+                else:
+                    connection.execute(
+                        "SELECT AVG(score), COUNT(*) FROM review "
+                        "WHERE title_id = ?",
+                        (title_id,),
+                    ).fetchone()
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        connection.close()
+        with counters["lock"]:
+            key = "writes" if write else "reads"
+            counters[key] += done
+            counters["errors"] += errors
+
+    def run(self, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / "bench.sqlite3")
+            self.prepare(path, options)
+            # journal_mode=WAL сохраняется в файле, остальные PRAGMA
+            # действуют на соединение.
+            self.connect(path, profile).close()
+            stop = threading.Event()
+            counters = {
+                "lock": threading.Lock(), "reads": 0, "writes": 0, "errors": 0
+            }
+            threads = [
+                threading.Thread(
+                    target=self.worker,
+                    args=(
+                        path, profile, options["titles"], write, stop,
+                        counters,
+                    ),
+                )
+                for write in (
+                    [False] * options["readers"] + [True] * options["writers"]
+                )
+            ]
+            for thread in threads:
+                thread.start()
+            time.sleep(options["duration"])
+            stop.set()
+            for thread in threads:
+                thread.join()
+        duration = options["duration"]
+        self.stdout.write(
+            f"{'с профилем' if profile else 'без профиля'}: "
+            f"чтение {counters['reads'] / duration:.0f} оп./с, "
+            f"запись {counters['writes'] / duration:.0f} оп./с, "
+            f"ошибок блокировки {counters['errors']}"
+        )
+
+    def handle(self, *args, **options):
+        for profile in (False, True):
+            self.run(profile, options)
@@ -0,0 +1,58 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = """Скопировать основные БД SQLite в их реплики для чтения.
+        Реплики задаются настройкой REPLICA_DATABASES.
+        Пример: python3 manage.py syncreplicas --interval 5"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Повторять синхронизацию каждые N секунд (0 — один раз).",
+        )
+
+    def database_path(self, alias):
+        try:
+            database = settings.DATABASES[alias]
+        except KeyError:
+            raise CommandError(f"БД {alias} не описана в DATABASES")
+        if database["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError(f"БД {alias} не является SQLite")
+        return str(database["NAME"])
+
+    def sync(self, primary, replica):
+        """Скопировать БД онлайн-бэкапом SQLite.
+
+        Копия согласована на момент начала копирования, а основная БД
+        остаётся доступной на запись.
+        """
+        source = sqlite3.connect(self.database_path(primary))
+        target = sqlite3.connect(self.database_path(replica), timeout=30)
+        try:
+            started = time.monotonic()
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.stdout.write(
+            f"{primary} -> {replica}: "
+            f"{(time.monotonic() - started) * 1000:.0f} мс"
+        )
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError("Реплики не заданы в REPLICA_DATABASES")
+        while True:
+            for primary, replicas in settings.REPLICA_DATABASES.items():
+                for replica in replicas:
+                    self.sync(primary, replica)
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
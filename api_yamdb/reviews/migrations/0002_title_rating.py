@@ -0,0 +1,32 @@
+# Generated by Django 3.2 on 2026-10-19 09:42
+
+from django.db import migrations, models
+from django.db.models import Avg, OuterRef, Subquery
+
+
+def fill_rating(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    average = (
+        Review.objects.filter(title=OuterRef('pk'))
+        .values('title')
+        .annotate(average=Avg('score'))
+        .values('average')
+    )
+    Title.objects.update(rating=Subquery(average))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True, verbose_name='Рейтинг'),
+        ),
+        migrations.RunPython(fill_rating, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2 on 2026-10-19 09:43
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+import reviews.models
+
+
+def merge_case_duplicates(Model, relink):
+    """Слить объекты, слаги которых различаются только регистром.
+
+    Остаётся объект с наименьшим id, связи остальных переносятся на
+    него, иначе приведение слагов к нижнему регистру нарушит
+    уникальность.
+    """
+    groups = {}
+    for pk, slug in Model.objects.order_by('pk').values_list('pk', 'slug'):
+        groups.setdefault(slug.lower(), []).append(pk)
+    for keep, *duplicates in groups.values():
+        if duplicates:
+            relink(keep, duplicates)
+            Model.objects.filter(pk__in=duplicates).delete()
+
+
+def lower_slugs(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    relinks = {
+        'Category': lambda keep, ids: Title.objects.filter(
+            category_id__in=ids
+        ).update(category_id=keep),
+        'Genre': lambda keep, ids: GenreTitle.objects.filter(
+            genre_id__in=ids
+        ).update(genre_id=keep),
+    }
+    for model_name, relink in relinks.items():
+        Model = apps.get_model('reviews', model_name)
+        merge_case_duplicates(Model, relink)
+        Model.objects.update(slug=Lower('slug'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_title_rating'),
+    ]
+
+    operations = [
+        migrations.RunPython(lower_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=reviews.models.LowercaseSlugField(unique=True, verbose_name='Слаг'),
+        ),
+        migrations.AlterField(
+            model_name='genre',
+            name='slug',
+            field=reviews.models.LowercaseSlugField(unique=True, verbose_name='Слаг'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['category', 'year'], name='title_category_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['category', 'rating'], name='title_category_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-19 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_normalized_slugs_title_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True, verbose_name='Внешний идентификатор'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2 on 2026-10-19 10:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Внешние ключи на пользователей и произведения снимаются во всех
+# конфигурациях, включая одну БД: таблицы отзывов одинаковы в default,
+# отдельной БД отзывов и шардах. Каскады выполняет ORM (см.
+# BaseAuthorModel).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_changelog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='title',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='reviews.title', verbose_name='Произведение'),
+        ),
+    ]
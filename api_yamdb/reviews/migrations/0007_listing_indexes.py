@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-19 10:23
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicate_genres(apps, schema_editor):
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    links = GenreTitle.objects.using(schema_editor.connection.alias)
+    # Подзапрос остаётся в SQL: список id превысил бы лимит параметров
+    # SQLite на большой таблице.
+    keep = (
+        links.order_by()
+        .values('title', 'genre')
+        .annotate(keep=Min('id'))
+        .values('keep')
+    )
+    links.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_review_cross_database_fks'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_duplicate_genres, migrations.RunPython.noop
+        ),
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'Комментарий', 'verbose_name_plural': 'Комментарии'},
+        ),
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'Отзыв', 'verbose_name_plural': 'Отзывы'},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['review', 'pub_date', 'id'], name='comment_review_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genretitle',
+            index=models.Index(fields=['genre', 'title'], name='genretitle_genre_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['title', 'pub_date', 'id'], name='review_title_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='genretitle',
+            constraint=models.UniqueConstraint(fields=('title', 'genre'), name='unique_title_genre'),
+        ),
+    ]
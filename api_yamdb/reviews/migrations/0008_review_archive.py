@@ -0,0 +1,62 @@
+# Generated by Django 3.2 on 2026-10-19 10:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReview',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Идентификатор')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата добавления')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+                ('score', models.PositiveSmallIntegerField(verbose_name='Оценка')),
+                ('author', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('title', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_reviews', to='reviews.title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Архивный отзыв',
+                'verbose_name_plural': 'Архивные отзывы',
+                'ordering': ('-pub_date', '-id'),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Идентификатор')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата добавления')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+                ('author', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('review', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='reviews.review', verbose_name='Отзыв')),
+            ],
+            options={
+                'verbose_name': 'Архивный комментарий',
+                'verbose_name_plural': 'Архивные комментарии',
+                'ordering': ('-pub_date', '-id'),
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedreview',
+            index=models.Index(fields=['title', 'pub_date', 'id'], name='archivedreview_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreview',
+            index=models.Index(fields=['author', 'title'], name='archivedreview_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['review', 'pub_date', 'id'], name='archivedcomment_review_idx'),
+        ),
+    ]
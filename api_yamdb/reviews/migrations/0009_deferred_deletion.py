@@ -0,0 +1,51 @@
+# Generated by Django 3.2 on 2026-10-19 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_review_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50, verbose_name='Модель')),
+                ('object_id', models.BigIntegerField(verbose_name='Идентификатор объекта')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Завершено'), ('failed', 'Ошибка')], default='pending', max_length=7, verbose_name='Статус')),
+                ('total', models.PositiveIntegerField(verbose_name='Зависимых строк')),
+                ('deleted', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Фоновое удаление',
+                'verbose_name_plural': 'Фоновые удаления',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='is_hidden',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Скрыт до удаления'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='is_hidden',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Скрыт до удаления'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='is_hidden',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Скрыт до удаления'),
+        ),
+        migrations.AddIndex(
+            model_name='deletiontask',
+            index=models.Index(fields=['status', 'id'], name='deletiontask_status_idx'),
+        ),
+    ]
@@ -1,10 +1,16 @@
+from functools import partial
+
 from django.utils import timezone
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 
+from reviews.routers import is_split
+from reviews.shards import titles_by_database
 from reviews.validators import username_validator
 
 SCORE_MIN = 1
@@ -49,6 +55,11 @@ class User(AbstractUser):
         choices=roles,
         default=USER,
     )
+    is_hidden = models.BooleanField(
+        verbose_name="Скрыт до удаления",
+        default=False,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "Пользователь"
@@ -71,7 +82,49 @@ class User(AbstractUser):
         return self.role == ADMIN or self.is_superuser
 
 
-class InfoModel(models.Model):
+class LowercaseSlugField(models.SlugField):
+    """Слаг, который хранится и сравнивается в нижнем регистре.
+
+    Точное сравнение вместо `iexact` позволяет SQLite использовать
+    уникальный индекс по слагу.
+    """
+
+    @staticmethod
+    def _lower(value):
+        return value.lower() if isinstance(value, str) else value
+
+    def to_python(self, value):
+        return self._lower(super().to_python(value))
+
+    def get_prep_value(self, value):
+        return self._lower(super().get_prep_value(value))
+
+    def pre_save(self, model_instance, add):
+        value = self._lower(super().pre_save(model_instance, add))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class ChangeLoggedModel(models.Model):
+    """Абстрактная модель, изменения которой пишутся в журнал.
+
+    Сохранение выполняется в транзакции, поэтому запись журнала из
+    сигнала `post_save` фиксируется вместе с самим изменением, а если
+    журнал лежит в другой БД — сразу после него (см. `ChangeLog.record`).
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class InfoModel(ChangeLoggedModel):
     """Абстрактная модель."""
 
     name = models.CharField(
@@ -79,7 +132,7 @@ class InfoModel(models.Model):
         max_length=settings.LENGTH_XXL,
         db_index=True,
     )
-    slug = models.SlugField(
+    slug = LowercaseSlugField(
         verbose_name="Слаг",
         max_length=settings.LENGTH_M,
         unique=True,
@@ -104,13 +157,97 @@ class Genre(InfoModel):
 class Category(InfoModel):
     """Модель категории."""
 
+    is_hidden = models.BooleanField(
+        verbose_name="Скрыт до удаления",
+        default=False,
+        editable=False,
+    )
+
     class Meta:
         verbose_name = "Категория"
         verbose_name_plural = "Категории"
         default_related_name = "categories"
 
 
-class Title(models.Model):
+class TitleQuerySet(models.QuerySet):
+    """Набор запросов для произведений."""
+
+    def update_rating(self):
+        """Пересчитать рейтинг и число отзывов одним UPDATE-запросом.
+
+        Пересчитанные произведения записываются в журнал изменений, чтобы
+        лента `/changes/` сообщала и об изменении рейтинга.
+        """
+        ids = list(self.values_list("pk", flat=True))
+        if is_split(Title, Review) or settings.REVIEW_ARCHIVE_ENABLED:
+            updated = self.update_rating_from_totals()
+        else:
+            reviews = (
+                Review.objects.filter(title=OuterRef("pk"))
+                .order_by()
+                .values("title")
+            )
+            updated = self.update(
+                rating=Subquery(
+                    reviews.annotate(average=Avg("score")).values("average")
+                ),
+                review_count=Coalesce(
+                    Subquery(
+                        reviews.annotate(count=Count("pk")).values("count")
+                    ),
+                    0,
+                ),
+            )
+        ChangeLog.record(Title, ids, ChangeLog.UPDATED)
+        return updated
+
+    def review_totals(self):
+        """Сумма и число оценок произведений набора по всем отзывам.
+
+        Считается одним запросом к каждой таблице отзывов (рабочей и
+        архивной) в каждой БД (шарде). Возвращает словарь
+        id произведения -> [сумма, число]; произведений без отзывов в
+        нём нет.
+        """
+        models = (Review,)
+        if settings.REVIEW_ARCHIVE_ENABLED:
+            models += (ArchivedReview,)
+        totals = {}
+        for alias, title_ids in titles_by_database(
+            self.values_list("pk", flat=True)
+        ).items():
+            for model in models:
+                for title_id, score, count in (
+                    model.objects.using(alias)
+                    .filter(title_id__in=title_ids)
+                    .order_by()
+                    .values("title")
+                    .annotate(score=Sum("score"), count=Count("pk"))
+                    .values_list("title", "score", "count")
+                ):
+                    total = totals.setdefault(title_id, [0, 0])
+                    total[0] += score
+                    total[1] += count
+        return totals
+
+    def update_rating_from_totals(self):
+        """Пересчитать рейтинг и число отзывов по другим БД и архиву.
+
+        Итоги берутся из `review_totals`, а рейтинг записывается одним
+        `bulk_update`.
+        """
+        totals = self.review_totals()
+        titles = [Title(pk=pk) for pk in self.values_list("pk", flat=True)]
+        for title in titles:
+            score, count = totals.get(title.pk, (0, 0))
+            title.rating = score / count if count else None
+            title.review_count = count
+        return self.model.objects.bulk_update(
+            titles, ("rating", "review_count")
+        )
+
+
+class Title(ChangeLoggedModel):
     """Модель произведения."""
 
     name = models.CharField(
@@ -140,11 +277,47 @@ class Title(models.Model):
         null=True,
         related_name="titles",
     )
+    external_id = models.CharField(
+        verbose_name="Внешний идентификатор",
+        max_length=settings.LENGTH_M,
+        unique=True,
+        blank=True,
+        null=True,
+    )
+    rating = models.FloatField(
+        verbose_name="Рейтинг",
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+    )
+    review_count = models.PositiveIntegerField(
+        verbose_name="Число отзывов",
+        default=0,
+        editable=False,
+    )
+    is_hidden = models.BooleanField(
+        verbose_name="Скрыт до удаления",
+        default=False,
+        editable=False,
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         ordering = ("name",)
         verbose_name = "Произведение"
         verbose_name_plural = "Произведения"
+        indexes = (
+            models.Index(
+                fields=("category", "year"),
+                name="title_category_year_idx",
+            ),
+            models.Index(
+                fields=("category", "rating"),
+                name="title_category_rating_idx",
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -154,20 +327,87 @@ class GenreTitle(models.Model):
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
     title = models.ForeignKey(Title, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("title", "genre"),
+                name="unique_title_genre",
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("genre", "title"),
+                name="genretitle_genre_title_idx",
+            ),
+        )
+
     def __str__(self):
         return f"{self.genre} {self.title}"
 
 
-class BaseAuthorModel(models.Model):
+class ShardedQuerySet(models.QuerySet):
+    """Набор запросов для отзывов и комментариев."""
+
+    def create(self, **kwargs):
+        """Создать объект в БД, выбранной по самому объекту.
+
+        Без явного `using()` шард определяется при сохранении по
+        произведению или отзыву объекта, а не менеджером без подсказки.
+        """
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
+class ReviewQuerySet(ShardedQuerySet):
+    """Набор запросов для рабочих и архивных отзывов."""
+
+    def update_comment_count(self):
+        """Пересчитать число комментариев отзывов одним UPDATE-запросом.
+
+        Комментарии отзыва лежат в его БД, поэтому подзапросы
+        выполняются там же; архивные комментарии учитываются при
+        включённом архиве.
+        """
+        models = (Comment,)
+        if settings.REVIEW_ARCHIVE_ENABLED:
+            models += (ArchivedComment,)
+        counts = [
+            Coalesce(
+                Subquery(
+                    model.objects.filter(review_id=OuterRef("pk"))
+                    .order_by()
+                    .values("review_id")
+                    .annotate(count=Count("pk"))
+                    .values("count")
+                ),
+                0,
+            )
+            for model in models
+        ]
+        return self.update(comment_count=sum(counts[1:], counts[0]))
+
+
+class BaseAuthorModel(ChangeLoggedModel):
     """Абстрактная модель.
 
     Добавляет к модели автора, текст и дату публикации.
+
+    Связи отзывов и комментариев с автором и произведением не
+    проверяются внешними ключами БД (`db_constraint=False`) в любой
+    конфигурации: схема не может зависеть от настроек, а в отдельной БД
+    отзывов и шардах таблиц пользователей и произведений нет. Цена —
+    и при одной БД целостность этих связей держится только на ORM:
+    каскадное удаление выполняет Django, а запись в обход ORM ссылку не
+    проверяет.
     """
 
     author = models.ForeignKey(
         User,
         verbose_name="Автор",
         on_delete=models.CASCADE,
+        db_constraint=False,
     )
     text = models.TextField(
         verbose_name="Текст",
@@ -177,9 +417,11 @@ class BaseAuthorModel(models.Model):
         auto_now_add=True,
     )
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         abstract = True
-        ordering = ("-pub_date",)
+        ordering = ("-pub_date", "-id")
 
     def __str__(self):
         return self.text
@@ -193,6 +435,7 @@ class Review(BaseAuthorModel):
         verbose_name="Произведение",
         on_delete=models.CASCADE,
         related_name="reviews",
+        db_constraint=False,
     )
     score = models.PositiveSmallIntegerField(
         verbose_name="Оценка",
@@ -207,8 +450,15 @@ class Review(BaseAuthorModel):
             ),
         ],
     )
+    comment_count = models.PositiveIntegerField(
+        verbose_name="Число комментариев",
+        default=0,
+        editable=False,
+    )
 
-    class Meta:
+    objects = ReviewQuerySet.as_manager()
+
+    class Meta(BaseAuthorModel.Meta):
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
         constraints = (
@@ -217,6 +467,12 @@ class Review(BaseAuthorModel):
                 name="unique_author_title",
             ),
         )
+        indexes = (
+            models.Index(
+                fields=("title", "pub_date", "id"),
+                name="review_title_pub_date_idx",
+            ),
+        )
 
 
 class Comment(BaseAuthorModel):
@@ -229,6 +485,337 @@ class Comment(BaseAuthorModel):
         related_name="comments",
     )
 
-    class Meta:
+    class Meta(BaseAuthorModel.Meta):
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
+        indexes = (
+            models.Index(
+                fields=("review", "pub_date", "id"),
+                name="comment_review_pub_date_idx",
+            ),
+        )
+
+
+class ArchivedModel(models.Model):
+    """Абстрактная модель архивной строки.
+
+    Архив хранит строки старше всех оставшихся в рабочей таблице с их
+    прежними id, поэтому вложенные списки продолжаются архивом после
+    последней рабочей строки (см. `manage.py archivereviews`).
+    """
+
+    id = models.BigIntegerField(
+        primary_key=True,
+        verbose_name="Идентификатор",
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name="Автор",
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="+",
+    )
+    text = models.TextField(
+        verbose_name="Текст",
+    )
+    pub_date = models.DateTimeField(
+        verbose_name="Дата добавления",
+    )
+    archived_at = models.DateTimeField(
+        verbose_name="Дата архивации",
+        auto_now_add=True,
+    )
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+        ordering = ("-pub_date", "-id")
+
+    def __str__(self):
+        return self.text
+
+
+class ArchivedReview(ArchivedModel):
+    """Архивный отзыв."""
+
+    title = models.ForeignKey(
+        Title,
+        verbose_name="Произведение",
+        on_delete=models.CASCADE,
+        related_name="archived_reviews",
+        db_constraint=False,
+    )
+    score = models.PositiveSmallIntegerField(
+        verbose_name="Оценка",
+    )
+    comment_count = models.PositiveIntegerField(
+        verbose_name="Число комментариев",
+        default=0,
+    )
+
+    objects = ReviewQuerySet.as_manager()
+
+    class Meta(ArchivedModel.Meta):
+        verbose_name = "Архивный отзыв"
+        verbose_name_plural = "Архивные отзывы"
+        indexes = (
+            models.Index(
+                fields=("title", "pub_date", "id"),
+                name="archivedreview_title_idx",
+            ),
+            models.Index(
+                fields=("author", "title"),
+                name="archivedreview_author_idx",
+            ),
+        )
+
+
+class ArchivedComment(ArchivedModel):
+    """Архивный комментарий.
+
+    Отзыв комментария может лежать как в рабочей таблице, так и в
+    архиве, поэтому внешний ключ не проверяется и не каскадируется.
+    """
+
+    review = models.ForeignKey(
+        Review,
+        verbose_name="Отзыв",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+
+    class Meta(ArchivedModel.Meta):
+        verbose_name = "Архивный комментарий"
+        verbose_name_plural = "Архивные комментарии"
+        indexes = (
+            models.Index(
+                fields=("review", "pub_date", "id"),
+                name="archivedcomment_review_idx",
+            ),
+        )
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений для инкрементальной синхронизации клиентов.
+
+    Идентификатор записи служит курсором: SQLite допускает одного
+    писателя, поэтому порядок идентификаторов совпадает с порядком
+    фиксации транзакций.
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    ACTIONS = (
+        (CREATED, "Создан"),
+        (UPDATED, "Изменён"),
+        (DELETED, "Удалён"),
+    )
+
+    model = models.CharField(
+        verbose_name="Модель",
+        max_length=settings.LENGTH_M,
+    )
+    object_id = models.BigIntegerField(
+        verbose_name="Идентификатор объекта",
+    )
+    action = models.CharField(
+        verbose_name="Действие",
+        max_length=len(max(dict(ACTIONS), key=len)),
+        choices=ACTIONS,
+    )
+    created_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = "Изменение"
+        verbose_name_plural = "Журнал изменений"
+        ordering = ("id",)
+
+    def __str__(self):
+        return f"{self.action} {self.model} {self.object_id}"
+
+    @classmethod
+    def record(cls, model, object_ids, action, using=None):
+        """Записать изменения объектов одной модели пакетом.
+
+        `using` — БД изменённых объектов. Если журнал лежит в другой БД,
+        запись откладывается до фиксации транзакции `using`: журнал не
+        опережает данные, и читатель не увидит запись об объекте, который
+        ещё не виден, а откат данных отменяет и запись.
+        """
+        if (
+            using is not None
+            and using != router.db_for_write(cls)
+            and connections[using].in_atomic_block
+        ):
+            transaction.on_commit(
+                partial(cls.record, model, list(object_ids), action),
+                using=using,
+            )
+            return
+        cls.objects.bulk_create(
+            cls(
+                model=model._meta.model_name,
+                object_id=object_id,
+                action=action,
+            )
+            for object_id in object_ids
+        )
+
+
+class DeletionTask(models.Model):
+    """Фоновое удаление объекта с большим каскадом.
+
+    Объект скрывается сразу, а зависимые строки удаляет пакетами
+    `manage.py purgedeleted`, отмечая прогресс в `deleted`.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "Ожидает"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Завершено"),
+        (FAILED, "Ошибка"),
+    )
+
+    model = models.CharField(
+        verbose_name="Модель",
+        max_length=settings.LENGTH_M,
+    )
+    object_id = models.BigIntegerField(
+        verbose_name="Идентификатор объекта",
+    )
+    status = models.CharField(
+        verbose_name="Статус",
+        max_length=len(max(dict(STATUSES), key=len)),
+        choices=STATUSES,
+        default=PENDING,
+    )
+    total = models.PositiveIntegerField(
+        verbose_name="Зависимых строк",
+    )
+    deleted = models.PositiveIntegerField(
+        verbose_name="Обработано строк",
+        default=0,
+    )
+    error = models.TextField(
+        verbose_name="Ошибка",
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        verbose_name="Создано",
+        auto_now_add=True,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Обновлено",
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = "Фоновое удаление"
+        verbose_name_plural = "Фоновые удаления"
+        ordering = ("id",)
+        indexes = (
+            models.Index(
+                fields=("status", "id"),
+                name="deletiontask_status_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.model} {self.object_id}: {self.status}"
+
+
+class Job(models.Model):
+    """Фоновая задача очереди в БД (см. `manage.py runworker`).
+
+    `name` — импортируемый путь к функции, `payload` — её именованные
+    аргументы. Взятая задача арендуется до `locked_until`: если
+    обработчик не отчитался к этому сроку, задачу берёт другой.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField(
+        verbose_name="Функция",
+        max_length=settings.LENGTH_XXL,
+    )
+    payload = models.JSONField(
+        verbose_name="Аргументы",
+        default=dict,
+    )
+    priority = models.SmallIntegerField(
+        verbose_name="Приоритет",
+        default=0,
+    )
+    status = models.CharField(
+        verbose_name="Статус",
+        max_length=len(max(dict(STATUSES), key=len)),
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name="Попыток",
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name="Максимум попыток",
+    )
+    run_after = models.DateTimeField(
+        verbose_name="Не раньше",
+        default=timezone.now,
+    )
+    locked_until = models.DateTimeField(
+        verbose_name="Арендована до",
+        blank=True,
+        null=True,
+    )
+    lease = models.CharField(
+        verbose_name="Аренда",
+        max_length=settings.LENGTH_M,
+        blank=True,
+    )
+    last_error = models.TextField(
+        verbose_name="Последняя ошибка",
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        verbose_name="Создана",
+        auto_now_add=True,
+    )
+    finished_at = models.DateTimeField(
+        verbose_name="Завершена",
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ("id",)
+        indexes = (
+            models.Index(
+                fields=("status", "-priority", "run_after"),
+                name="job_queue_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}: {self.status}"
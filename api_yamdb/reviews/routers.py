@@ -0,0 +1,206 @@
+import random
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+
+from reviews.shards import is_sharded, review_shards, shard_for_instance
+
+REVIEW_MODELS = frozenset(
+    ("review", "comment", "archivedreview", "archivedcomment")
+)
+
+# Разрешено ли читать с реплик в текущем запросе (см. ReplicaReadMixin).
+replica_reads = ContextVar("replica_reads", default=False)
+
+
+def reviews_database():
+    """Алиас отдельной БД отзывов и комментариев или `None`."""
+    return settings.REVIEWS_DATABASE
+
+
+def is_review_model(model):
+    return (
+        model._meta.app_label == "reviews"
+        and model._meta.model_name in REVIEW_MODELS
+    )
+
+
+class ReviewsRouter:
+    """Маршрутизация отзывов и комментариев в отдельные БД.
+
+    Отзывы и комментарии пишутся в свой файл SQLite со своей блокировкой
+    записи (`REVIEWS_DATABASE`) или распределяются по шардам по id
+    произведения (`REVIEW_SHARDS`); остальные модели остаются в
+    `default`. Связи между БД не проверяются внешними ключами и читаются
+    отдельными пакетными запросами (`route_related`). Шард определяется
+    по объекту из подсказки `instance`, который Django передаёт для
+    связанных менеджеров и сохранения.
+    """
+
+    def db_for_read(self, model, **hints):
+        if is_sharded():
+            if is_review_model(model):
+                return shard_for_instance(hints.get("instance"))
+            return DEFAULT_DB_ALIAS
+        alias = reviews_database()
+        if alias is None:
+            return None
+        return alias if is_review_model(model) else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if (
+            is_sharded()
+            and is_review_model(model)
+            and isinstance(hints.get("instance"), get_user_model())
+        ):
+            # Присваивание автора ещё не определяет шард: его выберет
+            # сохранение по произведению отзыва.
+            return None
+        return self.db_for_read(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if reviews_database() is None and not is_sharded():
+            return None
+        if is_review_model(type(obj1)) or is_review_model(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Разрешить миграции.
+
+        В БД отзывов и шардах создаются только таблицы отзывов и
+        комментариев, без миграций данных. В `default` они тоже остаются
+        (пустыми): так каскадное удаление произведений и пользователей не
+        обращается к другой БД.
+        """
+        if db != reviews_database() and db not in review_shards():
+            return None
+        return app_label == "reviews" and model_name in REVIEW_MODELS
+
+
+def primary_database(model, **hints):
+    """Основная БД модели без учёта реплик."""
+    return ReviewsRouter().db_for_read(model, **hints) or DEFAULT_DB_ALIAS
+
+
+def primary_of(alias):
+    """Основная БД для алиаса реплики (или сам алиас)."""
+    for primary, replicas in settings.REPLICA_DATABASES.items():
+        if alias in replicas:
+            return primary
+    return alias
+
+
+class ReplicaRouter:
+    """Чтение с реплик в безопасных запросах.
+
+    Реплики основных БД перечислены в `REPLICA_DATABASES`. Роутер
+    выбирает случайную реплику только пока установлен `replica_reads`,
+    иначе решение принимают следующие роутеры. Запись всегда идёт в
+    основную БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads.get():
+            return None
+        replicas = settings.REPLICA_DATABASES.get(
+            primary_database(model, **hints)
+        )
+        return random.choice(replicas) if replicas else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if primary_of(obj1._state.db) == primary_of(obj2._state.db):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if primary_of(db) != db:
+            return False
+        return None
+
+
+def sticky_key(user_id):
+    return f"replica-sticky:{user_id}"
+
+
+def mark_primary_sticky(user_id):
+    """Читать с основной БД для пользователя после его записи.
+
+    Реплики отстают от основной БД до следующей синхронизации, поэтому
+    `REPLICA_STICKY_SECONDS` секунд запросы пользователя читают с неё и
+    он сразу видит свой отзыв. Кэш должен быть общим для процессов.
+    """
+    cache.set(sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_primary_sticky(user_id):
+    return bool(cache.get(sticky_key(user_id)))
+
+
+def is_split(model, other):
+    """Лежат ли модели в разных БД."""
+    if is_sharded():
+        return is_review_model(model) != is_review_model(other)
+    return router.db_for_read(model) != router.db_for_read(other)
+
+
+def related_paths(tree, prefix=""):
+    for name, subtree in tree.items():
+        path = f"{prefix}{name}"
+        if subtree:
+            yield from related_paths(subtree, f"{path}__")
+        else:
+            yield path
+
+
+def route_related(queryset):
+    """Заменить `select_related` на `prefetch_related` для связей между БД.
+
+    JOIN между файлами SQLite невозможен, поэтому связь первого уровня,
+    ведущая в другую БД, подгружается одним запросом `__in` на страницу.
+    """
+    related = queryset.query.select_related
+    if not isinstance(related, dict) or (
+        reviews_database() is None and not is_sharded()
+    ):
+        return queryset
+    opts = queryset.model._meta
+    remote = [
+        name
+        for name in related
+        if is_split(queryset.model, opts.get_field(name).related_model)
+    ]
+    if not remote:
+        return queryset
+    local = [
+        path
+        for path in related_paths(related)
+        if path.split("__")[0] not in remote
+    ]
+    queryset = queryset.select_related(None).prefetch_related(*remote)
+    # select_related() без аргументов выбрало бы все связи.
+    return queryset.select_related(*local) if local else queryset
+
+
+@contextmanager
+def atomic_on(*aliases):
+    """Транзакция в каждой из перечисленных БД (повторы не учитываются).
+
+    Транзакции разных файлов SQLite фиксируются по очереди, в порядке,
+    обратном перечислению, поэтому атомарность между ними не
+    гарантируется. Журнал изменений в них не участвует: его записи
+    откладываются до фиксации данных (см. `ChangeLog.record`).
+    """
+    with ExitStack() as stack:
+        for alias in dict.fromkeys(aliases):
+            stack.enter_context(transaction.atomic(using=alias))
+        yield
+
+
+def atomic_for(*models):
+    """Транзакция во всех БД, где хранятся `models`."""
+    return atomic_on(*(router.db_for_write(model) for model in models))
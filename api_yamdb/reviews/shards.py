@@ -0,0 +1,196 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router
+from django.db.models import Prefetch, prefetch_related_objects
+
+
+class ShardRoutingError(LookupError):
+    """Запрос к отзывам без указания шарда."""
+
+
+# Шард для запросов без подсказки (см. pinned_shard).
+current_shard = ContextVar("current_shard", default=None)
+
+
+def review_shards():
+    """Алиасы шардов отзывов и комментариев (пусто — шардов нет)."""
+    return settings.REVIEW_SHARDS
+
+
+def is_sharded():
+    return bool(settings.REVIEW_SHARDS)
+
+
+def review_databases():
+    """БД с отзывами: все шарды или единственная БД отзывов."""
+    if is_sharded():
+        return list(review_shards())
+    from reviews.models import Review
+
+    return [router.db_for_write(Review)]
+
+
+def shard_for_title(title_id):
+    """Шард отзывов произведения: остаток от деления id на число шардов."""
+    shards = review_shards()
+    return shards[int(title_id) % len(shards)]
+
+
+def title_reviews_database(title_id):
+    """Шард отзывов произведения или `None`, если шардов нет."""
+    return shard_for_title(title_id) if is_sharded() else None
+
+
+def titles_by_database(title_ids):
+    """Сгруппировать id произведений по БД, где лежат их отзывы."""
+    groups = {}
+    for title_id in title_ids:
+        alias = (
+            shard_for_title(title_id)
+            if is_sharded()
+            else review_databases()[0]
+        )
+        groups.setdefault(alias, []).append(title_id)
+    return groups
+
+
+def shard_for_instance(instance):
+    """Шард, в котором лежит (или будет лежать) объект.
+
+    Произведение определяет шард своих отзывов, отзыв (и архивный) — по
+    своему произведению, комментарий — по шарду загруженного отзыва.
+    Без таких сведений используется шард из `pinned_shard`, если он задан.
+    """
+    from reviews.models import (
+        ArchivedComment,
+        ArchivedReview,
+        Comment,
+        Review,
+        Title,
+    )
+
+    if isinstance(instance, Title) and instance.pk is not None:
+        return shard_for_title(instance.pk)
+    if (
+        isinstance(instance, (Review, ArchivedReview))
+        and instance.title_id is not None
+    ):
+        return shard_for_title(instance.title_id)
+    if isinstance(instance, (Comment, ArchivedComment)):
+        if instance._state.db in review_shards():
+            return instance._state.db
+        if type(instance).review.is_cached(instance):
+            return shard_for_instance(instance.review)
+    if current_shard.get() is not None:
+        return current_shard.get()
+    raise ShardRoutingError(
+        "Не удалось определить шард: передайте произведение или отзыв "
+        "или укажите БД через using()."
+    )
+
+
+@contextmanager
+def pinned_shard(alias):
+    """Направлять в шард `alias` запросы к отзывам без подсказки.
+
+    Нужен коду, который строит запросы сам и не передаёт объект, например
+    административному интерфейсу.
+    """
+    token = current_shard.set(alias)
+    try:
+        yield
+    finally:
+        current_shard.reset(token)
+
+
+def prefetch_by_shard(instances, prefetches):
+    """Выполнить предзагрузку отзывов отдельно для каждого шарда.
+
+    Связанный запрос Django направляет в шард первого объекта, поэтому
+    объекты группируются по шардам и на каждый шард приходится свой
+    запрос на уровень вложенности.
+    """
+    groups = {}
+    for instance in instances:
+        groups.setdefault(shard_for_instance(instance), []).append(instance)
+    for alias, group in groups.items():
+        prefetch_related_objects(
+            group,
+            *(
+                Prefetch(
+                    prefetch.prefetch_through,
+                    queryset=prefetch.queryset.using(alias),
+                    to_attr=prefetch.to_attr,
+                )
+                for prefetch in prefetches
+            ),
+        )
+
+
+def init_sequences(alias):
+    """Сдвинуть автоинкремент таблиц шарда в его диапазон id.
+
+    Шард с номером k выдаёт id начиная с `k * REVIEW_SHARD_ID_SPAN + 1`,
+    поэтому id отзывов и комментариев уникальны во всех шардах и
+    журнал изменений ссылается на них однозначно.
+    """
+    start = review_shards().index(alias) * settings.REVIEW_SHARD_ID_SPAN
+    if not start:
+        return
+    with connections[alias].cursor() as cursor:
+        for table in ("reviews_review", "reviews_comment"):
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, %s) "
+                "WHERE name = %s",
+                (start, table),
+            )
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s "
+                "WHERE NOT EXISTS "
+                "(SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+                (table, start, table),
+            )
+
+
+def init_shard_sequences(sender, using, **kwargs):
+    """Обработчик `post_migrate`: подготовить шард после миграций."""
+    if using in review_shards():
+        init_sequences(using)
+
+
+def run_on_shard(func, alias):
+    close_old_connections()
+    try:
+        return func(alias)
+    finally:
+        connections.close_all()
+
+
+def fan_out(func, aliases=None):
+    """Выполнить `func(alias)` на всех шардах параллельно.
+
+    Каждый поток открывает свои соединения, поэтому функция не видит
+    незафиксированных изменений вызывающего потока и вызывается только
+    вне транзакции. Возвращает результаты в порядке шардов.
+    """
+    aliases = list(aliases or review_databases())
+    if len(aliases) < 2:
+        return [func(alias) for alias in aliases]
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        return list(
+            pool.map(lambda alias: run_on_shard(func, alias), aliases)
+        )
+
+
+def in_bulk_everywhere(queryset, ids):
+    """`in_bulk` по всем БД отзывов: id уникальны во всех шардах."""
+    ids = list(ids)
+    if not ids:
+        return {}
+    found = {}
+    for result in fan_out(lambda alias: queryset.using(alias).in_bulk(ids)):
+        found.update(result)
+    return found
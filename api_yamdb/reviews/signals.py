@@ -0,0 +1,228 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from reviews.models import (
+    ArchivedComment,
+    ArchivedReview,
+    Category,
+    ChangeLog,
+    Comment,
+    Genre,
+    GenreTitle,
+    Review,
+    Title,
+    User,
+)
+from reviews.routers import is_split
+from reviews.shards import review_databases
+from reviews.title_index import title_index
+
+
+def log_save(sender, instance, created, using, raw=False, **kwargs):
+    """Записать создание или изменение объекта в журнал."""
+    if raw:
+        return
+    ChangeLog.record(
+        sender,
+        (instance.pk,),
+        ChangeLog.CREATED if created else ChangeLog.UPDATED,
+        using=using,
+    )
+
+
+def log_delete(sender, instance, using, **kwargs):
+    """Записать удаление объекта в журнал."""
+    ChangeLog.record(sender, (instance.pk,), ChangeLog.DELETED, using=using)
+
+
+# Журнал подключается первым: запись об объекте предшествует записям о
+# зависимых изменениях, например о пересчёте рейтинга произведения.
+for model in (Title, Review, Comment, Genre, Category):
+    post_save.connect(log_save, sender=model)
+    post_delete.connect(log_delete, sender=model)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def update_title_rating(sender, instance, **kwargs):
+    """Обновить рейтинг произведения после изменения отзыва."""
+    Title.objects.filter(pk=instance.title_id).update_rating()
+
+
+def update_comment_count(instance, using):
+    """Пересчитать число комментариев отзыва комментария."""
+    for model in (Review, ArchivedReview):
+        model.objects.using(using).filter(
+            pk=instance.review_id
+        ).update_comment_count()
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(
+    sender, instance, created, using, raw=False, **kwargs
+):
+    if created and not raw:
+        update_comment_count(instance, using)
+
+
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=ArchivedComment)
+def count_deleted_comment(sender, instance, using, **kwargs):
+    update_comment_count(instance, using)
+
+
+@receiver(pre_delete, sender=Category)
+def log_detached_titles(sender, instance, **kwargs):
+    """Записать в журнал произведения, которые останутся без категории.
+
+    `SET_NULL` выполняется запросом UPDATE без сигналов сохранения.
+    """
+    ChangeLog.record(
+        Title,
+        instance.titles.values_list("pk", flat=True),
+        ChangeLog.UPDATED,
+    )
+
+
+@receiver(post_save, sender=GenreTitle)
+def log_genre_link(sender, instance, raw=False, **kwargs):
+    """Записать в журнал произведение, получившее жанр."""
+    if not raw:
+        ChangeLog.record(Title, (instance.title_id,), ChangeLog.UPDATED)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def log_title_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    """Записать в журнал произведения, у которых изменились жанры.
+
+    Связи меняются без сигналов сохранения произведения, а индекс
+    произведений в других процессах узнаёт об изменениях из журнала.
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        title_ids = (instance.pk,)
+    elif action == "pre_clear":
+        title_ids = GenreTitle.objects.filter(
+            genre_id=instance.pk
+        ).values_list("title_id", flat=True)
+    else:
+        title_ids = pk_set
+    ChangeLog.record(Title, title_ids, ChangeLog.UPDATED)
+
+
+@receiver(pre_delete, sender=Title)
+def delete_title_reviews(sender, instance, **kwargs):
+    """Удалить отзывы произведения из отдельной БД отзывов.
+
+    Каскад Django удаляет связанные строки в БД удаляемого объекта,
+    поэтому отзывы в другой БД удаляются явно.
+    """
+    if is_split(Title, Review):
+        instance.reviews.all().delete()
+        instance.archived_reviews.all().delete()
+
+
+@receiver(pre_delete, sender=User)
+def delete_user_reviews(sender, instance, **kwargs):
+    """Удалить отзывы и комментарии пользователя из всех БД отзывов."""
+    if not is_split(User, Review):
+        return
+    for alias in review_databases():
+        for model in (ArchivedComment, ArchivedReview, Comment, Review):
+            model.objects.using(alias).filter(author_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=ArchivedReview)
+def delete_archived_comments(sender, instance, using, **kwargs):
+    """Удалить архивные комментарии удалённого отзыва.
+
+    Их внешний ключ не каскадируется: отзыв может лежать в архиве.
+    """
+    if settings.REVIEW_ARCHIVE_ENABLED:
+        ArchivedComment.objects.using(using).filter(
+            review_id=instance.pk
+        ).delete()
+
+
+def update_title_index(func, *args):
+    """Применить изменение к индексу произведений после фиксации."""
+    if title_index.warmed:
+        transaction.on_commit(lambda: func(*args))
+
+
+@receiver(post_save, sender=Title)
+def index_title(sender, instance, **kwargs):
+    update_title_index(
+        title_index.set_title, instance.pk, instance.category_id,
+        instance.year,
+    )
+
+
+@receiver(post_delete, sender=Title)
+def unindex_title(sender, instance, **kwargs):
+    update_title_index(title_index.remove_title, instance.pk)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+def index_slug(sender, instance, **kwargs):
+    update_title_index(
+        title_index.set_slug, sender, instance.pk, instance.slug
+    )
+
+
+@receiver(post_delete, sender=Genre)
+def unindex_genre(sender, instance, **kwargs):
+    update_title_index(title_index.set_slug, sender, instance.pk, None)
+    update_title_index(title_index.clear_genre, instance.pk)
+
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    update_title_index(title_index.set_slug, sender, instance.pk, None)
+    update_title_index(title_index.clear_category, instance.pk)
+
+
+@receiver(post_save, sender=GenreTitle)
+def index_genre_title(sender, instance, **kwargs):
+    update_title_index(
+        title_index.add_genres, instance.title_id, (instance.genre_id,)
+    )
+
+
+@receiver(post_delete, sender=GenreTitle)
+def unindex_genre_title(sender, instance, **kwargs):
+    update_title_index(
+        title_index.remove_genres, instance.title_id, (instance.genre_id,)
+    )
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def index_title_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    """Отразить в индексе изменения через `title.genre` и обратную связь."""
+    if action == "post_clear":
+        if reverse:
+            update_title_index(title_index.clear_genre, instance.pk)
+        else:
+            update_title_index(title_index.remove_genres, instance.pk)
+        return
+    if action == "post_add":
+        change = title_index.add_genres
+    elif action == "post_remove":
+        change = title_index.remove_genres
+    else:
+        return
+    if reverse:
+        for title_id in pk_set:
+            update_title_index(change, title_id, (instance.pk,))
+    else:
+        update_title_index(change, instance.pk, set(pk_set))
@@ -0,0 +1,261 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from reviews.models import Category, ChangeLog, Genre, GenreTitle, Title
+
+# Модели, записи журнала о которых меняют индекс.
+INDEXED_MODELS = ("title", "genre", "category")
+
+
+class TitleIndex:
+    """Индекс произведений в памяти процесса.
+
+    Для каждого жанра, категории и года хранится множество
+    идентификаторов произведений, поэтому фильтр по нескольким жанрам
+    сводится к пересечению или объединению множеств без обращения к БД.
+    Записи своего процесса применяются сигналами после фиксации, а
+    изменения других процессов (воркеры gunicorn, `runworker`, команды
+    `manage.py`) индекс догоняет по журналу изменений перед поиском.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Очистить индекс и перевести его в непрогретое состояние."""
+        with self._lock:
+            self.warmed = False
+            self.cursor = 0
+            self._genres = defaultdict(set)
+            self._categories = defaultdict(set)
+            self._years = defaultdict(set)
+            self._genre_slugs = {}
+            self._category_slugs = {}
+            self._title_genres = defaultdict(set)
+            self._title_facets = {}
+
+    def rebuild(self):
+        """Перестроить индекс по данным из БД.
+
+        Курсор журнала читается до данных: изменения, записанные во
+        время перестройки, будут применены повторно, а не пропущены.
+        """
+        last = ChangeLog.objects.order_by("-id").values_list("id").first()
+        genre_titles = GenreTitle.objects.values_list("genre_id", "title_id")
+        titles = Title.objects.values_list("id", "category_id", "year")
+        with self._lock:
+            self.reset()
+            for genre_id, title_id in genre_titles.iterator():
+                self._genres[genre_id].add(title_id)
+                self._title_genres[title_id].add(genre_id)
+            for title_id, category_id, year in titles.iterator():
+                self._categories[category_id].add(title_id)
+                self._years[year].add(title_id)
+                self._title_facets[title_id] = (category_id, year)
+            self._genre_slugs = dict(
+                Genre.objects.values_list("slug", "id")
+            )
+            self._category_slugs = dict(
+                Category.objects.values_list("slug", "id")
+            )
+            self.cursor = last[0] if last else 0
+            self.warmed = True
+
+    def warm_up(self):
+        """Прогреть индекс при старте, если он включён в настройках."""
+        if not getattr(settings, "TITLE_INDEX_ENABLED", False):
+            return
+        try:
+            self.rebuild()
+        except DatabaseError:
+            self.reset()
+
+    def catch_up(self):
+        """Применить изменения из журнала, записанные после курсора.
+
+        Изменённые произведения, жанры и категории перечитываются из БД.
+        Если изменений больше `TITLE_INDEX_MAX_CHANGES`, индекс
+        перестраивается целиком.
+        """
+        limit = settings.TITLE_INDEX_MAX_CHANGES
+        with self._lock:
+            changes = list(
+                ChangeLog.objects.filter(
+                    id__gt=self.cursor, model__in=INDEXED_MODELS
+                )
+                .order_by("id")
+                .values_list("id", "model", "object_id")[: limit + 1]
+            )
+            if len(changes) > limit:
+                self.rebuild()
+                return
+            ids = defaultdict(set)
+            for _, model, object_id in changes:
+                ids[model].add(object_id)
+            self._reload_slugs(Genre, ids["genre"])
+            self._reload_slugs(Category, ids["category"])
+            self._reload_titles(ids["title"])
+            if changes:
+                self.cursor = changes[-1][0]
+
+    def _reload_slugs(self, model, pks):
+        slugs = dict(
+            model.objects.filter(pk__in=pks).values_list("pk", "slug")
+        )
+        for pk in pks:
+            self.set_slug(model, pk, slugs.get(pk))
+            if pk in slugs:
+                continue
+            if model is Genre:
+                self.clear_genre(pk)
+            else:
+                self.clear_category(pk)
+
+    def _reload_titles(self, pks):
+        facets = {
+            pk: (category_id, year)
+            for pk, category_id, year in Title.objects.filter(
+                pk__in=pks
+            ).values_list("pk", "category_id", "year")
+        }
+        genres = defaultdict(set)
+        for title_id, genre_id in GenreTitle.objects.filter(
+            title_id__in=facets
+        ).values_list("title_id", "genre_id"):
+            genres[title_id].add(genre_id)
+        for pk in pks:
+            self.remove_title(pk)
+            if pk in facets:
+                self.set_title(pk, *facets[pk])
+                self.add_genres(pk, genres[pk])
+
+    def set_slug(self, model, pk, slug):
+        with self._lock:
+            slugs = self._slugs_for(model)
+            for old_slug, old_pk in list(slugs.items()):
+                if old_pk == pk:
+                    del slugs[old_slug]
+            if slug is not None:
+                slugs[slug] = pk
+
+    def _slugs_for(self, model):
+        if model is Genre:
+            return self._genre_slugs
+        return self._category_slugs
+
+    def add_genres(self, title_id, genre_ids):
+        with self._lock:
+            for genre_id in genre_ids:
+                self._genres[genre_id].add(title_id)
+                self._title_genres[title_id].add(genre_id)
+
+    def remove_genres(self, title_id, genre_ids=None):
+        with self._lock:
+            if genre_ids is None:
+                genre_ids = set(self._title_genres.get(title_id, ()))
+            for genre_id in genre_ids:
+                self._genres[genre_id].discard(title_id)
+                self._title_genres[title_id].discard(genre_id)
+            if not self._title_genres.get(title_id):
+                self._title_genres.pop(title_id, None)
+
+    def clear_genre(self, genre_id):
+        with self._lock:
+            for title_id in self._genres.pop(genre_id, set()):
+                self.remove_genres(title_id, (genre_id,))
+
+    def clear_category(self, category_id):
+        """Перенести произведения удалённой категории в «без категории»."""
+        with self._lock:
+            title_ids = self._categories.pop(category_id, set())
+            self._categories[None] |= title_ids
+            for title_id in title_ids:
+                _, year = self._title_facets[title_id]
+                self._title_facets[title_id] = (None, year)
+
+    def set_title(self, title_id, category_id, year):
+        with self._lock:
+            self.remove_title(title_id, keep_genres=True)
+            self._categories[category_id].add(title_id)
+            self._years[year].add(title_id)
+            self._title_facets[title_id] = (category_id, year)
+
+    def remove_title(self, title_id, keep_genres=False):
+        with self._lock:
+            facets = self._title_facets.pop(title_id, None)
+            if facets is not None:
+                category_id, year = facets
+                self._categories[category_id].discard(title_id)
+                self._years[year].discard(title_id)
+            if not keep_genres:
+                self.remove_genres(title_id)
+
+    def lookup(
+        self,
+        genres=(),
+        genre_mode="any",
+        categories=(),
+        year=None,
+        year_gte=None,
+        year_lte=None,
+        limit=None,
+    ):
+        """Найти идентификаторы произведений по жанрам, категориям и году.
+
+        Возвращает `None`, если индекс не прогрет, журнал изменений
+        недоступен или совпадений больше `limit` — тогда фильтрацию
+        выполняет ORM.
+        """
+        if not self.warmed:
+            return None
+        with self._lock:
+            try:
+                self.catch_up()
+            except DatabaseError:
+                return None
+            result = self._combine(
+                (
+                    self._genres.get(self._genre_slugs.get(slug), ())
+                    for slug in genres
+                ),
+                all_required=(genre_mode == "all"),
+            )
+            if categories:
+                result &= self._combine(
+                    self._categories.get(self._category_slugs.get(slug), ())
+                    for slug in categories
+                )
+            if year is not None or year_gte is not None or (
+                year_lte is not None
+            ):
+                result &= self._combine(
+                    title_ids
+                    for key, title_ids in self._years.items()
+                    if (year is None or key == year)
+                    and (year_gte is None or key >= year_gte)
+                    and (year_lte is None or key <= year_lte)
+                )
+        if limit is not None and len(result) > limit:
+            return None
+        return sorted(result)
+
+    @staticmethod
+    def _combine(id_sets, all_required=False):
+        """Пересечение или объединение множеств в новом множестве."""
+        id_sets = list(id_sets)
+        if not id_sets:
+            return set()
+        result = set(id_sets[0])
+        for title_ids in id_sets[1:]:
+            if all_required:
+                result &= title_ids
+            else:
+                result |= title_ids
+        return result
+
+
+title_index = TitleIndex()
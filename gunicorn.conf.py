@@ -0,0 +1,43 @@
+"""Профиль запуска приложения через gunicorn.
+
+WSGI: gunicorn -c gunicorn.conf.py
+ASGI: GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+    gunicorn -c gunicorn.conf.py
+"""
+import multiprocessing
+import os
+
+chdir = "api_yamdb"
+raw_env = [
+    "DJANGO_SETTINGS_MODULE="
+    + os.getenv("DJANGO_SETTINGS_MODULE", "api_yamdb.settings_production")
+]
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+wsgi_app = (
+    "api_yamdb.asgi:application"
+    if worker_class.startswith("uvicorn")
+    else "api_yamdb.wsgi:application"
+)
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(
+    os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1)
+)
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+# Приложение загружается в мастер-процессе до fork: рабочие процессы
+# стартуют быстрее и разделяют память с прогретым индексом жанров.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESSLOG")
+
+
+def pre_fork(server, worker):
+    """Не передавать рабочим процессам соединения с БД мастера."""
+    if preload_app:
+        from django.db import connections
+
+        connections.close_all()
@@ -0,0 +1,284 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08TitleQueryAPI:
+    url = '/api/v1/titles/'
+
+    def test_01_title_ordering(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(admin_client, titles[0]['id'], 'Плохо', 2)
+        create_single_review(user_client, titles[1]['id'], 'Отлично', 9)
+
+        response = admin_client.get(f'{self.url}?ordering=-rating')
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{self.url}` с параметром '
+            '`ordering` возвращает ответ со статусом 200.'
+        )
+        ids = [title['id'] for title in response.json()['results']]
+        assert ids == [titles[1]['id'], titles[0]['id']], (
+            f'Проверьте, что для эндпоинта `{self.url}` реализована '
+            'сортировка по полю `rating`.'
+        )
+
+        response = admin_client.get(f'{self.url}?ordering=-year')
+        ids = [title['id'] for title in response.json()['results']]
+        assert ids == [titles[1]['id'], titles[0]['id']], (
+            f'Проверьте, что для эндпоинта `{self.url}` реализована '
+            'сортировка по полю `year`.'
+        )
+
+        response = admin_client.get(f'{self.url}?ordering=name')
+        names = [title['name'] for title in response.json()['results']]
+        assert names == sorted(names), (
+            f'Проверьте, что для эндпоинта `{self.url}` реализована '
+            'сортировка по полю `name`.'
+        )
+
+    def test_02_title_multi_value_filters(self, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+
+        response = admin_client.get(
+            f'{self.url}?genre={genres[0]["slug"]},{genres[2]["slug"]}'
+        )
+        assert len(response.json()['results']) == 2, (
+            f'Проверьте, что для эндпоинта `{self.url}` фильтр `genre` '
+            'принимает несколько слагов через запятую.'
+        )
+
+        response = admin_client.get(
+            f'{self.url}?genre={genres[0]["slug"]},{genres[1]["slug"]}'
+            '&genre_mode=all'
+        )
+        ids = [title['id'] for title in response.json()['results']]
+        assert ids == [titles[0]['id']], (
+            f'Проверьте, что для эндпоинта `{self.url}` при '
+            '`genre_mode=all` возвращаются только произведения со всеми '
+            'перечисленными жанрами.'
+        )
+
+        response = admin_client.get(
+            f'{self.url}?category={categories[0]["slug"].upper()},'
+            f'{categories[1]["slug"]}'
+        )
+        assert len(response.json()['results']) == 2, (
+            f'Проверьте, что для эндпоинта `{self.url}` фильтр `category` '
+            'принимает несколько слагов без учёта регистра.'
+        )
+
+    def test_03_title_range_filters(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(admin_client, titles[1]['id'], 'Отлично', 9)
+
+        response = admin_client.get(f'{self.url}?year__gte=1985')
+        ids = [title['id'] for title in response.json()['results']]
+        assert ids == [titles[1]['id']], (
+            f'Проверьте, что для эндпоинта `{self.url}` реализован фильтр '
+            '`year__gte`.'
+        )
+        response = admin_client.get(f'{self.url}?year__lte=1985')
+        ids = [title['id'] for title in response.json()['results']]
+        assert ids == [titles[0]['id']], (
+            f'Проверьте, что для эндпоинта `{self.url}` реализован фильтр '
+            '`year__lte`.'
+        )
+        response = admin_client.get(f'{self.url}?rating__gte=5')
+        ids = [title['id'] for title in response.json()['results']]
+        assert ids == [titles[1]['id']], (
+            f'Проверьте, что для эндпоинта `{self.url}` реализован фильтр '
+            '`rating__gte`.'
+        )
+
+    def test_04_title_genre_index(self, admin_client, settings):
+        from reviews.title_index import title_index
+
+        settings.TITLE_INDEX_ENABLED = True
+        title_index.warm_up()
+        try:
+            titles, categories, genres = create_titles(admin_client)
+            query = (
+                f'{self.url}?genre={genres[0]["slug"]},{genres[2]["slug"]}'
+            )
+            assert title_index.lookup(genres={genres[0]['slug']}) == [
+                titles[0]['id']
+            ], 'Проверьте, что индекс жанров обновляется при записи.'
+            response = admin_client.get(query)
+            assert len(response.json()['results']) == 2, (
+                f'Проверьте, что фильтр `genre` эндпоинта `{self.url}` '
+                'использует индекс жанров и возвращает все совпадения.'
+            )
+            response = admin_client.get(
+                f'{query}&category={categories[1]["slug"]}&year__gte=1985'
+            )
+            ids = [title['id'] for title in response.json()['results']]
+            assert ids == [titles[1]['id']], (
+                f'Проверьте, что индекс жанров эндпоинта `{self.url}` '
+                'учитывает фильтры `category` и `year`.'
+            )
+            admin_client.delete(f'{self.url}{titles[1]["id"]}/')
+            response = admin_client.get(query)
+            assert len(response.json()['results']) == 1, (
+                'Проверьте, что индекс жанров обновляется при удалении '
+                'произведения.'
+            )
+        finally:
+            title_index.reset()
+
+    def test_05_title_sparse_fields(self, admin_client,
+                                    django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        with django_assert_num_queries(3):
+            response = admin_client.get(f'{self.url}?fields=id,name,rating')
+        assert response.status_code == HTTPStatus.OK
+        for title in response.json()['results']:
+            assert set(title) == {'id', 'name', 'rating'}, (
+                f'Проверьте, что эндпоинт `{self.url}` выводит только поля, '
+                'перечисленные в параметре `fields`.'
+            )
+
+        response = admin_client.get(
+            f'{self.url}{titles[0]["id"]}/?omit=description,genre'
+        )
+        data = response.json()
+        assert 'description' not in data and 'genre' not in data, (
+            f'Проверьте, что эндпоинт `{self.url}{{title_id}}/` не выводит '
+            'поля, перечисленные в параметре `omit`.'
+        )
+        assert data['category'] == {'name': 'Фильм', 'slug': 'films'}, (
+            'Проверьте, что параметр `omit` не затрагивает остальные поля.'
+        )
+
+        review = create_single_review(
+            admin_client, titles[0]['id'], 'Отлично', 9
+        ).json()
+        response = admin_client.get(
+            f'{self.url}{titles[0]["id"]}/reviews/?fields=id,score,author'
+        )
+        assert response.json()['results'] == [
+            {'id': review['id'], 'score': 9, 'author': review['author']}
+        ], (
+            'Проверьте, что параметр `fields` поддерживается эндпоинтом '
+            '`/api/v1/titles/{title_id}/reviews/`.'
+        )
+
+    def test_06_title_expand(self, admin_client, user_client,
+                             django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        reviews = [
+            create_single_review(client, title_id, text, score).json()
+            for client, text, score in (
+                (admin_client, 'Первый', 3), (user_client, 'Второй', 8)
+            )
+        ]
+        for text in ('Раз', 'Два', 'Три'):
+            admin_client.post(
+                f'{self.url}{title_id}/reviews/{reviews[1]["id"]}/comments/',
+                data={'text': text}
+            )
+
+        url = (
+            f'{self.url}{title_id}/?expand=reviews.comments'
+            '&reviews_limit=1&comments_limit=2'
+        )
+        with django_assert_num_queries(5):
+            response = admin_client.get(url)
+        data = response.json()
+        assert [review['id'] for review in data.get('reviews', [])] == [
+            reviews[1]['id']
+        ], (
+            f'Проверьте, что `{url}` встраивает последние отзывы с учётом '
+            'параметра `reviews_limit`.'
+        )
+        comments = data['reviews'][0].get('comments', [])
+        assert [comment['text'] for comment in comments] == ['Три', 'Два'], (
+            f'Проверьте, что `{url}` встраивает последние комментарии с '
+            'учётом параметра `comments_limit`.'
+        )
+
+        response = admin_client.get(f'{self.url}?expand=reviews')
+        for title in response.json()['results']:
+            assert 'reviews' in title and 'comments' not in str(title), (
+                'Проверьте, что параметр `expand` поддерживается списком '
+                'произведений и встраивает только запрошенные уровни.'
+            )
+
+    def test_07_batch_retrieve(self, admin_client, admin, user,
+                               django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        missing_id = titles[1]['id'] + 100
+        url = (
+            f'{self.url}?ids={titles[1]["id"]},{missing_id},{titles[0]["id"]}'
+        )
+        with django_assert_num_queries(3):
+            response = admin_client.get(url)
+        data = response.json()
+        assert [title['id'] for title in data['results']] == [
+            titles[1]['id'], titles[0]['id']
+        ], (
+            f'Проверьте, что `{url}` возвращает произведения в порядке '
+            'перечисления идентификаторов.'
+        )
+        assert data['missing'] == [missing_id], (
+            f'Проверьте, что `{url}` сообщает о ненайденных идентификаторах.'
+        )
+
+        response = admin_client.get(f'{self.url}?ids=1,abc')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что некорректный идентификатор в параметре `ids` '
+            'приводит к ответу со статусом 400.'
+        )
+
+        url = f'/api/v1/users/?usernames={user.username},{admin.username}'
+        response = admin_client.get(url)
+        assert [item['username'] for item in response.json()['results']] == [
+            user.username, admin.username
+        ], (
+            f'Проверьте, что `{url}` возвращает пользователей в порядке '
+            'перечисления.'
+        )
+
+    def test_08_title_index_catches_up(self, admin_client):
+        from reviews.models import Genre, GenreTitle
+        from reviews.title_index import TitleIndex
+
+        other = TitleIndex()
+        other.rebuild()
+        titles, _, genres = create_titles(admin_client)
+        assert other.lookup(genres={genres[0]['slug']}) == [
+            titles[0]['id']
+        ], (
+            'Проверьте, что индекс произведений догоняет по журналу '
+            'изменений записи других процессов.'
+        )
+        response = admin_client.patch(
+            f'{self.url}{titles[0]["id"]}/',
+            data={'genre': [genres[2]['slug']]},
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert other.lookup(genres={genres[0]['slug']}) == [], (
+            'Проверьте, что индекс произведений видит изменение жанров '
+            'произведения в другом процессе.'
+        )
+        GenreTitle.objects.create(
+            title_id=titles[1]['id'],
+            genre=Genre.objects.get(slug=genres[0]['slug']),
+        )
+        assert other.lookup(genres={genres[0]['slug']}) == [
+            titles[1]['id']
+        ], (
+            'Проверьте, что индекс произведений видит связи с жанрами, '
+            'созданные напрямую (например, `loadcsv`).'
+        )
+        assert other.lookup(genres={genres[2]['slug']}) == sorted(
+            title['id'] for title in titles
+        )
+        admin_client.delete(f'/api/v1/genres/{genres[2]["slug"]}/')
+        assert other.lookup(genres={genres[2]['slug']}) == [], (
+            'Проверьте, что индекс произведений видит удаление жанра в '
+            'другом процессе.'
+        )
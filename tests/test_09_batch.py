@@ -0,0 +1,275 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09BatchAPI:
+    url = '/api/v1/batch/'
+
+    @pytest.mark.parametrize('parallel', (False, True))
+    def test_01_batch_requests(self, admin_client, user_client, parallel):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        reviews_url = f'/api/v1/titles/{title_id}/reviews/'
+        data = {
+            'parallel': parallel,
+            'requests': [
+                {'method': 'GET', 'path': f'/api/v1/titles/{title_id}/'},
+                {
+                    'method': 'POST',
+                    'path': reviews_url,
+                    'body': {'text': 'Отлично', 'score': 8},
+                },
+                {'method': 'GET', 'path': f'{reviews_url}?fields=id,score'},
+                {'method': 'GET', 'path': '/api/v1/users/'},
+                {'method': 'GET', 'path': '/api/v1/unknown/'},
+            ]
+        }
+        response = user_client.post(self.url, data=data, format='json')
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что POST-запрос к `{self.url}` возвращает ответ со '
+            'статусом 200.'
+        )
+        results = response.json()
+        assert [item['status'] for item in results] == [
+            HTTPStatus.OK, HTTPStatus.CREATED, HTTPStatus.OK,
+            HTTPStatus.FORBIDDEN, HTTPStatus.NOT_FOUND
+        ], (
+            f'Проверьте, что `{self.url}` возвращает статусы вложенных '
+            'запросов в порядке их перечисления с правами пользователя.'
+        )
+        assert results[0]['body']['id'] == title_id
+        assert results[2]['body']['results'] == [
+            {'id': results[1]['body']['id'], 'score': 8}
+        ], (
+            f'Проверьте, что запросы пакета `{self.url}` видят результат '
+            'предыдущих изменяющих запросов.'
+        )
+
+    def test_02_batch_invalid(self, user_client):
+        response = user_client.post(
+            self.url, data={'requests': []}, format='json'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f'Проверьте, что пустой пакет для `{self.url}` приводит к ответу '
+            'со статусом 400.'
+        )
+        response = user_client.post(
+            self.url,
+            data={'requests': [{'method': 'GET', 'path': self.url}]},
+            format='json'
+        )
+        assert response.json()[0]['status'] == HTTPStatus.BAD_REQUEST, (
+            f'Проверьте, что `{self.url}` не выполняет вложенные пакеты.'
+        )
+
+    def test_03_bulk_reviews(self, admin_client, user_client, admin, user,
+                             django_assert_max_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/reviews/bulk/'
+        items = [
+            {'title': titles[0]['id'], 'author': admin.username,
+             'text': 'Хорошо', 'score': 8},
+            {'title': titles[0]['id'], 'author': user.username,
+             'text': 'Плохо', 'score': 2},
+            {'title': titles[1]['id'], 'author': user.username,
+             'text': 'Отлично', 'score': 10},
+            {'title': titles[0]['id'], 'author': user.username,
+             'text': 'Повтор', 'score': 5},
+            {'title': titles[1]['id'], 'author': 'nobody',
+             'text': 'Кто я', 'score': 5},
+            {'title': titles[1]['id'] + 100, 'author': admin.username,
+             'text': 'Куда', 'score': 5},
+            {'title': titles[1]['id'], 'author': admin.username,
+             'text': 'Мимо', 'score': 11},
+        ]
+        response = user_client.post(url, data={'items': items}, format='json')
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            f'Проверьте, что `{url}` доступен только администратору.'
+        )
+        with django_assert_max_num_queries(13):
+            response = admin_client.post(
+                url, data={'items': items}, format='json'
+            )
+        assert response.status_code == HTTPStatus.CREATED, (
+            f'Проверьте, что POST-запрос администратора к `{url}` '
+            'возвращает ответ со статусом 201.'
+        )
+        data = response.json()
+        assert data['created'] == 3, (
+            f'Проверьте, что `{url}` создаёт все корректные отзывы.'
+        )
+        assert [error['index'] for error in data['errors']] == [3, 4, 5, 6], (
+            f'Проверьте, что `{url}` возвращает ошибки по индексам '
+            'элементов, включая повторный отзыв автора.'
+        )
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.json()['rating'] == 5, (
+            f'Проверьте, что после загрузки через `{url}` рейтинг '
+            'произведения пересчитывается.'
+        )
+
+        review_id = admin_client.get(
+            f'/api/v1/titles/{titles[1]["id"]}/reviews/'
+        ).json()['results'][0]['id']
+        response = admin_client.post(
+            '/api/v1/comments/bulk/',
+            data={'items': [
+                {'review': review_id, 'author': admin.username,
+                 'text': 'Согласен'},
+                {'review': review_id + 100, 'author': admin.username,
+                 'text': 'Мимо'},
+            ]},
+            format='json'
+        )
+        data = response.json()
+        assert data['created'] == 1 and data['errors'][0]['index'] == 1, (
+            'Проверьте, что `/api/v1/comments/bulk/` создаёт корректные '
+            'комментарии и сообщает об ошибках.'
+        )
+
+    def test_04_bulk_titles(self, admin_client, user_client):
+        titles, categories, genres = create_titles(admin_client)
+        url = '/api/v1/titles/bulk/'
+        items = [
+            {'external_id': 'ext-1', 'name': 'Солярис', 'year': 1972,
+             'category': categories[0]['slug'],
+             'genre': [genres[2]['slug'], genres[1]['slug']]},
+            {'external_id': 'ext-2', 'name': 'Сталкер', 'year': 1979,
+             'genre': [genres[2]['slug']]},
+            {'external_id': 'ext-3', 'name': 'Зеркало', 'year': 1975,
+             'genre': ['unknown']},
+            {'external_id': 'ext-4', 'name': 'Будущее', 'year': 3000},
+        ]
+        response = user_client.put(url, data=items, format='json')
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            f'Проверьте, что `{url}` доступен только администратору.'
+        )
+        response = admin_client.put(url, data=items, format='json')
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что PUT-запрос администратора к `{url}` '
+            'возвращает ответ со статусом 200.'
+        )
+        data = response.json()
+        assert (data['created'], data['updated'], data['unchanged']) == (
+            2, 0, 0
+        ), f'Проверьте, что `{url}` создаёт новые произведения.'
+        assert [error['index'] for error in data['errors']] == [2, 3]
+        assert 'items_per_second' in data
+
+        payload = '\n'.join((
+            '{"external_id": "ext-1", "name": "Солярис", "year": 1972, '
+            f'"category": "{categories[0]["slug"]}", '
+            f'"genre": ["{genres[2]["slug"]}"]}}',
+            '{"external_id": "ext-2", "name": "Сталкер", "year": 1979, '
+            f'"genre": ["{genres[2]["slug"]}"]}}',
+        ))
+        response = admin_client.put(
+            url, data=payload, content_type='application/x-ndjson'
+        )
+        data = response.json()
+        assert (data['created'], data['updated'], data['unchanged']) == (
+            0, 1, 1
+        ), f'Проверьте, что `{url}` принимает NDJSON и обновляет жанры.'
+
+        response = admin_client.get(
+            f'/api/v1/titles/?genre={genres[2]["slug"]}'
+        )
+        names = {title['name'] for title in response.json()['results']}
+        assert names == {'Крепкий орешек', 'Солярис', 'Сталкер'}, (
+            f'Проверьте, что `{url}` сохраняет связи с жанрами.'
+        )
+        response = admin_client.get(
+            f'/api/v1/titles/?genre={genres[1]["slug"]}'
+        )
+        assert len(response.json()['results']) == 1, (
+            f'Проверьте, что `{url}` удаляет лишние связи с жанрами.'
+        )
+
+    @pytest.mark.parametrize('parallel', (False, True))
+    def test_05_batch_item_error(self, admin_client, user_client,
+                                 monkeypatch, parallel):
+        from api.v1.views import TitleViewSet
+
+        def fail(*args, **kwargs):
+            raise RuntimeError('сбой')
+
+        titles, _, _ = create_titles(admin_client)
+        monkeypatch.setattr(TitleViewSet, 'retrieve', fail)
+        urls = [f'/api/v1/titles/{title["id"]}/' for title in titles]
+        reviews_url = f'{urls[0]}reviews/'
+        data = {
+            'parallel': parallel,
+            'requests': [
+                {'method': 'GET', 'path': urls[0]},
+                {
+                    'method': 'POST',
+                    'path': reviews_url,
+                    'body': {'text': 'Отлично', 'score': 8},
+                },
+                {'method': 'GET', 'path': urls[1]},
+                {'method': 'GET', 'path': reviews_url},
+            ]
+        }
+        response = user_client.post(self.url, data=data, format='json')
+        assert response.status_code == HTTPStatus.OK
+        results = response.json()
+        assert [item['status'] for item in results] == [
+            HTTPStatus.INTERNAL_SERVER_ERROR, HTTPStatus.CREATED,
+            HTTPStatus.INTERNAL_SERVER_ERROR, HTTPStatus.OK
+        ], (
+            f'Проверьте, что ошибка вложенного запроса `{self.url}` '
+            'возвращается статусом 500 этого запроса, а остальные '
+            'результаты сохраняются.'
+        )
+        assert results[3]['body']['count'] == 1
+
+    def test_06_bulk_reviews_race(self, admin_client, user_client, admin,
+                                  user, monkeypatch):
+        from api.v1 import bulk
+
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(user_client, titles[0]['id'], 'Раньше', 4)
+        # Отзыв из другого процесса не виден предварительной проверке.
+        monkeypatch.setattr(bulk, 'existing_reviews', lambda *args: set())
+        response = admin_client.post(
+            '/api/v1/reviews/bulk/',
+            data={'items': [
+                {'title': titles[0]['id'], 'author': admin.username,
+                 'text': 'Хорошо', 'score': 8},
+                {'title': titles[0]['id'], 'author': user.username,
+                 'text': 'Повтор', 'score': 2},
+            ]},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.CREATED
+        data = response.json()
+        assert data['created'] == 1 and [
+            error['index'] for error in data['errors']
+        ] == [1], (
+            'Проверьте, что нарушение уникальности при вставке пакета '
+            'возвращается ошибкой элемента, а остальные отзывы создаются.'
+        )
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.json()['rating'] == 6
+
+    def test_07_bulk_ids(self, settings):
+        from api.v1.bulk import bulk_create_with_ids
+        from reviews.models import Title
+
+        settings.BULK_BATCH_SIZE = 2
+        Title.objects.create(pk=1000, name='С явным id', year=2000)
+        titles = [
+            Title(name=f'Пакет {number}', year=2000) for number in range(5)
+        ]
+        titles.insert(2, Title(pk=500, name='Явный', year=2000))
+        bulk_create_with_ids(Title, titles)
+        assert [title.pk for title in titles] == [
+            Title.objects.get(name=title.name).pk for title in titles
+        ], (
+            'Проверьте, что `bulk_create_with_ids` проставляет объектам '
+            'id, выданные их вставкой.'
+        )
@@ -0,0 +1,88 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10ChangesAPI:
+    url = '/api/v1/changes/'
+
+    def get_changes(self, client, since=0, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        response = client.get(f'{self.url}?since={since}&{query}')
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{self.url}` возвращает ответ со '
+            'статусом 200.'
+        )
+        return response.json()
+
+    def test_01_changes_feed(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        data = self.get_changes(client)
+        changes = {
+            (item['model'], item['id'], item['action'])
+            for item in data['results']
+        }
+        assert ('title', titles[0]['id'], 'created') in changes, (
+            f'Проверьте, что `{self.url}` содержит созданные произведения.'
+        )
+        assert {model for model, _, _ in changes} == {
+            'title', 'genre', 'category'
+        }
+        cursor = data['next']
+
+        review = create_single_review(
+            admin_client, titles[0]['id'], 'Отлично', 9
+        ).json()
+        admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        data = self.get_changes(client, cursor)
+        changes = [
+            (item['model'], item['id'], item['action'])
+            for item in data['results']
+        ]
+        assert changes[0] == ('review', review['id'], 'created'), (
+            f'Проверьте, что `{self.url}` возвращает изменения после '
+            'курсора `since` в порядке фиксации.'
+        )
+        assert ('review', review['id'], 'deleted') in changes, (
+            f'Проверьте, что `{self.url}` содержит каскадные удаления.'
+        )
+        assert changes[-1] == ('title', titles[0]['id'], 'deleted')
+
+        data = self.get_changes(client, cursor, limit=1)
+        assert len(data['results']) == 1 and data['has_more'], (
+            f'Проверьте, что `{self.url}` учитывает параметр `limit`.'
+        )
+
+    def test_02_changes_bulk(self, client, admin_client, admin):
+        titles, _, _ = create_titles(admin_client)
+        cursor = self.get_changes(client)['next']
+        response = admin_client.post(
+            '/api/v1/reviews/bulk/',
+            data={'items': [
+                {'title': title['id'], 'author': admin.username,
+                 'text': 'Пакет', 'score': 7}
+                for title in titles
+            ]},
+            format='json'
+        )
+        assert response.json()['created'] == 2
+        review_ids = {
+            item['id'] for item in admin_client.get(
+                f'/api/v1/titles/{titles[1]["id"]}/reviews/'
+            ).json()['results']
+        } | {
+            item['id'] for item in admin_client.get(
+                f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+            ).json()['results']
+        }
+        data = self.get_changes(client, cursor)
+        assert {
+            item['id'] for item in data['results']
+            if item['model'] == 'review' and item['action'] == 'created'
+        } == review_ids, (
+            f'Проверьте, что `{self.url}` содержит отзывы, созданные '
+            'пакетной загрузкой.'
+        )
@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import sync_to_async
+
+from tests.utils import create_single_review, create_titles
+
+
+async def read_events(url, action, count):
+    from api_yamdb.asgi import application
+
+    received = []
+    disconnected = asyncio.Event()
+    done = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        body = message.get('body', b'')
+        if body.startswith(b'id:'):
+            received.append(body.decode())
+            if len(received) == count:
+                done.set()
+
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': url, 'query_string': b'',
+        'headers': [],
+    }
+    task = asyncio.ensure_future(application(scope, receive, send))
+    await asyncio.sleep(0.2)
+    await sync_to_async(action, thread_sensitive=False)()
+    await asyncio.wait_for(done.wait(), timeout=5)
+    disconnected.set()
+    await asyncio.wait_for(task, timeout=5)
+    return received
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11EventsAPI:
+
+    def test_01_title_events(self, admin_client, user_client, settings):
+        settings.SSE_POLL_INTERVAL = 0.05
+        titles, _, _ = create_titles(admin_client)
+
+        def post_reviews():
+            create_single_review(user_client, titles[1]['id'], 'Мимо', 3)
+            review = create_single_review(
+                admin_client, titles[0]['id'], 'Отлично', 9
+            ).json()
+            admin_client.post(
+                f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+                f'{review["id"]}/comments/',
+                data={'text': 'Согласен'}
+            )
+
+        events = asyncio.run(read_events(
+            f'/api/v1/titles/{titles[0]["id"]}/events/', post_reviews, 2
+        ))
+        assert [event.split('\n')[1] for event in events] == [
+            'event: review', 'event: comment'
+        ], (
+            'Проверьте, что `/api/v1/titles/{title_id}/events/` передаёт '
+            'новые отзывы и комментарии только этого произведения.'
+        )
+        data = json.loads(events[0].split('\n')[2][len('data: '):])
+        assert (data['text'], data['score']) == ('Отлично', 9)
+
+    def test_02_poll_survives_errors(self, admin_client, user_client,
+                                     settings, monkeypatch):
+        from api.v1 import events as events_module
+
+        settings.SSE_POLL_INTERVAL = 0.05
+        titles, _, _ = create_titles(admin_client)
+        fetch_events = events_module.fetch_events
+        failures = []
+
+        async def flaky_fetch(cursor):
+            if not failures:
+                failures.append(cursor)
+                raise RuntimeError('database table is locked')
+            return await fetch_events(cursor)
+
+        monkeypatch.setattr(events_module, 'fetch_events', flaky_fetch)
+        events = asyncio.run(read_events(
+            '/api/v1/events/',
+            lambda: create_single_review(
+                user_client, titles[0]['id'], 'Текст', 5
+            ),
+            1,
+        ))
+        assert failures and len(events) == 1, (
+            'Проверьте, что ошибка чтения журнала не останавливает опрос '
+            'событий.'
+        )
+
+    def test_03_cursor_waits_for_invisible_objects(self, admin_client,
+                                                   user_client):
+        from api.v1.events import fetch_events
+        from reviews.models import ChangeLog
+
+        titles, _, _ = create_titles(admin_client)
+        start = ChangeLog.objects.order_by('pk').last().pk
+        ChangeLog.objects.create(
+            model='review', object_id=10 ** 6, action=ChangeLog.CREATED
+        )
+        create_single_review(user_client, titles[0]['id'], 'Текст', 5)
+        assert asyncio.run(fetch_events(start)) == ([], start), (
+            'Проверьте, что курсор событий не проходит мимо объекта, '
+            'который ещё не виден.'
+        )
+
+        ChangeLog.objects.create(
+            model='review', object_id=10 ** 6, action=ChangeLog.DELETED
+        )
+        events, cursor = asyncio.run(fetch_events(start))
+        assert [event['event'] for _, event in events] == ['review'], (
+            'Проверьте, что удалённый объект пропускается, а следующие '
+            'события доставляются.'
+        )
+        assert cursor > start
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+
+async def asgi_get(path, query_string=b''):
+    from api_yamdb.asgi import application
+
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path,
+        'query_string': query_string, 'headers': [(b'host', b'testserver')],
+    }
+    await application(scope, receive, send)
+    status = messages[0]['status']
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return status, json.loads(body)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12AsyncAPI:
+    url = '/api/v1/async/'
+
+    def test_01_async_read_endpoints(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        review = create_single_review(
+            admin_client, title_id, 'Отлично', 9
+        ).json()
+        comment = admin_client.post(
+            f'/api/v1/titles/{title_id}/reviews/{review["id"]}/comments/',
+            data={'text': 'Согласен'}
+        ).json()
+
+        for path in (
+            'titles/',
+            f'titles/{title_id}/',
+            f'titles/{title_id}/reviews/',
+            f'titles/{title_id}/reviews/{review["id"]}/',
+            f'titles/{title_id}/reviews/{review["id"]}/comments/',
+            f'titles/{title_id}/reviews/{review["id"]}/comments/'
+            f'{comment["id"]}/',
+        ):
+            sync_response = admin_client.get(f'/api/v1/{path}?fields=id')
+            response = admin_client.get(f'{self.url}{path}?fields=id')
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что GET-запрос к `{self.url}{path}` возвращает '
+                'ответ со статусом 200.'
+            )
+            assert response.json() == sync_response.json(), (
+                f'Проверьте, что `{self.url}{path}` возвращает те же данные, '
+                f'что и `/api/v1/{path}`.'
+            )
+
+        response = admin_client.post(
+            f'{self.url}titles/', data={'name': 'Новое', 'year': 2000}
+        )
+        assert response.status_code == HTTPStatus.METHOD_NOT_ALLOWED, (
+            f'Проверьте, что эндпоинты `{self.url}` доступны только для '
+            'чтения.'
+        )
+
+    def test_02_async_read_under_asgi(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+
+        async def fetch_all():
+            return await asyncio.gather(*(
+                asgi_get(f'{self.url}titles/{title["id"]}/')
+                for title in titles
+            ), asgi_get(f'{self.url}titles/', b'ordering=-year'))
+
+        *details, (status, data) = asyncio.run(fetch_all())
+        assert [body['id'] for _, body in details] == [
+            title['id'] for title in titles
+        ], (
+            f'Проверьте, что `{self.url}titles/{{title_id}}/` под ASGI '
+            'обслуживает одновременные запросы.'
+        )
+        assert status == HTTPStatus.OK and [
+            title['id'] for title in data['results']
+        ] == [titles[1]['id'], titles[0]['id']], (
+            f'Проверьте, что `{self.url}titles/` под ASGI поддерживает '
+            'параметры запроса списка.'
+        )
@@ -0,0 +1,112 @@
+import pytest
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+
+
+def open_connection(path):
+    wrapper = DatabaseWrapper(
+        {**connection.settings_dict, 'NAME': str(path)}, alias='profile'
+    )
+    wrapper.ensure_connection()
+    return wrapper
+
+
+def read_pragma(wrapper, name):
+    with wrapper.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13SQLite:
+
+    @pytest.mark.parametrize('enabled', (False, True))
+    def test_01_sqlite_profile(self, settings, tmp_path, enabled):
+        settings.SQLITE_PERFORMANCE_PROFILE = enabled
+        wrapper = open_connection(tmp_path / 'db.sqlite3')
+        try:
+            journal_mode = read_pragma(wrapper, 'journal_mode')
+            synchronous = read_pragma(wrapper, 'synchronous')
+            temp_store = read_pragma(wrapper, 'temp_store')
+        finally:
+            wrapper.close()
+        expected = ('wal', 1, 2) if enabled else ('delete', 2, 0)
+        assert (journal_mode, synchronous, temp_store) == expected, (
+            'Проверьте, что профиль SQLite применяется к новым соединениям '
+            'только при `SQLITE_PERFORMANCE_PROFILE = True`.'
+        )
+
+    def test_02_write_retry(self, settings):
+        from django.db import OperationalError
+
+        from reviews.db import WriteGate, WriteUnavailable
+
+        settings.WRITE_RETRY_BACKOFF = 0.001
+        gate = WriteGate()
+        calls = []
+
+        def flaky_write(fail_times):
+            calls.append(1)
+            if len(calls) <= fail_times:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        assert gate.run(flaky_write, 2) == 'ok', (
+            'Проверьте, что запись повторяется при блокировке БД.'
+        )
+        stats = gate.stats()
+        assert (stats['writes'], stats['retries']) == (1, 2), (
+            'Проверьте, что очередь записей учитывает повторы.'
+        )
+        calls.clear()
+        with pytest.raises(WriteUnavailable):
+            gate.run(flaky_write, settings.WRITE_RETRY_ATTEMPTS)
+        assert gate.stats()['failures'] == 1, (
+            'Проверьте, что очередь записей учитывает отказы.'
+        )
+
+    def test_03_concurrent_writes(self, admin_client, user_client, admin,
+                                  user):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from django.db import connections
+
+        from reviews.db import write_gate
+        from reviews.models import Review, Title
+        from tests.utils import create_titles
+
+        titles, _, _ = create_titles(admin_client)
+        write_gate.reset_stats()
+
+        def create_review(args):
+            author, title_id = args
+            try:
+                return write_gate.run(
+                    Review.objects.create,
+                    author=author,
+                    title_id=title_id,
+                    text='Отлично',
+                    score=9,
+                ).pk
+            finally:
+                connections.close_all()
+
+        jobs = [(author, title['id']) for author in (admin, user)
+                for title in titles]
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            ids = list(pool.map(create_review, jobs))
+        assert len(set(ids)) == len(jobs), (
+            'Проверьте, что одновременные записи через очередь записей '
+            'выполняются без ошибок.'
+        )
+        assert Title.objects.get(pk=titles[0]['id']).rating == 9
+
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{ids[0]}/'
+        response = admin_client.patch(url, data={'score': 5})
+        assert response.status_code == 200
+        response = admin_client.get('/api/v1/metrics/writes/')
+        assert response.json()['writes'] == len(jobs) + 1, (
+            'Проверьте, что изменения отзывов выполняются через очередь '
+            'записей и `/api/v1/metrics/writes/` возвращает их число.'
+        )
+        assert user_client.get('/api/v1/metrics/writes/').status_code == 403
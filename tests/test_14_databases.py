@@ -0,0 +1,97 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'reviews'])
+class Test14DatabasesAPI:
+
+    def test_01_reviews_database(self, admin_client, user_client, user,
+                                 settings):
+        from reviews.models import Comment, Review
+
+        settings.REVIEWS_DATABASE = 'reviews'
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        url = f'/api/v1/titles/{title_id}/'
+        create_single_review(admin_client, title_id, 'Плохо', 2)
+        review = create_single_review(user_client, title_id, 'Отлично', 9)
+        assert review.status_code == HTTPStatus.CREATED
+        review = review.json()
+        response = admin_client.post(
+            f'{url}reviews/{review["id"]}/comments/', data={'text': 'Да'}
+        )
+        assert response.status_code == HTTPStatus.CREATED
+
+        assert (
+            Review.objects.using('reviews').count(),
+            Comment.objects.using('reviews').count(),
+            Review.objects.using('default').count(),
+        ) == (2, 1, 0), (
+            'Проверьте, что при `REVIEWS_DATABASE` отзывы и комментарии '
+            'сохраняются в отдельной БД.'
+        )
+
+        assert admin_client.get(url).json()['rating'] == 5, (
+            'Проверьте, что рейтинг произведения пересчитывается по отзывам '
+            'из отдельной БД.'
+        )
+        response = admin_client.get(f'{url}reviews/')
+        assert {item['author'] for item in response.json()['results']} == {
+            'TestAdmin', user.username
+        }, (
+            'Проверьте, что авторы отзывов из отдельной БД подгружаются '
+            'из БД пользователей.'
+        )
+        data = admin_client.get(f'{url}?expand=reviews.comments').json()
+        comments = [
+            comment
+            for item in data['reviews']
+            for comment in item.get('comments', [])
+        ]
+        assert [comment['author'] for comment in comments] == ['TestAdmin']
+
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert not Review.objects.using('reviews').filter(
+            pk=review['id']
+        ).exists(), (
+            'Проверьте, что при удалении пользователя удаляются его отзывы '
+            'из отдельной БД.'
+        )
+        admin_client.delete(url)
+        assert not Review.objects.using('reviews').exists(), (
+            'Проверьте, что при удалении произведения удаляются его отзывы '
+            'из отдельной БД.'
+        )
+        assert not Comment.objects.using('reviews').exists()
+
+    def test_02_change_log_follows_commit(self, admin_client, user,
+                                          settings):
+        from django.db import transaction
+
+        from reviews.models import ChangeLog, Review
+
+        settings.REVIEWS_DATABASE = 'reviews'
+        titles, _, _ = create_titles(admin_client)
+        logged = ChangeLog.objects.filter(model='review')
+        with transaction.atomic(using='reviews'):
+            review = Review.objects.create(
+                title_id=titles[0]['id'], author=user, text='Текст', score=5
+            )
+            assert not logged.exists(), (
+                'Проверьте, что запись журнала об отзыве из отдельной БД '
+                'появляется только после фиксации отзыва.'
+            )
+        assert list(logged.values_list('object_id', flat=True)) == [
+            review.pk
+        ]
+        with pytest.raises(RuntimeError):
+            with transaction.atomic(using='reviews'):
+                Review.objects.filter(pk=review.pk).get().delete()
+                raise RuntimeError
+        assert logged.count() == 1, (
+            'Проверьте, что откат изменения отзыва отменяет запись журнала.'
+        )
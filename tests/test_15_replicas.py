@@ -0,0 +1,50 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(
+    transaction=True, databases=['default', 'default_replica']
+)
+class Test15ReplicasAPI:
+
+    def test_01_replica_reads(self, admin_client, user_client,
+                              moderator_client, settings):
+        settings.REPLICA_DATABASES = {'default': ['default_replica']}
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        replica = connections['default_replica']
+
+        with CaptureQueriesContext(replica) as queries:
+            response = user_client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert len(queries), (
+            f'Проверьте, что GET-запрос к `{url}` читает данные с реплики.'
+        )
+
+        with CaptureQueriesContext(replica) as queries:
+            response = create_single_review(
+                user_client, titles[0]['id'], 'Отлично', 9
+            )
+        assert response.status_code == HTTPStatus.CREATED
+        assert not len(queries), (
+            'Проверьте, что запись выполняется в основную БД.'
+        )
+
+        with CaptureQueriesContext(replica) as queries:
+            response = user_client.get(url)
+        assert len(response.json()['results']) == 1
+        assert not len(queries), (
+            'Проверьте, что после записи пользователь читает с основной БД.'
+        )
+
+        with CaptureQueriesContext(replica) as queries:
+            moderator_client.get(url)
+        assert len(queries), (
+            'Проверьте, что запись одного пользователя не переключает '
+            'на основную БД остальных.'
+        )
@@ -0,0 +1,240 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+SHARDS = ['reviews_0', 'reviews_1']
+
+
+@pytest.mark.django_db(
+    transaction=True, databases=['default', *SHARDS]
+)
+class Test16ShardsAPI:
+
+    def test_01_sharded_reviews(self, admin_client, user_client, user,
+                                settings):
+        from reviews.models import Comment, Review
+        from reviews.shards import init_sequences, shard_for_title
+
+        settings.REVIEW_SHARDS = SHARDS
+        for alias in SHARDS:
+            init_sequences(alias)
+        titles, _, _ = create_titles(admin_client)
+        title_ids = [title['id'] for title in titles]
+        assert {shard_for_title(pk) for pk in title_ids} == set(SHARDS)
+
+        reviews = {}
+        for title_id in title_ids:
+            create_single_review(admin_client, title_id, 'Плохо', 2)
+            response = create_single_review(
+                user_client, title_id, 'Отлично', 9
+            )
+            assert response.status_code == HTTPStatus.CREATED
+            reviews[title_id] = response.json()['id']
+        for title_id, review_id in reviews.items():
+            assert Review.objects.using(shard_for_title(title_id)).filter(
+                pk=review_id, title_id=title_id
+            ).exists(), (
+                'Проверьте, что отзыв сохраняется в шард своего произведения.'
+            )
+        assert len(set(reviews.values())) == len(reviews), (
+            'Проверьте, что id отзывов уникальны во всех шардах.'
+        )
+
+        title_id = title_ids[1]
+        url = f'/api/v1/titles/{title_id}/'
+        response = admin_client.post(
+            f'{url}reviews/{reviews[title_id]}/comments/', data={'text': 'Да'}
+        )
+        assert response.status_code == HTTPStatus.CREATED
+        assert Comment.objects.using(shard_for_title(title_id)).count() == 1
+        assert admin_client.get(url).json()['rating'] == 5, (
+            'Проверьте, что рейтинг считается по отзывам из шарда.'
+        )
+        response = admin_client.get(f'{url}reviews/')
+        assert len(response.json()['results']) == 2
+        data = admin_client.get(
+            '/api/v1/titles/?expand=reviews.comments'
+        ).json()
+        comments = [
+            comment['text']
+            for title in data['results']
+            for review in title['reviews']
+            for comment in review.get('comments', [])
+        ]
+        assert comments == ['Да'], (
+            'Проверьте, что встраиваемые отзывы читаются из шардов '
+            'своих произведений.'
+        )
+
+        response = admin_client.get(f'/api/v1/users/{user.username}/reviews/')
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert data['count'] == 2
+        assert {item['id'] for item in data['results']} == set(
+            reviews.values()
+        ), (
+            'Проверьте, что `/api/v1/users/{username}/reviews/` собирает '
+            'отзывы пользователя со всех шардов.'
+        )
+
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert not any(
+            Review.objects.using(alias).filter(
+                pk__in=reviews.values()
+            ).exists()
+            for alias in SHARDS
+        ), 'Проверьте, что отзывы пользователя удаляются из всех шардов.'
+        admin_client.delete(url)
+        assert not Review.objects.using(shard_for_title(title_id)).exists()
+        assert Review.objects.using(shard_for_title(title_ids[0])).exists()
+
+    def test_02_sharded_bulk(self, admin_client, admin, user, settings):
+        from reviews.models import Comment, Review
+        from reviews.shards import init_sequences, shard_for_title
+
+        settings.REVIEW_SHARDS = SHARDS
+        for alias in SHARDS:
+            init_sequences(alias)
+        titles, _, _ = create_titles(admin_client)
+        items = [
+            {'title': title['id'], 'author': author.username,
+             'text': 'Текст', 'score': score}
+            for title in titles
+            for author, score in ((admin, 2), (user, 8))
+        ]
+        items.append(dict(items[0], text='Повтор'))
+        url = '/api/v1/reviews/bulk/'
+        data = admin_client.post(url, data={'items': items}, format='json')
+        data = data.json()
+        assert data['created'] == 4 and data['errors'][0]['index'] == 4, (
+            f'Проверьте, что `{url}` проверяет повторы в шардах отзывов.'
+        )
+        for title in titles:
+            reviews = Review.objects.using(shard_for_title(title['id']))
+            assert reviews.filter(title_id=title['id']).count() == 2, (
+                f'Проверьте, что `{url}` сохраняет отзывы в шарды '
+                'их произведений.'
+            )
+            response = admin_client.get(f'/api/v1/titles/{title["id"]}/')
+            assert response.json()['rating'] == 5
+
+        review = Review.objects.using(shard_for_title(titles[1]['id'])).first()
+        data = admin_client.post(
+            '/api/v1/comments/bulk/',
+            data={'items': [
+                {'review': review.pk, 'author': admin.username,
+                 'text': 'Согласен'},
+            ]},
+            format='json'
+        ).json()
+        assert data['created'] == 1
+        assert Comment.objects.using(
+            shard_for_title(titles[1]['id'])
+        ).filter(review_id=review.pk).exists(), (
+            'Проверьте, что комментарий сохраняется в шард своего отзыва.'
+        )
+
+    def test_03_sharded_admin(self, client, user_superuser, admin_client,
+                              settings):
+        from reviews.models import Comment, Review
+        from reviews.shards import init_sequences, shard_for_title
+
+        settings.REVIEW_SHARDS = SHARDS
+        for alias in SHARDS:
+            init_sequences(alias)
+        titles, _, _ = create_titles(admin_client)
+        reviews = {}
+        for title in titles:
+            review_id = create_single_review(
+                admin_client, title['id'], f'Отзыв {title["id"]}', 7
+            ).json()['id']
+            reviews[shard_for_title(title['id'])] = review_id
+        title_id = titles[1]['id']
+        admin_client.post(
+            f'/api/v1/titles/{title_id}/reviews/'
+            f'{reviews[shard_for_title(title_id)]}/comments/',
+            data={'text': 'Согласен'},
+        )
+        client.force_login(user_superuser)
+
+        for alias in SHARDS:
+            response = client.get(
+                '/admin/reviews/review/', {'shard': alias}
+            )
+            assert response.status_code == HTTPStatus.OK, (
+                'Проверьте, что список отзывов в админке работает с шардами.'
+            )
+            assert [obj.pk for obj in response.context['cl'].result_list] == [
+                reviews[alias]
+            ]
+        assert client.get('/admin/reviews/comment/').status_code == (
+            HTTPStatus.OK
+        )
+
+        alias = shard_for_title(title_id)
+        review_url = f'/admin/reviews/review/{reviews[alias]}/'
+        response = client.get(f'{review_url}change/')
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что страница отзыва в админке находит его шард.'
+        )
+        comment = Comment.objects.using(alias).get()
+        response = client.post(
+            f'/admin/reviews/comment/{comment.pk}/change/',
+            data={
+                'review': comment.review_id,
+                'text': 'Исправлено',
+                'author': comment.author_id,
+            },
+        )
+        assert response.status_code == HTTPStatus.FOUND
+        assert Comment.objects.using(alias).get().text == 'Исправлено'
+        response = client.post(f'{review_url}delete/', data={'post': 'yes'})
+        assert response.status_code == HTTPStatus.FOUND
+        assert not Review.objects.using(alias).exists(), (
+            'Проверьте, что отзыв удаляется из админки в своём шарде.'
+        )
+        assert not Comment.objects.using(alias).exists()
+
+    def test_04_sharded_loadcsv(self, settings):
+        import csv
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from reviews.models import Comment, Review
+        from reviews.shards import init_sequences, shard_for_title
+
+        settings.REVIEW_SHARDS = SHARDS
+        for alias in SHARDS:
+            init_sequences(alias)
+        call_command('loadcsv', stdout=StringIO())
+
+        data_dir = settings.BASE_DIR / 'static' / 'data'
+        with open(data_dir / 'review.csv') as file:
+            reviews = {row['id']: row for row in csv.DictReader(file)}
+        with open(data_dir / 'comments.csv') as file:
+            comments = list(csv.DictReader(file))
+        for alias in SHARDS:
+            start = SHARDS.index(alias) * settings.REVIEW_SHARD_ID_SPAN
+            ids = Review.objects.using(alias).values_list('pk', flat=True)
+            assert all(start < pk <= start + settings.REVIEW_SHARD_ID_SPAN
+                       for pk in ids), (
+                'Проверьте, что `loadcsv` при шардировании выдаёт отзывам '
+                'id из диапазона их шарда.'
+            )
+        assert sum(
+            Review.objects.using(alias).count() for alias in SHARDS
+        ) == len(reviews)
+        for row in comments:
+            review = reviews[row['review_id']]
+            alias = shard_for_title(review['title_id'])
+            comment = Comment.objects.using(alias).select_related(
+                'review'
+            ).get(text=row['text'])
+            assert comment.review.text == review['text'], (
+                'Проверьте, что `loadcsv` переводит ссылки комментариев '
+                'на новые id отзывов.'
+            )
@@ -0,0 +1,68 @@
+import pytest
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_single_review, create_titles
+
+
+def query_plans(client, url, table):
+    """Планы SELECT-запросов страницы к таблице `table`."""
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    plans = []
+    with connection.cursor() as cursor:
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if sql.startswith('SELECT') and 'LIMIT' in sql and (
+                f'FROM "{table}"' in sql
+            ):
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans.append(
+                    ' | '.join(row[-1] for row in cursor.fetchall())
+                )
+    return plans
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17IndexesAPI:
+
+    def test_01_listing_plans(self, admin_client):
+        titles, _, genres = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        review = create_single_review(admin_client, titles[0]['id'], 'Да', 5)
+        admin_client.post(
+            f'{url}{review.json()["id"]}/comments/', data={'text': 'Нет'}
+        )
+
+        for url, table, index in (
+            (url, 'reviews_review', 'review_title_pub_date_idx'),
+            (
+                f'{url}{review.json()["id"]}/comments/',
+                'reviews_comment',
+                'comment_review_pub_date_idx',
+            ),
+            (
+                f'/api/v1/titles/?genre={genres[0]["slug"]}',
+                'reviews_title',
+                'genretitle_genre_title_idx',
+            ),
+        ):
+            plans = query_plans(admin_client, url, table)
+            assert plans, f'Не найден запрос страницы `{url}`.'
+            for plan in plans:
+                assert index in plan, (
+                    f'Проверьте, что запрос страницы `{url}` использует '
+                    f'индекс `{index}`. План: {plan}'
+                )
+                assert 'TEMP B-TREE' not in plan, (
+                    f'Проверьте, что страница `{url}` отдаётся в порядке '
+                    f'индекса без сортировки. План: {plan}'
+                )
+
+    def test_02_unique_genre_title(self, admin_client):
+        from reviews.models import GenreTitle
+
+        create_titles(admin_client)
+        link = GenreTitle.objects.first()
+        with pytest.raises(IntegrityError):
+            GenreTitle.objects.create(genre=link.genre, title=link.title)
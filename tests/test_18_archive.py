@@ -0,0 +1,111 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18ArchiveAPI:
+
+    def test_01_archive_fallback(self, admin_client, user_client,
+                                 moderator_client, settings):
+        from reviews.models import (
+            ArchivedComment,
+            ArchivedReview,
+            ChangeLog,
+            Comment,
+            Review,
+        )
+
+        settings.REVIEW_ARCHIVE_ENABLED = True
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        ids = [
+            create_single_review(client, titles[0]['id'], text, score)
+            .json()['id']
+            for client, text, score in (
+                (user_client, 'Старый', 2),
+                (moderator_client, 'Средний', 4),
+                (admin_client, 'Новый', 9),
+            )
+        ]
+        comments_url = f'{url}reviews/{ids[0]}/comments/'
+        old_comment = admin_client.post(
+            comments_url, data={'text': 'Старый комментарий'}
+        ).json()
+        now = timezone.now()
+        for days, review_id in ((60, ids[0]), (40, ids[1])):
+            Review.objects.filter(pk=review_id).update(
+                pub_date=now - timedelta(days=days)
+            )
+        Comment.objects.update(pub_date=now - timedelta(days=50))
+
+        call_command('archivereviews', days=30, batch_size=1)
+        assert (
+            list(Review.objects.values_list('pk', flat=True)),
+            ArchivedReview.objects.count(),
+            Comment.objects.count(),
+            ArchivedComment.objects.count(),
+        ) == ([ids[2]], 2, 0, 1), (
+            'Проверьте, что `archivereviews` переносит старые отзывы вместе '
+            'с комментариями в архив.'
+        )
+        assert set(
+            ChangeLog.objects.filter(action=ChangeLog.UPDATED)
+            .exclude(model='title')
+            .values_list('model', 'object_id')
+        ) == {
+            ('review', ids[0]),
+            ('review', ids[1]),
+            ('comment', old_comment['id']),
+        }, (
+            'Проверьте, что перенос в архив записывается в журнал изменений.'
+        )
+
+        response = admin_client.get(f'{url}reviews/?limit=2')
+        data = response.json()
+        assert data['count'] == 3
+        assert [item['id'] for item in data['results']] == ids[:0:-1], (
+            'Проверьте, что после рабочих отзывов список продолжается '
+            'архивными.'
+        )
+        data = admin_client.get(f'{url}reviews/?limit=2&offset=2').json()
+        assert [item['text'] for item in data['results']] == ['Старый']
+        data = admin_client.get(
+            f'{url}reviews/?offset=1&expand=comments'
+        ).json()
+        assert [
+            comment['text']
+            for item in data['results']
+            for comment in item['comments']
+        ] == ['Старый комментарий'], (
+            'Проверьте, что архивные отзывы встраивают архивные комментарии.'
+        )
+        response = admin_client.get(comments_url)
+        assert response.status_code == HTTPStatus.OK
+        assert [
+            item['text'] for item in response.json()['results']
+        ] == ['Старый комментарий'], (
+            'Проверьте, что комментарии архивного отзыва читаются из архива.'
+        )
+
+        assert admin_client.get(url).json()['rating'] == 5, (
+            'Проверьте, что рейтинг учитывает архивные отзывы.'
+        )
+        response = user_client.post(
+            f'{url}reviews/', data={'text': 'Ещё', 'score': 5}
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что повторный отзыв запрещён и при архивном отзыве.'
+        )
+
+        admin_client.delete(url)
+        assert not ArchivedReview.objects.exists()
+        assert not ArchivedComment.objects.exists(), (
+            'Проверьте, что удаление произведения удаляет архивные отзывы и '
+            'комментарии.'
+        )
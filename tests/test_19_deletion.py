@@ -0,0 +1,198 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from tests.utils import create_single_review, create_titles
+
+
+def purge_deleted():
+    out = StringIO()
+    call_command('purgedeleted', chunk_size=1, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19DeletionAPI:
+
+    def test_01_deferred_title_deletion(self, admin_client, user_client,
+                                        moderator_client, settings):
+        from reviews.models import ChangeLog, Comment, Review, Title
+
+        settings.DELETION_SYNC_LIMIT = 1
+        settings.JOBS_ALWAYS_EAGER = False
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        review = create_single_review(user_client, titles[0]['id'], 'Да', 5)
+        create_single_review(moderator_client, titles[0]['id'], 'Нет', 1)
+        admin_client.post(
+            f'{url}reviews/{review.json()["id"]}/comments/',
+            data={'text': 'Согласен'},
+        )
+
+        response = admin_client.delete(f'/api/v1/titles/{titles[1]["id"]}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT, (
+            'Проверьте, что удаление с небольшим каскадом выполняется сразу.'
+        )
+        response = admin_client.delete(url)
+        assert response.status_code == HTTPStatus.ACCEPTED, (
+            'Проверьте, что удаление с большим каскадом возвращает 202.'
+        )
+        task = response.json()
+        assert (task['status'], task['total']) == ('pending', 3)
+        assert admin_client.get(url).status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что объект скрывается сразу после запроса удаления.'
+        )
+        assert user_client.get(
+            f'/api/v1/deletions/{task["id"]}/'
+        ).status_code == HTTPStatus.FORBIDDEN
+
+        output = purge_deleted()
+        assert 'title' in output and '3/3' in output, (
+            'Проверьте, что `purgedeleted` выводит прогресс удаления.'
+        )
+        task = admin_client.get(f'/api/v1/deletions/{task["id"]}/').json()
+        assert (task['status'], task['deleted'], task['progress']) == (
+            'done', 3, 1.0
+        )
+        assert not Title.objects.filter(pk=titles[0]['id']).exists()
+        assert not Review.objects.exists() and not Comment.objects.exists()
+        assert set(
+            ChangeLog.objects.filter(action=ChangeLog.DELETED).values_list(
+                'model', flat=True
+            )
+        ) == {'title', 'review', 'comment'}, (
+            'Проверьте, что фоновое удаление записывается в журнал изменений.'
+        )
+
+    def test_02_deferred_user_and_category_deletion(
+        self, admin_client, user_client, user, settings
+    ):
+        from reviews.models import Title, User
+
+        settings.DELETION_SYNC_LIMIT = 0
+        settings.JOBS_ALWAYS_EAGER = False
+        titles, categories, _ = create_titles(admin_client)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        create_single_review(admin_client, titles[0]['id'], 'Плохо', 2)
+        create_single_review(user_client, titles[0]['id'], 'Хорошо', 8)
+
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == HTTPStatus.ACCEPTED
+        assert user_client.get('/api/v1/users/me/').status_code == (
+            HTTPStatus.UNAUTHORIZED
+        ), 'Проверьте, что скрытый пользователь теряет доступ.'
+        slug = categories[0]['slug']
+        response = admin_client.delete(f'/api/v1/categories/{slug}/')
+        assert response.status_code == HTTPStatus.ACCEPTED
+        assert slug not in {
+            item['slug']
+            for item in admin_client.get('/api/v1/categories/').json()[
+                'results'
+            ]
+        }
+
+        purge_deleted()
+        assert not User.objects.filter(pk=user.pk).exists()
+        assert admin_client.get(title_url).json()['rating'] == 2, (
+            'Проверьте, что после удаления отзывов пользователя рейтинг '
+            'пересчитывается.'
+        )
+        assert Title.objects.get(pk=titles[0]['id']).category is None, (
+            'Проверьте, что произведения удалённой категории остаются '
+            'без категории.'
+        )
+
+    def test_03_bulk_skips_hidden_titles(self, admin_client, user_client,
+                                         admin, settings):
+        from reviews.models import Review, Title
+
+        settings.DELETION_SYNC_LIMIT = 0
+        settings.JOBS_ALWAYS_EAGER = False
+        item = {'external_id': 'ext-hidden', 'name': 'Скрытое', 'year': 2000}
+        admin_client.put('/api/v1/titles/bulk/', data=[item], format='json')
+        title = Title.objects.get(external_id='ext-hidden')
+        create_single_review(user_client, title.pk, 'Текст', 5)
+        response = admin_client.delete(f'/api/v1/titles/{title.pk}/')
+        assert response.status_code == HTTPStatus.ACCEPTED
+
+        data = admin_client.post(
+            '/api/v1/reviews/bulk/',
+            data={'items': [
+                {'title': title.pk, 'author': admin.username,
+                 'text': 'Текст', 'score': 5},
+            ]},
+            format='json',
+        ).json()
+        assert data['created'] == 0 and Review.objects.count() == 1, (
+            'Проверьте, что пакетная загрузка отзывов не принимает '
+            'произведения, скрытые до удаления.'
+        )
+        data = admin_client.put(
+            '/api/v1/titles/bulk/',
+            data=[dict(item, name='Изменено')],
+            format='json',
+        ).json()
+        assert (data['updated'], data['created']) == (0, 0)
+        assert [error['index'] for error in data['errors']] == [0]
+        assert Title.objects.get(pk=title.pk).name == 'Скрытое', (
+            'Проверьте, что пакетное обновление не изменяет произведения, '
+            'скрытые до удаления.'
+        )
+
+    def test_04_eager_deletion_is_inline(self, admin_client, user_client,
+                                         settings):
+        from reviews.models import DeletionTask, Review, Title
+
+        settings.DELETION_SYNC_LIMIT = 0
+        settings.JOBS_ALWAYS_EAGER = True
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(user_client, titles[0]['id'], 'Текст', 5)
+        response = admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT, (
+            'Проверьте, что без очереди задач (`JOBS_ALWAYS_EAGER`) '
+            'удаление выполняется сразу и не возвращает 202.'
+        )
+        assert not Title.objects.filter(pk=titles[0]['id']).exists()
+        assert not Review.objects.exists()
+        assert not DeletionTask.objects.exists()
+
+    def test_05_chunks_notify_log_and_index(self, admin_client, user_client,
+                                            settings):
+        from reviews.deletion import category_stages, run_chunk
+        from reviews.models import Category, ChangeLog, Review, Title
+        from reviews.title_index import title_index
+
+        settings.TITLE_INDEX_ENABLED = True
+        title_index.warm_up()
+        try:
+            titles, categories, genres = create_titles(admin_client)
+            for client in (admin_client, user_client):
+                create_single_review(client, titles[0]['id'], 'Текст', 5)
+            ids = sorted(Review.objects.values_list('pk', flat=True))
+            category = Category.objects.get(slug=categories[0]['slug'])
+            alias, model, lookups = category_stages(category.pk)[0]
+            assert run_chunk(alias, model, lookups, 10) > 0
+            assert title_index.lookup(
+                genres={genres[0]['slug']},
+                categories={categories[0]['slug']},
+            ) == [], (
+                'Проверьте, что отвязка произведений от категории '
+                'обновляет индекс произведений.'
+            )
+
+            settings.DELETION_SYNC_LIMIT = 0
+            settings.JOBS_ALWAYS_EAGER = True
+            admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+            assert not Title.objects.filter(pk=titles[0]['id']).exists()
+            assert sorted(
+                ChangeLog.objects.filter(
+                    model='review', action=ChangeLog.DELETED
+                ).values_list('object_id', flat=True)
+            ) == ids, (
+                'Проверьте, что каждый удалённый пакетом отзыв один раз '
+                'записывается в журнал изменений.'
+            )
+        finally:
+            title_index.reset()
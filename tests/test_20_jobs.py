@@ -0,0 +1,125 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+
+def fail(reason):
+    raise RuntimeError(reason)
+
+
+def noop(**kwargs):
+    pass
+
+
+reclaimed = []
+
+
+def slow(seconds):
+    from reviews.jobs import claim
+
+    time.sleep(seconds)
+    reclaimed.extend(claim(5, timeout=1))
+
+
+def run_worker():
+    out = StringIO()
+    call_command('runworker', threads=2, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20JobsAPI:
+
+    def test_01_signup_mail_is_queued(self, client, settings):
+        from reviews.models import Job
+
+        settings.JOBS_ALWAYS_EAGER = False
+        response = client.post(
+            '/api/v1/auth/signup/',
+            data={'email': 'queued@yamdb.fake', 'username': 'queued'},
+        )
+        assert response.status_code == 200
+        assert not mail.outbox, (
+            'Проверьте, что письмо с кодом отправляется фоновой задачей.'
+        )
+        job = Job.objects.get()
+        assert (job.name, job.status) == (
+            'django.core.mail.send_mail', Job.QUEUED
+        )
+
+        output = run_worker()
+        assert 'done: 1' in output
+        assert [message.to for message in mail.outbox] == [
+            ['queued@yamdb.fake']
+        ], 'Проверьте, что `runworker` выполняет задачи из очереди.'
+        job.refresh_from_db()
+        assert (job.status, job.attempts, job.lease) == (Job.DONE, 1, '')
+
+    def test_02_priority_retries_and_timeout(self, settings):
+        from reviews.jobs import claim, enqueue, run_job
+        from reviews.models import Job
+
+        settings.JOBS_ALWAYS_EAGER = False
+        settings.JOBS_RETRY_BACKOFF = 0
+        low = enqueue(noop, priority=-1)
+        high = enqueue(noop, priority=5)
+        later = enqueue(noop, priority=10, delay=3600)
+        assert [job.pk for job in claim(1)] == [high.pk], (
+            'Проверьте, что задачи выбираются по приоритету и не раньше '
+            'назначенного времени.'
+        )
+        assert claim(5) == [low] and claim(5) == []
+
+        Job.objects.filter(pk__in=(high.pk, low.pk)).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        reclaimed = claim(5)
+        assert {job.pk for job in reclaimed} == {high.pk, low.pk}, (
+            'Проверьте, что задачи с истёкшей арендой выполняются повторно.'
+        )
+        assert {job.attempts for job in reclaimed} == {2}
+        assert {run_job(job) for job in reclaimed} == {Job.DONE}
+        later.refresh_from_db()
+        assert later.status == Job.QUEUED
+
+        failing = enqueue(fail, max_attempts=2, reason='нет связи')
+        output = run_worker()
+        assert 'queued: 1' in output and 'failed: 1' in output
+        failing.refresh_from_db()
+        assert (failing.status, failing.attempts) == (Job.FAILED, 2), (
+            'Проверьте, что задача повторяется до `max_attempts` попыток.'
+        )
+        assert 'нет связи' in failing.last_error
+
+    def test_03_lease_is_renewed(self, settings):
+        from reviews.jobs import claim, enqueue, run_job
+        from reviews.models import Job
+
+        settings.JOBS_ALWAYS_EAGER = False
+        job = enqueue(slow, seconds=0.6)
+        [job] = claim(1, timeout=0.3)
+        assert run_job(job, timeout=0.3) == Job.DONE
+        assert reclaimed == [], (
+            'Проверьте, что аренда выполняющейся задачи продлевается и '
+            'её не берёт другой обработчик.'
+        )
+        job.refresh_from_db()
+        assert (job.status, job.attempts) == (Job.DONE, 1)
+
+        expired = enqueue(noop, max_attempts=1)
+        [expired] = claim(1)
+        Job.objects.filter(pk=expired.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        assert claim(5) == []
+        assert Job.objects.get(pk=expired.pk).status == Job.FAILED
+        assert run_job(expired) == Job.DONE
+        assert Job.objects.get(pk=expired.pk).status == Job.DONE, (
+            'Проверьте, что успешное завершение задачи не теряется после '
+            'истечения её аренды.'
+        )
@@ -0,0 +1,173 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21CountersAPI:
+
+    def test_01_review_and_comment_counts(self, admin_client, user_client,
+                                          moderator_client, admin):
+        from reviews.models import Review, Title
+
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        assert admin_client.get(url).json()['review_count'] == 0
+        review_id = create_single_review(
+            user_client, titles[0]['id'], 'Хорошо', 8
+        ).json()['id']
+        other_id = create_single_review(
+            moderator_client, titles[0]['id'], 'Плохо', 2
+        ).json()['id']
+        assert admin_client.get(url).json()['review_count'] == 2, (
+            'Проверьте, что число отзывов произведения обновляется при '
+            'создании отзыва.'
+        )
+
+        comments_url = f'{url}reviews/{review_id}/comments/'
+        comment_id = admin_client.post(
+            comments_url, data={'text': 'Согласен'}
+        ).json()['id']
+        user_client.post(comments_url, data={'text': 'Спасибо'})
+        admin_client.post(
+            '/api/v1/comments/bulk/',
+            data={'items': [
+                {'review': review_id, 'author': admin.username,
+                 'text': 'Пакетом'},
+            ]},
+            format='json',
+        )
+        review_url = f'{url}reviews/{review_id}/'
+        assert admin_client.get(review_url).json()['comment_count'] == 3, (
+            'Проверьте, что число комментариев отзыва обновляется при '
+            'создании комментариев, в том числе пакетом.'
+        )
+        admin_client.delete(f'{comments_url}{comment_id}/')
+        assert admin_client.get(review_url).json()['comment_count'] == 2, (
+            'Проверьте, что число комментариев уменьшается при удалении.'
+        )
+        moderator_client.delete(f'{url}reviews/{other_id}/')
+        assert admin_client.get(url).json()['review_count'] == 1
+
+        Title.objects.update(review_count=10)
+        Review.objects.update(comment_count=0)
+        out = StringIO()
+        call_command('recount', batch_size=1, stdout=out)
+        assert admin_client.get(url).json()['review_count'] == 1
+        assert sorted(
+            Review.objects.values_list('comment_count', flat=True)
+        ) == [2], (
+            'Проверьте, что `recount` исправляет расхождение счётчиков.'
+        )
+
+    def test_02_check_aggregates(self, admin_client, user_client,
+                                 moderator_client):
+        from reviews.models import Review, Title
+
+        titles, _, _ = create_titles(admin_client)
+        for title in titles:
+            for client, score in ((user_client, 3), (moderator_client, 6)):
+                create_single_review(client, title['id'], 'Текст', score)
+        review = Review.objects.first()
+        admin_client.post(
+            f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+            'comments/',
+            data={'text': 'Согласен'},
+        )
+        Title.objects.filter(pk=titles[0]['id']).update(
+            rating=1, review_count=5
+        )
+        Review.objects.filter(pk=review.pk).update(comment_count=7)
+
+        with pytest.raises(CommandError, match='Найдено расхождений: 2'):
+            call_command('checkaggregates', dry_run=True, stdout=StringIO())
+        assert Title.objects.get(pk=titles[0]['id']).rating == 1, (
+            'Проверьте, что `checkaggregates --dry-run` ничего не исправляет.'
+        )
+        out = StringIO()
+        call_command(
+            'checkaggregates', chunk_size=1, parallel=2, stdout=out
+        )
+        assert 'Исправлено расхождений: 2' in out.getvalue()
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.rating, title.review_count) == (4.5, 2), (
+            'Проверьте, что `checkaggregates` исправляет рейтинг и число '
+            'отзывов.'
+        )
+        assert Review.objects.get(pk=review.pk).comment_count == 1
+        out = StringIO()
+        call_command('checkaggregates', sample=0.5, stdout=out)
+        assert 'Исправлено расхождений: 0' in out.getvalue()
+
+    def test_03_repair_recomputes(self, admin_client, user_client,
+                                  moderator_client, monkeypatch):
+        from reviews.management.commands.checkaggregates import Command
+        from reviews.models import Title
+
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        create_single_review(user_client, title_id, 'Текст', 2)
+        Title.objects.filter(pk=title_id).update(rating=1, review_count=5)
+        repair = Command.repair
+
+        def repair_after_write(self, queryset, method, ids, using):
+            if ids and method == 'update_rating':
+                create_single_review(moderator_client, title_id, 'Текст', 8)
+            repair(self, queryset, method, ids, using)
+
+        monkeypatch.setattr(Command, 'repair', repair_after_write)
+        call_command('checkaggregates', stdout=StringIO())
+        title = Title.objects.get(pk=title_id)
+        assert (title.rating, title.review_count) == (5, 2), (
+            'Проверьте, что `checkaggregates` пересчитывает строки при '
+            'исправлении, а не записывает значения, устаревшие за время '
+            'проверки.'
+        )
+
+    def test_04_rebuild_ratings(self, admin_client, user_client,
+                                moderator_client, monkeypatch):
+        from reviews.management.commands.rebuildratings import Command
+        from reviews.models import ChangeLog, Title
+
+        titles, _, _ = create_titles(admin_client)
+        for client, score in ((user_client, 3), (moderator_client, 8)):
+            create_single_review(client, titles[0]['id'], 'Текст', score)
+        create_single_review(user_client, titles[1]['id'], 'Текст', 10)
+        Title.objects.update(rating=None, review_count=0)
+        accumulate = Command.accumulate
+
+        def accumulate_then_create(self, size, read_size):
+            result = accumulate(self, size, read_size)
+            Title.objects.create(name='Новое', year=2000)
+            return result
+
+        monkeypatch.setattr(Command, 'accumulate', accumulate_then_create)
+        last_change = ChangeLog.objects.order_by('pk').last().pk
+        out = StringIO()
+        call_command('rebuildratings', read_size=2, batch_size=1, stdout=out)
+        assert 'Отзывов: 3, произведений обновлено: 2' in out.getvalue(), (
+            'Проверьте, что `rebuildratings` пропускает произведения, '
+            'созданные после чтения отзывов.'
+        )
+        assert set(
+            ChangeLog.objects.filter(
+                pk__gt=last_change, action=ChangeLog.UPDATED
+            ).values_list('object_id', flat=True)
+        ) >= {title['id'] for title in titles[:2]}, (
+            'Проверьте, что `rebuildratings` записывает пересчитанные '
+            'произведения в журнал изменений.'
+        )
+        assert '10: 1' in out.getvalue(), (
+            'Проверьте, что `rebuildratings` выводит распределение оценок.'
+        )
+        assert sorted(
+            Title.objects.exclude(name='Новое').values_list(
+                'rating', 'review_count'
+            )
+        ) == [(5.5, 2), (10.0, 1)], (
+            'Проверьте, что `rebuildratings` пересчитывает рейтинг и число '
+            'отзывов всех произведений.'
+        )